@@ -22,7 +22,14 @@ class Settings:
 
     QDRANT_HOST = os.getenv("QDRANT_HOST", "localhost")
     QDRANT_PORT = int(os.getenv("QDRANT_PORT", 6333))
+    # Vector storage for new collections: none | int8 | pq (originals on disk, rescored)
+    POI_QUANTIZATION = os.getenv("POI_QUANTIZATION", "int8")
+    POI_RESCORE_OVERSAMPLING = float(os.getenv("POI_RESCORE_OVERSAMPLING", 4.0))
 
     EMBED_MODEL = os.getenv("EMBED_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
+    # Query embedding micro-batches (see common/embedder.py)
+    EMBED_BATCH_MAX = int(os.getenv("EMBED_BATCH_MAX", 32))
+    EMBED_BATCH_WINDOW_MS = float(os.getenv("EMBED_BATCH_WINDOW_MS", 5))
+    EMBED_THREADS = int(os.getenv("EMBED_THREADS", os.cpu_count() or 1))
 
 settings = Settings()
\ No newline at end of file
@@ -0,0 +1,20 @@
+"""
+api.config defaults for the shared micro-batching embedder (common/embedder.py).
+
+    emb = BatchEmbedder(model)            # EMBED_BATCH_MAX / _WINDOW_MS / EMBED_THREADS
+"""
+from typing import Optional
+
+from api.config import settings
+from common import embedder
+
+
+class BatchEmbedder(embedder.BatchEmbedder):
+    def __init__(self, model, max_batch: Optional[int] = None, window_ms: Optional[float] = None,
+                 threads: Optional[int] = None):
+        super().__init__(
+            model,
+            max_batch or settings.EMBED_BATCH_MAX,
+            settings.EMBED_BATCH_WINDOW_MS if window_ms is None else window_ms,
+            settings.EMBED_THREADS if threads is None else threads,
+        )
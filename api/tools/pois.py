@@ -1,43 +1,103 @@
-from qdrant_client import QdrantClient
-from qdrant_client.http.models import Distance, VectorParams, PointStruct
-from sentence_transformers import SentenceTransformer
+import asyncio
 import json
+from typing import TYPE_CHECKING, Optional, Sequence
 from api.config import settings
 
+if TYPE_CHECKING:
+    from qdrant_client import QdrantClient
+
 COLLECTION = "pois_fr"
 
 class POIIndex:
-    def __init__(self, client: QdrantClient):
+    def __init__(self, client: "QdrantClient", collection: str = COLLECTION, quantization: str = ""):
+        # Deferred: importing sentence_transformers pulls in torch (seconds of cold start)
+        from sentence_transformers import SentenceTransformer
+
+        from api.tools.embedder import BatchEmbedder
+
         self.client = client
+        self.collection = collection
+        self.quantization = quantization or settings.POI_QUANTIZATION
         self.model = SentenceTransformer(settings.EMBED_MODEL)
+        # Query encodes from concurrent searches are batched on one thread
+        self.embedder = BatchEmbedder(self.model)
         self._ensure_collection()
 
+    def _quantization_config(self):
+        """Compressed copy kept in RAM for the first pass; full vectors stay on disk."""
+        from qdrant_client.http import models
+
+        if self.quantization == "int8":
+            return models.ScalarQuantization(scalar=models.ScalarQuantizationConfig(
+                type=models.ScalarType.INT8, quantile=0.99, always_ram=True))
+        if self.quantization == "pq":
+            return models.ProductQuantization(product=models.ProductQuantizationConfig(
+                compression=models.CompressionRatio.X16, always_ram=True))
+        if self.quantization != "none":
+            raise ValueError(f"unknown quantization {self.quantization!r}")
+        return None
+
     def _ensure_collection(self):
+        from qdrant_client.http.models import Distance, VectorParams
+
         dim = self.model.get_sentence_embedding_dimension()
         collections = [c.name for c in self.client.get_collections().collections]
-        if COLLECTION not in collections:
+        if self.collection not in collections:
+            quant = self._quantization_config()
             self.client.create_collection(
-                collection_name=COLLECTION,
-                vectors_config=VectorParams(size=dim, distance=Distance.COSINE)
+                collection_name=self.collection,
+                vectors_config=VectorParams(size=dim, distance=Distance.COSINE, on_disk=quant is not None),
+                quantization_config=quant,
             )
+            # Payload indexes so city/tag/price filters are resolved before the vector scan
+            for field, schema in (("city", "keyword"), ("tags", "keyword"), ("price_eur", "float")):
+                self.client.create_payload_index(self.collection, field_name=field, field_schema=schema)
 
     def seed_from_jsonl(self, path: str):
-        points = []
+        from qdrant_client.http.models import PointStruct
+
         with open(path, "r", encoding="utf-8") as f:
-            for idx, line in enumerate(f):
-                rec = json.loads(line)
-                text = f"{rec['name']} {rec['city']} {' '.join(rec['tags'])}"
-                emb = self.model.encode(text).tolist()
-                points.append(PointStruct(id=idx+1, vector=emb, payload=rec))
+            recs = [json.loads(line) for line in f]
+        texts = [f"{rec['name']} {rec['city']} {' '.join(rec['tags'])}" for rec in recs]
+        embs = self.model.encode(texts, batch_size=64) if texts else []
+        points = [PointStruct(id=idx+1, vector=emb.tolist(), payload=rec)
+                  for idx, (rec, emb) in enumerate(zip(recs, embs))]
         if points:
-            self.client.upsert(collection_name=COLLECTION, points=points)
+            self.client.upsert(collection_name=self.collection, points=points)
+
+    @staticmethod
+    def _filter(city: str, tags: Sequence[str] = (), max_price: Optional[float] = None) -> dict:
+        must = [{"key": "city", "match": {"value": city}}]
+        if tags:
+            must.append({"key": "tags", "match": {"any": list(tags)}})
+        if max_price is not None:
+            must.append({"key": "price_eur", "range": {"lte": max_price}})
+        return {"must": must}
+
+    def _query(self, qvec, city: str, top_k: int, tags: Sequence[str] = (), max_price: Optional[float] = None):
+        from qdrant_client.http.models import QuantizationSearchParams, SearchParams
 
-    def search(self, query: str, city: str, top_k: int = 8):
-        qvec = self.model.encode(query).tolist()
+        params = None
+        if self.quantization != "none":
+            # Rank on the compressed vectors, then rescore the top limit*oversampling exactly
+            params = SearchParams(quantization=QuantizationSearchParams(
+                rescore=True, oversampling=settings.POI_RESCORE_OVERSAMPLING))
         res = self.client.search(
-            collection_name=COLLECTION,
+            collection_name=self.collection,
             query_vector=qvec,
             limit=top_k,
-            query_filter={"must": [{"key": "city", "match": {"value": city}}]},
+            query_filter=self._filter(city, tags, max_price),
+            search_params=params,
         )
-        return [hit.payload for hit in res]
\ No newline at end of file
+        return [hit.payload for hit in res]
+
+    def search(self, query: str, city: str, top_k: int = 8, tags: Sequence[str] = (),
+               max_price: Optional[float] = None):
+        """Dense search within `city`, optionally restricted to any of `tags` and price <= max_price."""
+        return self._query(self.embedder.embed(query), city, top_k, tags, max_price)
+
+    async def asearch(self, query: str, city: str, top_k: int = 8, tags: Sequence[str] = (),
+                      max_price: Optional[float] = None):
+        """search() for the event loop: waits on the batch without blocking, Qdrant call in a thread."""
+        qvec = await self.embedder.aembed(query)
+        return await asyncio.to_thread(self._query, qvec, city, top_k, tags, max_price)
\ No newline at end of file
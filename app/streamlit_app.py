@@ -1,3 +1,10 @@
+import json
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, Optional, Tuple
+
 import streamlit as st
 import httpx
 from datetime import date, timedelta
@@ -5,23 +12,99 @@ from datetime import date, timedelta
 st.set_page_config(page_title="Travel Copilot 🇫🇷", layout="wide")
 st.title("🧭 Travel Planner Copilot — France")
 
-API_BASE = "http://localhost:8000"
+API_BASE = os.getenv("API_BASE", "http://localhost:8000")
+HEALTH_TTL_SEC = 15          # one /health call per interval for all sessions
+PLAN_TTL_SEC = 600           # identical payloads re-use the plan for this long
+PLAN_TIMEOUT_SEC = 60.0
+PLAN_WORKERS = 8             # concurrent /plan calls from this UI process
+POLL_SEC = 1.0
+FINISHED_KEEP_SEC = 120      # finished jobs stay around until their session picks them up
+
+
+# ---- Shared (per server process, all sessions) client, health and plan jobs
+@st.cache_resource
+def client() -> httpx.Client:
+    # One pooled, keep-alive client; httpx.Client is thread-safe
+    return httpx.Client(
+        base_url=API_BASE,
+        timeout=httpx.Timeout(PLAN_TIMEOUT_SEC, connect=3.0),
+        limits=httpx.Limits(max_connections=PLAN_WORKERS + 4, max_keepalive_connections=PLAN_WORKERS + 4),
+    )
+
+
+@st.cache_data(ttl=HEALTH_TTL_SEC, show_spinner=False)
+def api_health() -> Optional[str]:
+    """None when the API is up, else the error text (errors are cached too)."""
+    try:
+        client().get("/health", timeout=3.0).raise_for_status()
+        return None
+    except Exception as e:
+        return str(e)
+
+
+class PlanJobs:
+    """/plan calls run on a small thread pool; one in-flight call per payload across sessions."""
+
+    def __init__(self, workers: int):
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="plan")
+        self.lock = threading.Lock()
+        self.jobs: Dict[str, Tuple[Future, float]] = {}
+
+    def _prune(self) -> None:
+        now = time.monotonic()
+        for key, (f, t0) in list(self.jobs.items()):
+            if f.done() and now - t0 > FINISHED_KEEP_SEC + PLAN_TIMEOUT_SEC:
+                del self.jobs[key]
+
+    def submit(self, key: str) -> Future:
+        with self.lock:
+            self._prune()
+            job = self.jobs.get(key)
+            if job is None or (job[0].done() and job[0].exception() is not None):
+                job = self.jobs[key] = (self.pool.submit(_post_plan, key), time.monotonic())
+            return job[0]
+
+    def get(self, key: str) -> Optional[Future]:
+        with self.lock:
+            job = self.jobs.get(key)
+            return job[0] if job else None
+
+
+@st.cache_resource
+def plan_jobs() -> PlanJobs:
+    return PlanJobs(PLAN_WORKERS)
+
+
+def _post_plan(key: str) -> dict:
+    r = client().post("/plan", content=key, headers={"content-type": "application/json"})
+    r.raise_for_status()
+    return r.json()
+
+
+@st.cache_data(ttl=PLAN_TTL_SEC, show_spinner=False)
+def plan_result(key: str) -> dict:
+    """Plan for a canonical payload; memoized, so reruns and other sessions don't re-plan."""
+    return plan_jobs().submit(key).result()
+
+
+def payload_key(payload: dict) -> str:
+    return json.dumps(payload, sort_keys=True, separators=(",", ":"))
+
 
 # ---- Status row
 status_cols = st.columns(3)
 with status_cols[0]:
-    try:
-        r = httpx.get(f"{API_BASE}/health", timeout=3.0)
-        r.raise_for_status()
+    err = api_health()
+    if err is None:
         st.success("API: online")
-    except Exception as e:
-        st.error(f"API: offline — {e}")
+    else:
+        st.error(f"API: offline — {err}")
 
 with status_cols[1]:
     st.caption("Tip: If the page stays blank, hard-reload (⌘⇧R) or try another port.")
 
 with status_cols[2]:
-    st.caption("Using local API at http://localhost:8000")
+    st.caption(f"Using API at {API_BASE}")
 
 st.divider()
 
@@ -63,43 +146,66 @@ if clicked:
             "max_walk_km_per_day": float(max_walk),
             "language": lang,
         }
-        with st.spinner("Planning..."):
-            try:
-                r = httpx.post(f"{API_BASE}/plan", json=payload, timeout=20.0)
-                r.raise_for_status()
-                data = r.json()
-            except httpx.HTTPStatusError as e:
-                st.error(f"API error {e.response.status_code}: {e.response.text}")
-                st.stop()
-            except Exception as e:
-                st.error(f"Request failed: {e}")
-                st.stop()
-
-        res = data.get("result", {})
-        issues = data.get("issues", [])
-
-        st.subheader("Itinerary Summary")
-        st.write(res.get("summary", "Itinerary ready."))
-        st.write(f"**Estimated total cost:** €{res.get('total_cost_estimate_eur', 0)}")
-
-        days = res.get("days", [])
-        if not days:
-            st.warning("No day plans returned.")
-        else:
-            for d in days:
-                with st.expander(f"{d['date']} — {d['city']}"):
-                    for a in d.get("activities", []):
-                        st.markdown(
-                            f"- **{a['start_time']}–{a['end_time']}** · {a['title']} "
-                            f"(≈ €{a['cost_eur']}) · {a['transport_mode']}"
-                        )
-
-        if res.get("citations"):
-            st.caption("Sources:")
-            for c in res["citations"]:
-                st.write(c)
-
-        if issues:
-            st.warning("Checks: " + "; ".join(issues))
-else:
+        key = payload_key(payload)
+        st.session_state.plan_key = key
+        st.session_state.plan_started = time.monotonic()
+        plan_jobs().submit(key)
+
+
+@st.fragment(run_every=POLL_SEC)
+def planning_status(key: str) -> None:
+    job = plan_jobs().get(key)
+    if job is None or job.done():
+        st.rerun()  # full rerun renders the result
+    st.info(f"Planning… {time.monotonic() - st.session_state.get('plan_started', time.monotonic()):.0f}s")
+
+
+def render(data: dict) -> None:
+    res = data.get("result", {})
+    issues = data.get("issues", [])
+
+    st.subheader("Itinerary Summary")
+    st.write(res.get("summary", "Itinerary ready."))
+    st.write(f"**Estimated total cost:** €{res.get('total_cost_estimate_eur', 0)}")
+
+    days = res.get("days", [])
+    if not days:
+        st.warning("No day plans returned.")
+    else:
+        for d in days:
+            with st.expander(f"{d['date']} — {d['city']}"):
+                for a in d.get("activities", []):
+                    st.markdown(
+                        f"- **{a['start_time']}–{a['end_time']}** · {a['title']} "
+                        f"(≈ €{a['cost_eur']}) · {a['transport_mode']}"
+                    )
+
+    if res.get("citations"):
+        st.caption("Sources:")
+        for c in res["citations"]:
+            st.write(c)
+
+    if issues:
+        st.warning("Checks: " + "; ".join(issues))
+
+
+key = st.session_state.get("plan_key")
+if key is None:
     st.info("Set your trip in the sidebar, then click **Plan Itinerary**.")
+else:
+    job = plan_jobs().get(key)
+    if job is not None and not job.done():
+        planning_status(key)
+    elif job is not None and job.exception() is not None:
+        e = job.exception()
+        if isinstance(e, httpx.HTTPStatusError):
+            st.error(f"API error {e.response.status_code}: {e.response.text}")
+        else:
+            st.error(f"Request failed: {e}")
+        st.session_state.pop("plan_key", None)
+    else:
+        try:
+            render(plan_result(key))
+        except Exception as e:
+            st.error(f"Request failed: {e}")
+            st.session_state.pop("plan_key", None)
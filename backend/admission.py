@@ -0,0 +1,169 @@
+# backend/admission.py
+"""
+Admission control for plan requests, with a degraded mode under overload.
+
+    async with admission.get().admit(deadline) as mode:   # "normal" | "degraded"
+        ...
+
+Each API worker runs at most PLAN_MAX_CONCURRENT normal plans; a request
+that finds a slot free runs normally whatever its deadline. Past that,
+requests wait in a FIFO of at most PLAN_MAX_QUEUE, but only if the expected
+wait plus a normal plan (moving average of recent plans) still fits their
+deadline (X-Deadline-Ms, else PLAN_DEADLINE_MS; set a little under the
+client's own timeout). A request that would miss its deadline is not queued,
+or leaves the queue as soon as it can no longer make it, and is served in
+degraded mode instead: no provider calls, cached answers of any age within
+the stale grace, else the offline estimates (mock flights and hotels,
+climate normals) — see providers.degraded(). Degraded plans are cheap, but
+they are capped too (PLAN_DEGRADED_MAX_CONCURRENT); beyond that the request
+is shed with 503 and Retry-After.
+
+Work is therefore bounded by the caps: when providers slow down, the
+backlog cannot grow past what can finish in time, and excess load gets a
+fast degraded answer instead of a timeout.
+"""
+import asyncio
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Deque, List, Optional, Tuple
+
+from backend import metrics
+from backend.config import settings
+
+NORMAL, DEGRADED = "normal", "degraded"
+_EWMA_ALPHA = 0.2
+
+
+class Overloaded(Exception):
+    def __init__(self, retry_after: int):
+        super().__init__("server overloaded, retry later")
+        self.retry_after = retry_after
+
+
+class Admission:
+    def __init__(self, max_concurrent: Optional[int] = None, max_queue: Optional[int] = None,
+                 degraded_max: Optional[int] = None):
+        self.max_concurrent = max_concurrent or settings.PLAN_MAX_CONCURRENT
+        self.max_queue = settings.PLAN_MAX_QUEUE if max_queue is None else max_queue
+        self.degraded_max = settings.PLAN_DEGRADED_MAX_CONCURRENT if degraded_max is None else degraded_max
+        self.active = 0
+        self.degraded_active = 0
+        self.service_sec = settings.PLAN_SERVICE_SEC_INITIAL   # moving average of normal plans
+        self._waiters: Deque[asyncio.Future] = deque()
+
+    def expected_wait(self, position: int) -> float:
+        """Rough wait for the request at `position` in the queue."""
+        return self.service_sec * (position // self.max_concurrent + 1)
+
+    def stats(self) -> dict:
+        return {"active": self.active, "queued": len(self._waiters), "degraded_active": self.degraded_active,
+                "service_sec": round(self.service_sec, 3), "max_concurrent": self.max_concurrent,
+                "max_queue": self.max_queue}
+
+    @asynccontextmanager
+    async def admit(self, deadline: float) -> AsyncIterator[str]:
+        """Hold a normal or degraded slot for the block; `deadline` is in time.monotonic() seconds."""
+        mode = await self._acquire(deadline)
+        t0 = time.monotonic()
+        try:
+            yield mode
+        finally:
+            self._release(mode, time.monotonic() - t0)
+
+    async def _acquire(self, deadline: float) -> str:
+        # A free slot is always taken: normal plans keep running, so the moving
+        # average keeps tracking the providers and recovers after a slow burst.
+        # service_sec only decides whether waiting for a slot is worth it.
+        if self.active < self.max_concurrent and not self._waiters:
+            self.active += 1
+            metrics.ADMISSION.labels("admitted").inc()
+            return NORMAL
+        now = time.monotonic()
+        if (len(self._waiters) < self.max_queue
+                and now + self.expected_wait(len(self._waiters)) + self.service_sec <= deadline):
+            if await self._wait(deadline - self.service_sec):
+                metrics.ADMISSION.labels("queued").inc()
+                return NORMAL
+        if self.degraded_active < self.degraded_max:
+            self.degraded_active += 1
+            metrics.ADMISSION.labels("degraded").inc()
+            return DEGRADED
+        metrics.ADMISSION.labels("shed").inc()
+        raise Overloaded(retry_after=max(1, int(self.expected_wait(len(self._waiters)))))
+
+    async def _wait(self, until: float) -> bool:
+        """Queue for a normal slot until `until`; True once a slot has been handed over."""
+        fut = asyncio.get_running_loop().create_future()
+        self._waiters.append(fut)
+        metrics.ADMISSION_QUEUE.inc()
+        try:
+            await asyncio.wait_for(asyncio.shield(fut), timeout=max(0.0, until - time.monotonic()))
+            return True
+        except asyncio.TimeoutError:
+            if fut.done():          # handed over just as the wait ran out
+                return True
+            fut.cancel()
+            return False
+        except asyncio.CancelledError:
+            if fut.done() and not fut.cancelled():
+                self._release(NORMAL, None)   # slot handed to a request that is gone
+            else:
+                fut.cancel()
+            raise
+        finally:
+            metrics.ADMISSION_QUEUE.dec()
+            try:
+                self._waiters.remove(fut)
+            except ValueError:
+                pass
+
+    def _release(self, mode: str, elapsed: Optional[float]) -> None:
+        if mode == DEGRADED:
+            self.degraded_active -= 1
+            return
+        if elapsed is not None:
+            self.service_sec += _EWMA_ALPHA * (elapsed - self.service_sec)
+        while self._waiters:
+            fut = self._waiters.popleft()
+            if not fut.done():
+                fut.set_result(None)   # the slot passes to the waiter; active is unchanged
+                return
+        self.active -= 1
+
+
+def deadline_from(header: str) -> float:
+    """time.monotonic() deadline from an X-Deadline-Ms header value (or PLAN_DEADLINE_MS)."""
+    try:
+        ms = float(header) if header else settings.PLAN_DEADLINE_MS
+    except ValueError:
+        ms = settings.PLAN_DEADLINE_MS
+    return time.monotonic() + max(0.0, ms) / 1000.0
+
+
+def degraded_notes(sources: List[Tuple[str, str]]) -> Tuple[List[str], str]:
+    """
+    Citations and a user-facing message for a degraded plan, from the
+    (kind, source) pairs providers.degraded() collected.
+    """
+    seen = sorted(set(sources))
+    citations = [f"degraded:{kind}:{source}" for kind, source in seen]
+    estimated = sorted({k for k, s in seen if s == "estimate"})
+    cached = sorted({k for k, s in seen if s != "estimate"} - set(estimated))
+    parts = []
+    if estimated:
+        parts.append(f"estimated {', '.join(estimated)}")
+    if cached:
+        parts.append(f"cached {', '.join(cached)}")
+    detail = f" ({'; '.join(parts)})" if parts else ""
+    return citations, f"Planned in degraded mode under high load{detail}. Re-plan later for live quotes."
+
+
+_admission: Optional[Admission] = None
+
+
+def get() -> Admission:
+    global _admission
+    if _admission is None:
+        _admission = Admission()
+    return _admission
@@ -0,0 +1,286 @@
+# backend/agents/optimizer.py
+"""
+Trip structure optimizer: city visiting order and nights per city.
+
+- Order: shortest open path through the cities by train time (speed from
+  routing.SPEEDS_KMH). Exact Held–Karp DP up to EXACT_MAX_CITIES, vectorized
+  over all subsets of one size at a time; nearest-neighbour + 2-opt beyond.
+- Nights: every city gets one night, the rest go one at a time to the city
+  with the largest marginal value, value_c * NIGHT_DECAY ** nights_c
+  (diminishing returns, so greedy is optimal).
+
+Distance matrices and orderings are memoized by coordinates, so repeated
+city sets cost a dict lookup. A 12-city DP takes a few milliseconds.
+
+search_structure() also chooses which cities to keep, for the alternative
+itineraries (OBJECTIVES: cheapest, relaxed, interests): one DP pass yields the
+shortest path of every subset, each subset is scored, and the best wins.
+"""
+import heapq
+from functools import lru_cache
+from typing import Callable, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+from backend.tools.routing import SPEEDS_KMH
+
+EXACT_MAX_CITIES = 12
+NIGHT_DECAY = 0.7
+
+Coord = Tuple[float, float]
+
+
+class TripStructure(NamedTuple):
+    cities: List[str]          # visiting order
+    nights: List[int]          # nights per city, same order
+    leg_minutes: List[int]     # train minutes between consecutive cities
+
+    def day_cities(self) -> List[str]:
+        """City for each night of the trip."""
+        return [c for c, n in zip(self.cities, self.nights) for _ in range(n)]
+
+
+@lru_cache(maxsize=256)
+def travel_matrix(coords: Tuple[Coord, ...], mode: str = "train") -> np.ndarray:
+    """Pairwise travel minutes between coordinates (haversine / mode speed)."""
+    a = np.radians(np.asarray(coords, dtype=np.float64))
+    lat, lon = a[:, 0:1], a[:, 1:2]
+    h = np.sin((lat - lat.T) / 2) ** 2 + np.cos(lat) * np.cos(lat.T) * np.sin((lon - lon.T) / 2) ** 2
+    km = 2 * 6371.0 * np.arcsin(np.sqrt(np.clip(h, 0.0, 1.0)))
+    m = km / SPEEDS_KMH.get(mode, 20.0) * 60.0
+    m.setflags(write=False)
+    return m
+
+
+def _held_karp(d: np.ndarray) -> List[int]:
+    """Exact shortest open path visiting every node once (any start, any end)."""
+    cost, parent = _held_karp_table(d)
+    full = cost.shape[0]
+    return _held_karp_path(cost, parent, full - 1)
+
+
+def _held_karp_path(cost: np.ndarray, parent: np.ndarray, mask: int) -> List[int]:
+    """Shortest open path through the nodes of `mask`, from the DP tables."""
+    j = int(cost[mask].argmin())
+    path = []
+    while j >= 0:
+        path.append(j)
+        mask, j = mask ^ (1 << j), int(parent[mask, j])
+    return path[::-1]
+
+
+def _held_karp_table(d: np.ndarray, should_stop: Callable[[], bool] = lambda: False
+                     ) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    DP tables over every subset: cost[mask, j] is the shortest open path through
+    `mask` ending at j, parent[mask, j] its previous node (-1 at the start).
+    """
+    n = d.shape[0]
+    full = 1 << n
+    cost = np.full((full, n), np.inf)
+    parent = np.full((full, n), -1, dtype=np.int8)
+    for j in range(n):
+        cost[1 << j, j] = 0.0
+
+    masks = np.arange(full)
+    popcount = np.zeros(full, dtype=np.int8)
+    for j in range(n):
+        popcount += (masks >> j) & 1
+
+    for size in range(2, n + 1):
+        if should_stop():
+            raise Stopped()
+        layer = masks[popcount == size]
+        for j in range(n):
+            sel = layer[(layer >> j) & 1 == 1]
+            prev = sel ^ (1 << j)
+            cand = cost[prev] + d[:, j]          # (len(sel), n); inf where k not in prev
+            k = cand.argmin(axis=1)
+            cost[sel, j] = cand[np.arange(len(sel)), k]
+            parent[sel, j] = k
+    return cost, parent
+
+
+def _path_cost(d: np.ndarray, path: Sequence[int]) -> float:
+    return float(sum(d[a, b] for a, b in zip(path, path[1:])))
+
+
+def _nearest_neighbour_2opt(d: np.ndarray) -> List[int]:
+    n = d.shape[0]
+    best: Optional[List[int]] = None
+    for start in range(n):
+        path, left = [start], set(range(n)) - {start}
+        while left:
+            nxt = min(left, key=lambda k: d[path[-1], k])
+            path.append(nxt)
+            left.remove(nxt)
+        if best is None or _path_cost(d, path) < _path_cost(d, best):
+            best = path
+
+    improved = True
+    while improved:
+        improved = False
+        for i in range(n - 1):
+            for k in range(i + 2, n):
+                # reverse best[i+1..k]; open path, so the tail edge may not exist
+                before = d[best[i], best[i + 1]] + (d[best[k], best[k + 1]] if k + 1 < n else 0.0)
+                after = d[best[i], best[k]] + (d[best[i + 1], best[k + 1]] if k + 1 < n else 0.0)
+                if after < before - 1e-9:
+                    best[i + 1:k + 1] = best[i + 1:k + 1][::-1]
+                    improved = True
+    return best
+
+
+@lru_cache(maxsize=1024)
+def _order(coords: Tuple[Coord, ...]) -> Tuple[int, ...]:
+    d = travel_matrix(coords)
+    if len(coords) <= 2:
+        return tuple(range(len(coords)))
+    if len(coords) <= EXACT_MAX_CITIES:
+        return tuple(_held_karp(d))
+    return tuple(_nearest_neighbour_2opt(d))
+
+
+def split_nights(values: Sequence[float], total: int) -> List[int]:
+    """Greedy marginal-value split of `total` nights, at least one per city."""
+    nights = [1] * len(values)
+    heap = [(-v * NIGHT_DECAY, i) for i, v in enumerate(values)]
+    heapq.heapify(heap)
+    for _ in range(total - len(values)):
+        gain, i = heapq.heappop(heap)
+        nights[i] += 1
+        heapq.heappush(heap, (gain * NIGHT_DECAY, i))
+    return nights
+
+
+def optimize(cities: List[str], coords: Dict[str, Coord], nights: int,
+             values: Optional[Dict[str, float]] = None, keep_order: bool = False) -> TripStructure:
+    """
+    Plan the trip structure for `nights` nights over `cities`.
+
+    With fewer nights than cities, the lowest-valued cities are dropped
+    (the trailing ones with keep_order).
+    `values` defaults to 1.0 per city; keep_order skips the route search.
+    """
+    values = values or {}
+    if not keep_order:
+        cities = list(dict.fromkeys(cities))  # de-duplicate, keep first occurrence
+    if keep_order:
+        cities = cities[:max(1, nights)]
+    elif nights < len(cities):
+        keep = set(sorted(cities, key=lambda c: values.get(c, 1.0), reverse=True)[:max(1, nights)])
+        cities = [c for c in cities if c in keep]
+
+    pts = tuple((round(coords[c][0], 4), round(coords[c][1], 4)) for c in cities)
+    order = list(range(len(cities))) if keep_order else list(_order(pts))
+    ordered = [cities[i] for i in order]
+    d = travel_matrix(pts)
+    legs = [int(round(d[a, b])) for a, b in zip(order, order[1:])]
+    split = split_nights([values.get(c, 1.0) for c in ordered], max(nights, len(ordered)))
+    return TripStructure(ordered, split, legs)
+
+
+def from_day_cities(day_cities: List[str], coords: Dict[str, Coord]) -> TripStructure:
+    """TripStructure for a fixed city-per-night sequence (e.g. when re-planning)."""
+    cities: List[str] = []
+    nights: List[int] = []
+    for c in day_cities:
+        if cities and cities[-1] == c:
+            nights[-1] += 1
+        else:
+            cities.append(c)
+            nights.append(1)
+    pts = tuple((round(coords[c][0], 4), round(coords[c][1], 4)) for c in cities)
+    d = travel_matrix(pts)
+    legs = [int(round(d[i, i + 1])) for i in range(len(cities) - 1)]
+    return TripStructure(cities, nights, legs)
+
+
+# --------------------------
+# Alternative structures (CPU-bound; run in the planning pool, see backend/executor.py)
+# --------------------------
+class Stopped(Exception):
+    """The search was cancelled or ran out of its time budget."""
+
+
+class Objective(NamedTuple):
+    interest_weight: float    # exponent on the per-city interest weights
+    hour_penalty: float       # value lost per hour on trains (tickets cost by distance)
+    transfer_penalty: float   # value lost per change of city
+    min_nights: int           # per city, when more than one city is kept
+
+
+OBJECTIVES: Dict[str, Objective] = {
+    "cheapest": Objective(0.0, 1.0, 0.3, 1),
+    "relaxed": Objective(0.0, 0.3, 1.0, 3),
+    "interests": Objective(1.0, 0.05, 0.0, 1),
+}
+
+
+def _split_values(v: np.ndarray, masks: np.ndarray, nights: int) -> np.ndarray:
+    """
+    Value of the greedy night split for each subset: one night per kept city,
+    then the best `nights - k` marginal gains v_c * NIGHT_DECAY ** i (i >= 1)
+    among the kept cities, which is what split_nights() picks.
+    """
+    n = len(v)
+    member = ((masks[:, None] >> np.arange(n)) & 1).astype(bool)          # (m, n)
+    k = member.sum(1)
+    base = (member * v).sum(1)
+    extra_n = max(0, nights - 1)
+    if not extra_n:
+        return base
+    gains = v[:, None] * NIGHT_DECAY ** np.arange(1, extra_n + 1)         # (n, extra_n)
+    g = np.where(member[:, :, None], gains[None], 0.0).reshape(len(masks), -1)
+    g = -np.sort(-g, axis=1)
+    csum = np.concatenate([np.zeros((len(masks), 1)), np.cumsum(g, axis=1)], axis=1)
+    take = np.clip(nights - k, 0, g.shape[1])
+    return base + csum[np.arange(len(masks)), take]
+
+
+def search_structure(d: np.ndarray, values: np.ndarray, interest: np.ndarray, nights: int, objective: Objective,
+                     should_stop: Callable[[], bool] = lambda: False) -> Tuple[List[int], List[int], float]:
+    """
+    Best (order, nights per city, score) over every subset and order of the
+    cities for `objective`. Exact up to EXACT_MAX_CITIES (one Held–Karp pass
+    gives the shortest path of every subset); beyond, the top-k cities by
+    value for each k, ordered by nearest neighbour + 2-opt. Raises Stopped
+    when `should_stop()` turns true.
+    """
+    n = d.shape[0]
+    v = np.asarray(values, np.float64) * np.asarray(interest, np.float64) ** objective.interest_weight
+    v = v / (v.mean() or 1.0)
+    if n <= EXACT_MAX_CITIES:
+        cost, parent = _held_karp_table(d, should_stop)
+        masks = np.arange(1, 1 << n)
+        path_min = cost[masks].min(1)
+        ks = np.array([bin(m).count("1") for m in masks])
+        score = np.full(len(masks), -np.inf)
+        feasible = (ks == 1) | (ks * objective.min_nights <= nights)
+        feasible &= ks <= max(1, nights)
+        for lo in range(0, len(masks), 512):
+            if should_stop():
+                raise Stopped()
+            sl = slice(lo, lo + 512)
+            score[sl] = (_split_values(v, masks[sl], nights) - objective.hour_penalty * path_min[sl] / 60.0
+                         - objective.transfer_penalty * (ks[sl] - 1))
+        score[~feasible] = -np.inf
+        best = int(score.argmax())
+        order = _held_karp_path(cost, parent, int(masks[best]))
+        best_score = float(score[best])
+    else:
+        ranked = list(np.argsort(-v, kind="stable"))
+        best_score, order = -np.inf, ranked[:1]
+        for k in range(1, min(n, max(1, nights)) + 1):
+            if should_stop():
+                raise Stopped()
+            if k > 1 and k * objective.min_nights > nights:
+                break
+            sub = sorted(ranked[:k])
+            path = [sub[i] for i in (_nearest_neighbour_2opt(d[np.ix_(sub, sub)]) if k > 2 else range(k))]
+            mask_value = _split_values(v[sub], np.array([(1 << k) - 1]), nights)[0]
+            s = mask_value - objective.hour_penalty * _path_cost(d, path) / 60.0 - objective.transfer_penalty * (k - 1)
+            if s > best_score:
+                best_score, order = s, path
+    split = split_nights([v[i] for i in order], max(nights, len(order)))
+    return [int(i) for i in order], split, best_score
@@ -1,40 +1,26 @@
 # backend/agents/planner.py
+import asyncio
+import math
 from datetime import datetime, timedelta
-from typing import List
+from functools import partial
+from typing import Dict, List, Optional, Tuple
 
 from backend.models import PlanRequest, PlanResponse, DayPlan, Activity
 from backend.config import settings
+from backend import metrics, capture
 
 # --------------------------
-# Provider switches (imports)
+# Providers
 # --------------------------
+# Chosen from the PROVIDER_* switches and imported on first use (see registry);
+# calls go through the cached provider layer.
+from backend.tools import registry, providers, retrieval, inventory, hedge
 
-# Weather provider
-if getattr(settings, "PROVIDER_WEATHER", "openmeteo") == "openweather":
-    from backend.tools.weather_openweather import forecast  # OpenWeather (requires key)
-else:
-    from backend.tools.weather import forecast  # Open-Meteo (no key)
-
-# Flights provider (live or mock)
-if getattr(settings, "PROVIDER_FLIGHTS", "mock") == "skyscanner":
-    from backend.tools.flights_skyscanner import flight_eur  # RapidAPI Skyscanner
-elif getattr(settings, "PROVIDER_FLIGHTS", "mock") == "amadeus":
-    from backend.tools.flights_amadeus import flight_eur     # Amadeus
-else:
-    from backend.tools.pricing import flight_eur             # mock fallback (always available)
-
-# Always keep mock flight for fallback in case live provider fails at runtime
-from backend.tools.pricing import flight_eur as mock_flight_eur
-
-# Hotels / Places
-if getattr(settings, "PROVIDER_MAPS", "google") == "google":
-    # Your Google Places-based hotel stub (replace with real Places later)
-    from backend.tools.hotels_google import nightly_hotel
-else:
-    from backend.tools.hotels import nightly_hotel  # mock hotels
-
-# Optional routing helper (not yet used in naive plan)
-from backend.tools.routing import estimate_minutes
+# Trip structure (city order + nights) and the feedback-based city values it uses;
+# alternative structures are searched in a process pool
+from backend.agents import optimizer
+from backend import executor
+from backend.db.feedback_agg import load_scores
 
 
 # --------------------------
@@ -61,58 +47,143 @@ CITY_IATA = {
 # --------------------------
 # Planner
 # --------------------------
-async def plan_itinerary(req: PlanRequest) -> PlanResponse:
+async def _city_values(cities: List[str]) -> Dict[str, float]:
+    """Smoothed feedback rating per city; empty (all equal) when there is no data."""
+    try:
+        scores = await load_scores()
+    except Exception as e:
+        print(f"[planner] feedback scores unavailable: {e}")
+        return {}
+    return {c: s for c in cities if (s := scores.score(c)) > 0}
+
+
+def trip_dates(req: PlanRequest) -> List[str]:
+    if not req.origin:
+        raise ValueError("origin is required (or save a home_airport in the user's preferences)")
     start = datetime.fromisoformat(req.start_date)
     end = datetime.fromisoformat(req.end_date)
     days_n = (end - start).days
     if days_n <= 0:
         raise ValueError("end_date must be after start_date")
+    return [(start + timedelta(days=i)).date().isoformat() for i in range(days_n)]
 
-    per_day_budget = req.budget_eur / max(1, days_n)
 
-    total_cost: float = 0.0
-    plans: List[DayPlan] = []
-    citations: List[str] = []
+def _coords(cities: List[str]) -> Dict[str, tuple]:
+    default_coords = CITY_COORDS.get(cities[0], CITY_COORDS["Paris"])
+    return {c: CITY_COORDS.get(c, default_coords) for c in cities}
+
+
+# Hotels are looked up uncapped; see _hotel()
+HOTEL_QUERY_MAX_EUR = 100_000
 
-    # ----- Flight estimate to first city -----
-    first_city = req.cities[0]
-    dest_code = CITY_IATA.get(first_city, first_city)  # prefer IATA if we know it
 
+def hotel_cap(req: PlanRequest, days_n: int) -> int:
+    """Hotel price cap — ~60% of the daily budget."""
+    return int(req.budget_eur / max(1, days_n) * 0.6)
+
+
+async def _flight_leg(req: PlanRequest, dest_code: str) -> Tuple[dict, List[str], bool]:
+    """
+    Flight estimate to the first city, the citations it contributes, and
+    whether a fallback was down to a transient provider error (worth a retry).
+    """
+    flights_label = registry.label("flights")
+    citations: List[str] = []
+    transient = False
     # Try live provider; if bad or zero, fall back to mock to keep UX smooth
-    try:
-        flight_quote = flight_eur(req.origin, dest_code, req.start_date)
-        price = float(flight_quote.get("price_eur", 0.0))
-        if price <= 0.0:
-            # surface provider error text if present and fall back
-            err = flight_quote.get("error", "")
-            raise ValueError(f"no price from provider: {err}")
-    except Exception as e:
-        flight_quote = mock_flight_eur(req.origin, dest_code, req.start_date)
-        citations.append(f"skyscanner-fallback:{type(e).__name__}:{str(e)[:120]}")
+    with metrics.stage("flight"):
+        try:
+            with metrics.provider_call(flights_label) as call:
+                flight_quote = await capture.call("flight", providers.flight, req.origin, dest_code, req.start_date)
+                price = float(flight_quote.get("price_eur", 0.0))
+                if price <= 0.0:
+                    # surface provider error text if present and fall back
+                    err = flight_quote.get("error", "")
+                    transient = bool(flight_quote.get("transient"))
+                    raise ValueError(f"no price from provider: {err}")
+                if flight_quote.get("cached"):
+                    call.outcome = "hit"
+        except Exception as e:
+            transient = transient or hedge.transient(e)
+            with metrics.provider_call(registry.label("flights", "mock")) as call:
+                call.outcome = "fallback"
+                # Always keep mock flight for fallback in case live provider fails at runtime
+                flight_quote = await capture.call("flight_mock", partial(providers.flight, name="mock"), req.origin, dest_code, req.start_date)
+            metrics.FALLBACKS.labels(flights_label, type(e).__name__).inc()
+            citations.append(f"skyscanner-fallback:{type(e).__name__}:{str(e)[:120]}")
 
-    total_cost += float(flight_quote.get("price_eur", 0.0))
     if flight_quote.get("url"):
         citations.append(flight_quote["url"])
     if flight_quote.get("error"):
         citations.append(f"skyscanner-error:{flight_quote['error'][:140]}")
+    return flight_quote, citations, transient
+
 
-    # ----- Per-day planning -----
-    for i in range(days_n):
-        date = (start + timedelta(days=i)).date().isoformat()
-        # simple: stick in first city for day 1, second city for day 2+, etc.
-        city = req.cities[min(i, len(req.cities) - 1)]
-        lat, lon = CITY_COORDS.get(city, CITY_COORDS.get(first_city))
+async def _weather(lat: float, lon: float, date: str) -> dict:
+    weather_label = registry.label("weather")
+    with metrics.stage("weather"), metrics.provider_call(weather_label) as call:
+        w = await capture.call("weather", providers.weather, lat, lon, date)
+        if w.get("fallback"):
+            call.outcome = "fallback"
+        elif w.get("climatology"):
+            call.outcome = "climatology"
+        elif w.get("cached"):
+            call.outcome = "hit"
+    if w.get("fallback"):
+        metrics.FALLBACKS.labels(weather_label, "defaults").inc()
+    return w
 
-        # Weather (provider-selected above)
-        w = await forecast(lat, lon, date)
 
-        # Hotel estimate — cap ~60% of daily budget
-        hotel = nightly_hotel(city, date, req.party_size, max_price=int(per_day_budget * 0.6))
-        total_cost += float(hotel.get("price_eur", 0.0))
-        if hotel.get("url"):
-            citations.append(hotel["url"])
+async def _hotel(city: str, date: str, party_size: int) -> dict:
+    """
+    Uncapped hotel quote. The budget cap is applied afterwards (the providers
+    only clamp to it), so the lookup stays valid, and cacheable, across budgets.
+    """
+    with metrics.stage("hotel"), metrics.provider_call(registry.label("hotels")) as call:
+        hotel = await capture.call("hotel", providers.hotel, city, date, party_size, HOTEL_QUERY_MAX_EUR)
+        if "fallback" in hotel.get("provider", ""):
+            call.outcome = "fallback"
+        elif hotel.get("cached"):
+            call.outcome = "hit"
+    return hotel
 
-        # Naive daily schedule (replace with optimizer later)
+
+def _poi_points(city: str, interests: List[str]) -> List[Tuple[float, float]]:
+    """(lat, lon) of the city's best catalog POIs for the interests; [] without a catalog."""
+    r = retrieval.retriever()
+    if r is None:
+        return []
+    hits = r.search(city, interests=interests, k=settings.HOTEL_NEAR_POIS)
+    pts = [(float(r.cat.lat[i]), float(r.cat.lon[i])) for i, _ in hits]
+    return [p for p in pts if not math.isnan(p[0])]
+
+
+def _stay(city: str, date: str, party_size: int, cap: int, near: List[Tuple[float, float]]) -> Optional[dict]:
+    """Best-rated inventory hotel under the cap near the POIs, as a hotel quote; None if there is none."""
+    if not settings.HOTEL_INVENTORY_ENABLED:
+        return None
+    with metrics.stage("inventory"):
+        h = inventory.best(city, cap, near)
+    if h is None:
+        return None
+    return {
+        "provider": "inventory:" + ",".join(h["sources"]),
+        "city": city,
+        "checkin": date,
+        "nights": 1,
+        "guests": party_size,
+        "price_eur": h["price_eur"],
+        "price_source": h["price_source"],
+        "rating": h["rating"],
+        "name": h["name"],
+        "distance_km": h["distance_km"],
+        "url": h["url"],
+    }
+
+
+def _schedule(city: str, date: str, w: dict, lodging_eur: float) -> DayPlan:
+    # Naive daily schedule (replace with optimizer later)
+    with metrics.stage("schedule"):
         acts: List[Activity] = [
             Activity(
                 title=f"Morning stroll in {city}",
@@ -121,6 +192,7 @@ async def plan_itinerary(req: PlanRequest) -> PlanResponse:
                 end_time=f"{date} 11:30",
                 cost_eur=0.0,
                 transport_mode="walk",
+                outdoor=True,
             ),
             Activity(
                 title="Lunch: local specialty",
@@ -145,21 +217,192 @@ async def plan_itinerary(req: PlanRequest) -> PlanResponse:
                 end_time=f"{date} 21:00",
                 cost_eur=45.0,
                 transport_mode="walk",
+                outdoor=True,
             ),
         ]
-        total_cost += 25 + 18 + 45
-        plans.append(DayPlan(date=date, city=city, activities=acts))
-
-    # ----- Summary -----
-    summary = (
-        f"{days_n} days across {', '.join(req.cities)}. "
-        f"Flight estimate to {first_city}: €{float(flight_quote.get('price_eur', 0.0)):.2f}. "
-        f"Daily budget ~€{per_day_budget:.0f}."
-    )
-
-    return PlanResponse(
-        summary=summary,
-        total_cost_estimate_eur=round(total_cost, 2),
-        days=plans,
-        citations=citations,
-    )
\ No newline at end of file
+        return DayPlan(date=date, city=city, activities=acts, lodging_eur=lodging_eur,
+                       rain_risk=w.get("rain_risk"))
+
+
+def _interest_weights(cities: List[str], interests: List[str]) -> List[float]:
+    """1 + log(1 + catalog POIs matching the interests) per city; all 1.0 without a catalog."""
+    r = retrieval.retriever()
+    if r is None or not interests:
+        return [1.0] * len(cities)
+    return [1.0 + math.log1p(len(r.candidates(c, interests))) for c in cities]
+
+
+async def _alternatives(req: PlanRequest, coords: Dict[str, tuple], nights: int,
+                        values: Dict[str, float]) -> List[dict]:
+    """
+    Alternative trip structures (cheapest, relaxed, interests) from the planning
+    pool; [] when the pool is off, saturated or over its time budget.
+    """
+    cities = list(dict.fromkeys(req.cities))
+    pts = tuple((round(coords[c][0], 4), round(coords[c][1], 4)) for c in cities)
+    d = optimizer.travel_matrix(pts)
+    try:
+        with metrics.stage("alternatives"):
+            found = await executor.get().alternatives(
+                d, nights, [values.get(c, 1.0) for c in cities],
+                await capture.call("interest_weights", _interest_weights, cities, req.interests))
+    except Exception as e:
+        print(f"[planner] alternatives unavailable: {e}")
+        return []
+    out = []
+    for name, (order, split, score) in found.items():
+        legs = [int(round(d[a, b])) for a, b in zip(order, order[1:])]
+        out.append({"objective": name, "cities": [cities[i] for i in order], "nights": split,
+                    "train_minutes": sum(legs), "score": round(score, 3)})
+    return out
+
+
+async def build_plan(req: PlanRequest, day_cities: Optional[List[str]] = None,
+                     previous: Optional[dict] = None,
+                     city_values: Optional[Dict[str, float]] = None) -> Tuple[PlanResponse, dict, List[dict]]:
+    """
+    Plan a trip and return (response, state, diff).
+
+    `state` holds the per-day provider answers so a later re-plan can reuse
+    them. With `previous` (an earlier state), a day keeps its weather when
+    its date and city are unchanged, and its hotel quote when the party size
+    is unchanged too; the flight is reused when origin, destination and date
+    match. Budget changes only re-apply the hotel cap. Hotels found in the
+    local inventory (best-rated under the cap near the city's POIs) are
+    looked up again on every plan; they cost no provider call.
+    `day_cities` fixes the city for each night (all from req.cities)
+    instead of optimizing.
+    `city_values` (city -> feedback value) replaces the feedback_stats
+    lookup; offline tools pass {} so they never open a DB connection.
+    `diff` lists, per date, what happened relative to `previous`.
+    """
+    dates = trip_dates(req)
+    days_n = len(dates)
+    per_day_budget = req.budget_eur / max(1, days_n)
+    cap = hotel_cap(req, days_n)
+    alt_task: Optional["asyncio.Task"] = None
+
+    # ----- Trip structure: visiting order and nights per city -----
+    coords = _coords(req.cities)
+    if day_cities is not None:
+        trip = optimizer.from_day_cities(day_cities, coords)
+    else:
+        values = city_values
+        if values is None:
+            # Recorded like a provider call, so replays do not read the DB
+            multi = len(set(req.cities)) > 1
+            values = await capture.call("city_values", _city_values, req.cities) if multi else {}
+        with metrics.stage("optimize"):
+            trip = optimizer.optimize(req.cities, coords, days_n, values=values, keep_order=req.keep_city_order)
+        day_cities = trip.day_cities()
+        if not req.keep_city_order and len(set(req.cities)) > 1:
+            # Searched in the planning pool while the provider lookups below run
+            alt_task = asyncio.create_task(_alternatives(req, coords, days_n, values))
+
+    try:
+        prev_days = {d["date"]: d for d in (previous or {}).get("days", [])}
+
+        total_cost: float = 0.0
+        plans: List[DayPlan] = []
+        citations: List[str] = []
+        diff: List[dict] = []
+
+        # ----- Flight estimate to first city -----
+        first_city = trip.cities[0]
+        dest_code = CITY_IATA.get(first_city, first_city)  # prefer IATA if we know it
+        flight_key = [req.origin, dest_code, req.start_date]
+        prev_flight = (previous or {}).get("flight")
+        if prev_flight and prev_flight["key"] == flight_key:
+            flight_quote, flight_citations = prev_flight["quote"], prev_flight["citations"]
+            flight_retryable = prev_flight.get("retryable", False)
+        else:
+            flight_quote, flight_citations, flight_retryable = await _flight_leg(req, dest_code)
+        total_cost += float(flight_quote.get("price_eur", 0.0))
+        citations.extend(flight_citations)
+
+        # ----- Per-day planning -----
+        state_days: List[dict] = []
+        poi_points: Dict[str, List[Tuple[float, float]]] = {}
+        for date, city in zip(dates, day_cities):
+            lat, lon = coords[city]
+            prev = prev_days.get(date)
+            same_city = prev is not None and prev["city"] == city
+            redone: List[str] = []
+
+            if same_city:
+                w = prev["weather"]
+            else:
+                w = await _weather(lat, lon, date)
+                redone.append("weather")
+
+            # The local inventory answers within the cap without a provider call.
+            # Catalog and inventory reads are recorded like one, so replays don't need the local data.
+            if city not in poi_points:
+                poi_points[city] = await capture.call("poi_points", _poi_points, city, req.interests)
+            stay = await capture.call("hotel_inventory", _stay, city, date, req.party_size, cap, poi_points[city])
+            if stay is not None:
+                quote = stay
+            elif (same_city and prev["party_size"] == req.party_size
+                  and not prev["hotel"].get("provider", "").startswith("inventory")):
+                quote = prev["hotel"]
+            else:
+                quote = await _hotel(city, date, req.party_size)
+                redone.append("hotel")
+            hotel = dict(quote, price_eur=min(cap, float(quote.get("price_eur", 0.0))))
+            total_cost += float(hotel.get("price_eur", 0.0))
+            if hotel.get("url"):
+                citations.append(hotel["url"])
+
+            plans.append(_schedule(city, date, w, hotel["price_eur"]))
+            total_cost += 25 + 18 + 45
+            state_days.append({"date": date, "city": city, "party_size": req.party_size,
+                               "weather": w, "hotel": quote, "hotel_price": hotel["price_eur"]})
+
+            if previous is not None:
+                if prev is None:
+                    status = "added"
+                elif redone or prev.get("hotel_price") != hotel["price_eur"]:
+                    status = "changed"
+                else:
+                    status = "unchanged"
+                diff.append({"date": date, "status": status, "city": city,
+                             "previous_city": prev["city"] if prev else None, "recomputed": redone})
+
+        if previous is not None:
+            diff.extend({"date": d, "status": "removed", "city": None, "previous_city": p["city"], "recomputed": []}
+                        for d, p in sorted(prev_days.items()) if d not in set(dates))
+
+        # ----- Summary -----
+        route = " → ".join(f"{c} ({n}n)" for c, n in zip(trip.cities, trip.nights))
+        train_min = sum(trip.leg_minutes)
+        trains = f", ~{train_min // 60}h{train_min % 60:02d} by train" if train_min else ""
+        summary = (
+            f"{days_n} days: {route}{trains}. "
+            f"Flight estimate to {first_city}: €{float(flight_quote.get('price_eur', 0.0)):.2f}. "
+            f"Daily budget ~€{per_day_budget:.0f}."
+        )
+
+        response = PlanResponse(
+            summary=summary,
+            total_cost_estimate_eur=round(total_cost, 2),
+            days=plans,
+            citations=citations,
+        )
+        state = {
+            "request": req.model_dump(),
+            "day_cities": day_cities,
+            "flight": {"key": flight_key, "quote": flight_quote, "citations": flight_citations,
+                       "retryable": flight_retryable},
+            "days": state_days,
+            "alternatives": await alt_task if alt_task is not None else [],
+        }
+    finally:
+        # A failed lookup must not leave the search holding a pool slot
+        if alt_task is not None and not alt_task.done():
+            alt_task.cancel()
+    return response, state, diff
+
+
+async def plan_itinerary(req: PlanRequest, city_values: Optional[Dict[str, float]] = None) -> PlanResponse:
+    response, _, _ = await build_plan(req, city_values=city_values)
+    return response
@@ -0,0 +1,46 @@
+# backend/agents/replanner.py
+"""
+Incremental re-planning: apply a PlanDelta to a stored plan and recompute
+only what it invalidates.
+
+The city for each night is carried over where possible: swapped cities take
+the place of the old ones, days added before/after the old range go to the
+first/last city, removed days just disappear. Only when the set of cities
+changes (or the new dates don't overlap the old ones) is the route
+re-optimized. build_plan() then reuses per-day weather, hotels and the
+flight from the previous state wherever their inputs are unchanged.
+"""
+from typing import Dict, List, Optional, Tuple
+
+from backend.agents.planner import build_plan, trip_dates
+from backend.models import PlanDelta, PlanRequest, PlanResponse
+
+
+def apply_delta(previous: PlanRequest, delta: PlanDelta) -> PlanRequest:
+    update = delta.model_dump(exclude_unset=True, exclude={"swap_cities"})
+    req = previous.model_copy(update={k: v for k, v in update.items() if v is not None})
+    if delta.swap_cities:
+        req = req.model_copy(update={"cities": [delta.swap_cities.get(c, c) for c in req.cities]})
+    return PlanRequest(**req.model_dump())  # re-validate
+
+
+def carry_over_cities(state: dict, req: PlanRequest, swaps: Dict[str, str]) -> Optional[List[str]]:
+    """City per night for `req` derived from the previous plan, or None to re-optimize."""
+    old = PlanRequest(**state["request"])
+    if old.keep_city_order != req.keep_city_order:
+        return None
+    by_date = {d: swaps.get(c, c) for d, c in zip(trip_dates(old), state["day_cities"])}
+    dates = trip_dates(req)
+    if not any(d in by_date for d in dates):
+        return None
+    first, last = min(by_date), max(by_date)
+    cities = [by_date.get(d) or by_date[first if d < first else last] for d in dates]
+    if set(cities) != set(req.cities):
+        return None
+    return cities
+
+
+async def replan(state: dict, req: PlanRequest, swaps: Dict[str, str]) -> Tuple[PlanResponse, dict, List[dict]]:
+    """Re-plan `state` as `req` (see apply_delta); returns (response, new state, per-day diff)."""
+    day_cities = carry_over_cities(state, req, swaps)
+    return await build_plan(req, day_cities=day_cities, previous=state)
@@ -0,0 +1,110 @@
+# backend/cache.py
+"""
+Shared TTL cache for provider responses.
+
+Entries live in a bounded per-process LRU and, when Redis is configured, in
+Redis too so every worker sees them. Each entry remembers when it expires and
+who wrote it ("live" or "prefetch"); a prefetched entry also remembers when
+the entry it replaced would have expired. Expired entries are kept for a grace
+period so callers can opt into stale data when the provider is struggling.
+Redis values use the binary codec in backend/codec.py.
+"""
+import time
+from collections import OrderedDict
+from typing import Any, Optional
+
+from backend import codec
+from backend.config import settings
+
+
+class Entry:
+    __slots__ = ("value", "expires_at", "source", "replaced_until")
+
+    def __init__(self, value: Any, expires_at: float, source: str = "live", replaced_until: float = 0.0):
+        self.value = value
+        self.expires_at = expires_at
+        self.source = source
+        self.replaced_until = replaced_until
+
+    @property
+    def fresh(self) -> bool:
+        return time.time() < self.expires_at
+
+    def ttl_left(self) -> float:
+        return self.expires_at - time.time()
+
+
+class TTLCache:
+    def __init__(self, namespace: str, maxsize: int = settings.CACHE_LOCAL_MAXSIZE,
+                 stale_grace_sec: int = settings.CACHE_STALE_GRACE_SEC):
+        self.namespace = namespace
+        self.maxsize = maxsize
+        self.stale_grace_sec = stale_grace_sec
+        self._local: "OrderedDict[str, Entry]" = OrderedDict()
+
+    def _rkey(self, key: str) -> str:
+        return f"{self.namespace}:{key}"
+
+    async def get_entry(self, key: str, allow_stale: bool = False) -> Optional[Entry]:
+        """
+        Look up an entry; expired ones only come back with allow_stale. A local
+        entry that has expired is checked against Redis, where another worker
+        or the prefetcher may have stored a newer one.
+        """
+        entry = self._local.get(key)
+        if entry is not None:
+            self._local.move_to_end(key)
+        if entry is None or not entry.fresh:
+            shared = await self._redis_get(key)
+            if shared is not None and (entry is None or shared.expires_at > entry.expires_at):
+                entry = shared
+                self._put_local(key, entry)
+        if entry is None:
+            return None
+        if entry.fresh or (allow_stale and entry.expires_at + self.stale_grace_sec > time.time()):
+            return entry
+        return None
+
+    async def get(self, key: str) -> Any:
+        entry = await self.get_entry(key)
+        return entry.value if entry else None
+
+    async def set(self, key: str, value: Any, ttl: float, source: str = "live",
+                  replaced_until: float = 0.0) -> None:
+        entry = Entry(value, time.time() + ttl, source, replaced_until)
+        self._put_local(key, entry)
+        await self._redis_set(key, entry, ttl)
+
+    def _put_local(self, key: str, entry: Entry) -> None:
+        self._local[key] = entry
+        self._local.move_to_end(key)
+        while len(self._local) > self.maxsize:
+            self._local.popitem(last=False)
+
+    async def _redis_get(self, key: str) -> Optional[Entry]:
+        from backend.deps import aredis
+        if aredis is None:
+            return None
+        try:
+            raw = await aredis.get(self._rkey(key))
+        except Exception:
+            return None
+        if not raw:
+            return None
+        try:
+            d = codec.loads(raw)
+        except codec.CodecError:
+            return None
+        if isinstance(d, dict):  # pre-codec JSON entry
+            return Entry(d["v"], d["exp"], d.get("src", "live"))
+        return Entry(*d)
+
+    async def _redis_set(self, key: str, entry: Entry, ttl: float) -> None:
+        from backend.deps import aredis
+        if aredis is None:
+            return
+        try:
+            body = codec.dumps((entry.value, entry.expires_at, entry.source, entry.replaced_until))
+            await aredis.setex(self._rkey(key), int(ttl + self.stale_grace_sec), body)
+        except Exception:
+            pass
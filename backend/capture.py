@@ -0,0 +1,166 @@
+# backend/capture.py
+"""
+Traffic capture and deterministic replay of provider calls.
+
+The planner routes every provider call through `await capture.call(kind, fn, *args)`.
+
+- Normally that is a plain call.
+- With CAPTURE_ENABLED=1, /plan opens a CaptureSession; each call's arguments,
+  response (or error) and latency are appended, and the finished request is
+  written as one JSON line to a size-rotated log (CAPTURE_PATH).
+- During replay (python -m backend.replay) a ReplaySession answers calls from
+  the log instead, so no provider or network is touched.
+"""
+import asyncio
+import atexit
+import hashlib
+import inspect
+import json
+import logging
+import logging.handlers
+import queue
+import random
+import time
+from collections import defaultdict, deque
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+from backend.config import settings
+
+
+class ReplayMiss(RuntimeError):
+    """A provider call was not found in the recording."""
+
+
+class CaptureSession:
+    __slots__ = ("seed", "calls")
+
+    def __init__(self, seed: str):
+        self.seed = seed
+        self.calls: List[dict] = []
+
+
+class ReplaySession:
+    """Serves recorded calls back in order, per (kind, args)."""
+
+    def __init__(self, calls: List[dict], recorded_timing: bool = False):
+        self.recorded_timing = recorded_timing
+        self._calls: Dict[Tuple[str, str], Deque[dict]] = defaultdict(deque)
+        for c in calls:
+            self._calls[(c["kind"], _args_key(c["args"]))].append(c)
+
+    async def replay(self, kind: str, args: tuple) -> Any:
+        pending = self._calls.get((kind, _args_key(list(args))))
+        if not pending:
+            raise ReplayMiss(f"no recorded {kind} call for {list(args)}")
+        c = pending.popleft()
+        if self.recorded_timing:
+            await asyncio.sleep(c.get("elapsed_ms", 0.0) / 1000.0)
+        if "error" in c:
+            # Same exception class name, so fallbacks and citations match the original run
+            err_type = type(c["error"]["type"], (Exception,), {})
+            raise err_type(c["error"]["message"])
+        return c["response"]
+
+
+_session: ContextVar[Optional[object]] = ContextVar("capture_session", default=None)
+
+
+def _args_key(args: list) -> str:
+    return json.dumps(args, sort_keys=True, default=str)
+
+
+async def call(kind: str, fn: Callable, *args) -> Any:
+    """Invoke a provider function (sync or async) under the current session."""
+    sess = _session.get()
+    if isinstance(sess, ReplaySession):
+        return await sess.replay(kind, args)
+    if sess is None:
+        res = fn(*args)
+        return await res if inspect.isawaitable(res) else res
+
+    t0 = time.perf_counter()
+    entry: Dict[str, Any] = {"kind": kind, "args": list(args)}
+    try:
+        res = fn(*args)
+        if inspect.isawaitable(res):
+            res = await res
+        entry["response"] = res
+        return res
+    except Exception as e:
+        entry["error"] = {"type": type(e).__name__, "message": str(e)}
+        raise
+    finally:
+        entry["elapsed_ms"] = round((time.perf_counter() - t0) * 1000.0, 3)
+        sess.calls.append(entry)
+
+
+def request_seed(payload: dict) -> str:
+    """Stable seed for a request: identical payloads get identical mock results."""
+    return hashlib.sha1(json.dumps(payload, sort_keys=True).encode()).hexdigest()[:16]
+
+
+def result_digest(result: dict) -> str:
+    return hashlib.sha1(json.dumps(result, sort_keys=True, default=str).encode()).hexdigest()
+
+
+# --------------------------
+# Capture log
+# --------------------------
+_logger: Optional[logging.Logger] = None
+
+
+def _capture_logger() -> logging.Logger:
+    """Rotating JSONL writer; file I/O happens on a listener thread, off the event loop."""
+    global _logger
+    if _logger is None:
+        file_handler = logging.handlers.RotatingFileHandler(
+            settings.CAPTURE_PATH,
+            maxBytes=settings.CAPTURE_MAX_BYTES,
+            backupCount=settings.CAPTURE_BACKUPS,
+            encoding="utf-8",
+        )
+        file_handler.setFormatter(logging.Formatter("%(message)s"))
+        q: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+        listener = logging.handlers.QueueListener(q, file_handler)
+        listener.start()
+        atexit.register(listener.stop)  # flush queued lines on shutdown
+        logger = logging.getLogger("tcopilot.capture")
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+        logger.addHandler(logging.handlers.QueueHandler(q))
+        _logger = logger
+    return _logger
+
+
+def start(seed: str) -> Optional[CaptureSession]:
+    """Begin capturing this request if capture is enabled (and sampled in)."""
+    if not settings.CAPTURE_ENABLED or random.random() >= settings.CAPTURE_SAMPLE_RATE:
+        return None
+    sess = CaptureSession(seed)
+    _session.set(sess)
+    return sess
+
+
+def finish(sess: Optional[CaptureSession], request: dict, result: Optional[dict], elapsed_ms: float, error: str = "") -> None:
+    if sess is None:
+        return
+    _session.set(None)
+    line = {
+        "ts": datetime.now(timezone.utc).isoformat(timespec="milliseconds"),
+        "seed": sess.seed,
+        "request": request,
+        "calls": sess.calls,
+        "elapsed_ms": round(elapsed_ms, 3),
+        "result_sha1": result_digest(result) if result is not None else None,
+    }
+    if error:
+        line["error"] = error
+    _capture_logger().info(json.dumps(line, default=str))
+
+
+def start_replay(calls: List[dict], recorded_timing: bool = False) -> ReplaySession:
+    sess = ReplaySession(calls, recorded_timing)
+    _session.set(sess)
+    return sess
@@ -0,0 +1,273 @@
+# backend/codec.py
+"""
+Versioned binary codec for cached values (provider payloads, stored plans).
+
+    blob = codec.dumps(value)      # bytes for Redis
+    value = codec.loads(blob)
+
+Layout: b"TC" | version (1 byte) | flags (1 byte) | [zstd dict id, 4 bytes] | body
+
+- body is msgpack; flags bit 0 = zstd-compressed, bit 1 = with a shared dictionary
+- plans travel as PlanRecord (msgpack ext type 1): positional tuples instead of
+  dicts, so the Activity/DayPlan field names are not repeated per activity
+- values without the header are read as legacy JSON, so existing Redis
+  entries stay readable during a rollout
+
+Compression needs the optional `zstandard` package. A dictionary trained on
+typical plans (python -m backend.codec train) makes small values compress
+well; it is loaded from CODEC_DICT_PATH when that file exists. Unknown
+dictionary IDs or versions raise CodecError, which caches treat as a miss.
+"""
+import argparse
+import asyncio
+import json
+import os
+import struct
+import threading
+from collections import namedtuple
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+import msgpack
+
+from backend.config import settings
+from backend.models import Activity, DayPlan, PlanResponse
+
+try:
+    import zstandard
+except ImportError:  # optional; values are stored uncompressed without it
+    zstandard = None
+
+MAGIC = b"TC"
+VERSION = 1
+F_ZSTD = 0x01
+F_DICT = 0x02
+EXT_PLAN = 1
+
+
+class CodecError(ValueError):
+    """A cached value could not be decoded (unknown version or dictionary)."""
+
+
+# --------------------------
+# Tuple-backed plan records
+# --------------------------
+ACTIVITY_FIELDS = tuple(Activity.model_fields)
+
+ActivityRec = namedtuple("ActivityRec", ACTIVITY_FIELDS)
+
+
+class DayRec(NamedTuple):
+    date: str
+    city: str
+    lodging_eur: float
+    rain_risk: Optional[float]
+    activities: Tuple[ActivityRec, ...]
+
+
+class PlanRecord(NamedTuple):
+    """In-process form of a cached plan: plain tuples, no pydantic objects."""
+    summary: str
+    total_cost_estimate_eur: float
+    citations: Tuple[str, ...]
+    days: Tuple[DayRec, ...]
+
+    @classmethod
+    def from_response(cls, resp: PlanResponse) -> "PlanRecord":
+        return cls(
+            resp.summary,
+            resp.total_cost_estimate_eur,
+            tuple(resp.citations),
+            tuple(
+                DayRec(d.date, d.city, d.lodging_eur, d.rain_risk,
+                       tuple(ActivityRec(*(getattr(a, f) for f in ACTIVITY_FIELDS)) for a in d.activities))
+                for d in resp.days
+            ),
+        )
+
+    def to_response(self) -> PlanResponse:
+        # model_construct skips validation: records only ever come from valid responses
+        return PlanResponse.model_construct(
+            summary=self.summary,
+            total_cost_estimate_eur=self.total_cost_estimate_eur,
+            citations=list(self.citations),
+            days=[
+                DayPlan.model_construct(
+                    date=d.date, city=d.city, lodging_eur=d.lodging_eur, rain_risk=d.rain_risk,
+                    activities=[Activity.model_construct(**a._asdict()) for a in d.activities],
+                )
+                for d in self.days
+            ],
+        )
+
+    @classmethod
+    def from_packed(cls, row: list) -> "PlanRecord":
+        summary, total, citations, days = row
+        return cls(summary, total, tuple(citations), tuple(
+            DayRec(d[0], d[1], d[2], d[3], tuple(ActivityRec(*a) for a in d[4])) for d in days
+        ))
+
+
+def _default(obj: Any) -> Any:
+    # pack() runs with strict_types, so tuples (incl. PlanRecord, a tuple) land here
+    if isinstance(obj, PlanResponse):
+        obj = PlanRecord.from_response(obj)
+    if isinstance(obj, PlanRecord):
+        return msgpack.ExtType(EXT_PLAN, msgpack.packb(obj, use_bin_type=True))
+    if isinstance(obj, tuple):
+        return list(obj)
+    raise TypeError(f"cannot encode {type(obj).__name__}")
+
+
+def _ext_hook(code: int, data: bytes) -> Any:
+    if code == EXT_PLAN:
+        return PlanRecord.from_packed(msgpack.unpackb(data, raw=False))
+    return msgpack.ExtType(code, data)
+
+
+def pack(value: Any) -> bytes:
+    """msgpack body only (no header, no compression)."""
+    return msgpack.packb(value, default=_default, use_bin_type=True, strict_types=True)
+
+
+def unpack(body: bytes) -> Any:
+    return msgpack.unpackb(body, ext_hook=_ext_hook, raw=False, strict_map_key=False)
+
+
+# --------------------------
+# Compression dictionaries
+# --------------------------
+_dicts: Dict[int, "zstandard.ZstdCompressionDict"] = {}
+_active_dict_id: Optional[int] = None
+
+
+def load_dict(path: str, activate: bool = True) -> int:
+    """Register a trained dictionary; returns its ID. Older IDs stay decodable."""
+    global _active_dict_id
+    if zstandard is None:
+        raise RuntimeError("zstandard is not installed")
+    with open(path, "rb") as f:
+        d = zstandard.ZstdCompressionDict(f.read())
+    _dicts[d.dict_id()] = d
+    if activate:
+        _active_dict_id = d.dict_id()
+    return d.dict_id()
+
+
+if zstandard is not None and settings.CODEC_DICT_PATH and os.path.exists(settings.CODEC_DICT_PATH):
+    try:
+        load_dict(settings.CODEC_DICT_PATH)
+    except Exception as e:
+        print(f"[codec] dictionary not loaded: {e}")
+
+
+# zstd contexts are reusable but not thread-safe: one set per thread, per dictionary
+_local = threading.local()
+
+
+def _ctx(kind: str, dict_id: Optional[int]):
+    cache = _local.__dict__.setdefault(kind, {})
+    ctx = cache.get(dict_id)
+    if ctx is None:
+        d = _dicts[dict_id] if dict_id is not None else None
+        if kind == "c":
+            ctx = zstandard.ZstdCompressor(level=settings.CODEC_ZSTD_LEVEL, dict_data=d)
+        else:
+            ctx = zstandard.ZstdDecompressor(dict_data=d)
+        cache[dict_id] = ctx
+    return ctx
+
+
+# --------------------------
+# Public API
+# --------------------------
+def dumps(value: Any, compress: Optional[bool] = None) -> bytes:
+    body = pack(value)
+    if compress is None:
+        compress = len(body) >= settings.CODEC_COMPRESS_MIN_BYTES
+    if not compress or zstandard is None:
+        return MAGIC + bytes((VERSION, 0)) + body
+    if _active_dict_id is not None:
+        return (MAGIC + bytes((VERSION, F_ZSTD | F_DICT)) + struct.pack(">I", _active_dict_id)
+                + _ctx("c", _active_dict_id).compress(body))
+    return MAGIC + bytes((VERSION, F_ZSTD)) + _ctx("c", None).compress(body)
+
+
+def loads(blob: bytes) -> Any:
+    if isinstance(blob, str):
+        blob = blob.encode()
+    if not blob.startswith(MAGIC):
+        return json.loads(blob)  # legacy json.dumps values
+    version, flags = blob[2], blob[3]
+    if version != VERSION:
+        raise CodecError(f"unsupported codec version {version}")
+    body = blob[4:]
+    if flags & F_ZSTD:
+        if zstandard is None:
+            raise CodecError("value is zstd-compressed but zstandard is not installed")
+        if flags & F_DICT:
+            (dict_id,) = struct.unpack(">I", body[:4])
+            if dict_id not in _dicts:
+                raise CodecError(f"unknown compression dictionary {dict_id}")
+            body = _ctx("d", dict_id).decompress(body[4:])
+        else:
+            body = _ctx("d", None).decompress(body)
+    return unpack(body)
+
+
+# --------------------------
+# Dictionary training
+# --------------------------
+async def sample_plans(requests_path: str, n: int) -> List[PlanResponse]:
+    """Plan the first n requests of a PlanRequest JSONL (e.g. bench.loadgen output)."""
+    from backend.agents.planner import plan_itinerary
+    from backend.models import PlanRequest
+
+    out: List[PlanResponse] = []
+    with open(requests_path, "r", encoding="utf-8") as f:
+        for line in f:
+            if len(out) >= n:
+                break
+            if line.strip():
+                try:
+                    # Feedback values only reorder cities; skip the DB for training samples
+                    out.append(await plan_itinerary(PlanRequest(**json.loads(line)), city_values={}))
+                except Exception as e:
+                    print(f"[codec] skipped request: {e}")
+    return out
+
+
+def train_dict(samples: List[bytes], size: int = 32 * 1024) -> bytes:
+    if zstandard is None:
+        raise RuntimeError("zstandard is not installed")
+    return zstandard.train_dictionary(size, samples).as_bytes()
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Train a zstd dictionary on typical cached plans")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    t = sub.add_parser("train")
+    t.add_argument("requests", help="PlanRequest JSONL, e.g. from `python -m bench.loadgen generate`")
+    t.add_argument("--n", type=int, default=1000)
+    t.add_argument("--size", type=int, default=32 * 1024)
+    t.add_argument("--out", default=settings.CODEC_DICT_PATH or "data/codec/plans.zdict")
+    args = ap.parse_args()
+
+    from backend.deps import close_db
+
+    async def go() -> List[PlanResponse]:
+        try:
+            return await sample_plans(args.requests, args.n)
+        finally:
+            await close_db()
+
+    plans = asyncio.run(go())
+    samples = [pack(PlanRecord.from_response(p)) for p in plans]
+    d = train_dict(samples, args.size)
+    os.makedirs(os.path.dirname(args.out) or ".", exist_ok=True)
+    with open(args.out, "wb") as f:
+        f.write(d)
+    print(f"[codec] trained {len(d)} byte dictionary on {len(samples)} plans -> {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -20,6 +20,16 @@ class Settings:
     AMADEUS_CLIENT_ID     = os.getenv("AMADEUS_CLIENT_ID", "")
     AMADEUS_CLIENT_SECRET = os.getenv("AMADEUS_CLIENT_SECRET", "")
 
+    # Import + warm providers at app import time, so a pre-forking server's
+    # master does it once and workers inherit it (see backend/main.py)
+    PRELOAD = os.getenv("PRELOAD", "0") == "1"
+
+    # Provider base URLs (override to point at local stand-ins, e.g. bench/stubs.py)
+    OPEN_METEO_BASE   = os.getenv("OPEN_METEO_BASE", "https://api.open-meteo.com/v1/forecast")
+    OPENWEATHER_BASE  = os.getenv("OPENWEATHER_BASE", "https://api.openweathermap.org")
+    GOOGLE_MAPS_BASE  = os.getenv("GOOGLE_MAPS_BASE", "https://maps.googleapis.com")
+    AMADEUS_BASE_URL  = os.getenv("AMADEUS_BASE_URL", "")  # empty = Amadeus test environment
+
     # Database: either a single DATABASE_URL or build Postgres from parts
     DATABASE_URL = os.getenv("DATABASE_URL", "")
 
@@ -29,6 +39,135 @@ class Settings:
     POSTGRES_USER = os.getenv("POSTGRES_USER", "tcopilot")
     POSTGRES_PASSWORD = os.getenv("POSTGRES_PASSWORD", "tcopilot")
 
+    # Connection pool tuning (Postgres only; SQLite opens a connection per checkout)
+    DB_POOL_SIZE        = int(os.getenv("DB_POOL_SIZE", 10))
+    DB_MAX_OVERFLOW     = int(os.getenv("DB_MAX_OVERFLOW", 20))
+    DB_POOL_RECYCLE_SEC = int(os.getenv("DB_POOL_RECYCLE_SEC", 1800))
+    DB_POOL_TIMEOUT_SEC = int(os.getenv("DB_POOL_TIMEOUT_SEC", 30))
+
+    # Redis (optional): REDIS_URL, or built from REDIS_HOST/REDIS_PORT
+    REDIS_URL  = os.getenv("REDIS_URL", "")
+    REDIS_HOST = os.getenv("REDIS_HOST", "")
+    REDIS_PORT = int(os.getenv("REDIS_PORT", 6379))
+
+    # User preference profiles: per-process LRU in front of Redis in front of the DB
+    PROFILE_LRU_SIZE      = int(os.getenv("PROFILE_LRU_SIZE", 10000))
+    PROFILE_LRU_TTL_SEC   = int(os.getenv("PROFILE_LRU_TTL_SEC", 300))
+    PROFILE_REDIS_TTL_SEC = int(os.getenv("PROFILE_REDIS_TTL_SEC", 86400))
+
+    # Traffic capture for offline replay (see backend/capture.py)
+    CAPTURE_ENABLED     = os.getenv("CAPTURE_ENABLED", "0") == "1"
+    CAPTURE_PATH        = os.getenv("CAPTURE_PATH", "requests.jsonl")
+    CAPTURE_MAX_BYTES   = int(os.getenv("CAPTURE_MAX_BYTES", 50 * 1024 * 1024))
+    CAPTURE_BACKUPS     = int(os.getenv("CAPTURE_BACKUPS", 5))
+    CAPTURE_SAMPLE_RATE = float(os.getenv("CAPTURE_SAMPLE_RATE", 1.0))
+
+    # Feedback aggregation job
+    FEEDBACK_AGG_CHUNK      = int(os.getenv("FEEDBACK_AGG_CHUNK", 50000))
+    FEEDBACK_AGG_SETTLE_SEC = int(os.getenv("FEEDBACK_AGG_SETTLE_SEC", 5))
+    FEEDBACK_SCORES_TTL_SEC = int(os.getenv("FEEDBACK_SCORES_TTL_SEC", 600))
+
+    # Shared provider response cache (see backend/cache.py, backend/tools/providers.py)
+    CACHE_LOCAL_MAXSIZE    = int(os.getenv("CACHE_LOCAL_MAXSIZE", 20000))
+    CACHE_STALE_GRACE_SEC  = int(os.getenv("CACHE_STALE_GRACE_SEC", 3600))
+    WEATHER_CACHE_TTL_SEC  = int(os.getenv("WEATHER_CACHE_TTL_SEC", 3 * 3600))
+    FLIGHTS_CACHE_TTL_SEC  = int(os.getenv("FLIGHTS_CACHE_TTL_SEC", 900))
+    HOTELS_CACHE_TTL_SEC   = int(os.getenv("HOTELS_CACHE_TTL_SEC", 6 * 3600))
+
+    # Cache value codec (see backend/codec.py)
+    CODEC_DICT_PATH          = os.getenv("CODEC_DICT_PATH", "data/codec/plans.zdict")
+    CODEC_ZSTD_LEVEL         = int(os.getenv("CODEC_ZSTD_LEVEL", 3))
+    CODEC_COMPRESS_MIN_BYTES = int(os.getenv("CODEC_COMPRESS_MIN_BYTES", 256))
+
+    # Stored plans for /plan/{plan_id}/replan (see backend/plan_store.py)
+    PLAN_STORE_TTL_SEC       = int(os.getenv("PLAN_STORE_TTL_SEC", 7 * 86400))
+    PLAN_STORE_LOCAL_MAXSIZE = int(os.getenv("PLAN_STORE_LOCAL_MAXSIZE", 2000))
+
+    # Hedged provider calls (see backend/tools/hedge.py)
+    HEDGE_ENABLED          = os.getenv("HEDGE_ENABLED", "1") == "1"
+    HEDGE_PERCENTILE       = float(os.getenv("HEDGE_PERCENTILE", 0.95))
+    HEDGE_WINDOW           = int(os.getenv("HEDGE_WINDOW", 200))
+    HEDGE_MIN_SAMPLES      = int(os.getenv("HEDGE_MIN_SAMPLES", 20))
+    HEDGE_DEFAULT_DELAY_MS = int(os.getenv("HEDGE_DEFAULT_DELAY_MS", 1500))
+    HEDGE_MIN_DELAY_MS     = int(os.getenv("HEDGE_MIN_DELAY_MS", 50))
+    HEDGE_MAX_DELAY_MS     = int(os.getenv("HEDGE_MAX_DELAY_MS", 5000))
+    # Second flights provider to hedge against (skyscanner|amadeus|mock); empty = no flight hedging
+    PROVIDER_FLIGHTS_SECONDARY = os.getenv("PROVIDER_FLIGHTS_SECONDARY", "")
+
+    # Background prefetch of hot provider keys (see backend/prefetch.py)
+    PREFETCH_ENABLED       = os.getenv("PREFETCH_ENABLED", "0") == "1"
+    PREFETCH_INTERVAL_SEC  = int(os.getenv("PREFETCH_INTERVAL_SEC", 30))
+    PREFETCH_LEAD_SEC      = int(os.getenv("PREFETCH_LEAD_SEC", 120))   # refresh this long before expiry
+    PREFETCH_TOP_N         = int(os.getenv("PREFETCH_TOP_N", 200))
+    PREFETCH_MIN_SCORE     = float(os.getenv("PREFETCH_MIN_SCORE", 2.0))
+    PREFETCH_HALF_LIFE_SEC = int(os.getenv("PREFETCH_HALF_LIFE_SEC", 1800))
+    PREFETCH_MAX_KEYS      = int(os.getenv("PREFETCH_MAX_KEYS", 5000))
+    PREFETCH_CONCURRENCY   = int(os.getenv("PREFETCH_CONCURRENCY", 4))
+    # Per-provider prefetch budgets, calls/minute: "skyscanner=20,google-places=30"
+    PREFETCH_BUDGETS       = os.getenv("PREFETCH_BUDGETS", "skyscanner=20,amadeus=10,openmeteo=120,openweather=30,google-places=30")
+    PREFETCH_DEFAULT_BUDGET = float(os.getenv("PREFETCH_DEFAULT_BUDGET", 30))
+
+    # Static datasets shared by workers as memory-mapped files (see backend/datasets.py)
+    DATASETS_DIR  = os.getenv("DATASETS_DIR", "data/cache")
+    POI_SEED_PATH = os.getenv("POI_SEED_PATH", "data/pois_france_seed.jsonl")
+    EMBED_MODEL   = os.getenv("EMBED_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
+    # Dense query encodes are micro-batched (see common/embedder.py)
+    EMBED_BATCH_MAX       = int(os.getenv("EMBED_BATCH_MAX", 32))
+    EMBED_BATCH_WINDOW_MS = float(os.getenv("EMBED_BATCH_WINDOW_MS", 5))
+    EMBED_THREADS         = int(os.getenv("EMBED_THREADS", os.cpu_count() or 1))
+
+    # Climatology for dates beyond the live forecast horizon (see backend/tools/climatology.py)
+    CLIMATE_NORMALS_PATH   = os.getenv("CLIMATE_NORMALS_PATH", "data/climate/monthly_normals_fr.json")
+    CLIMATE_MAX_KM         = float(os.getenv("CLIMATE_MAX_KM", 150))
+    OPEN_METEO_ARCHIVE_BASE = os.getenv("OPEN_METEO_ARCHIVE_BASE", "https://archive-api.open-meteo.com/v1/archive")
+    # Days ahead each weather provider forecasts: "openmeteo=16,openweather=7"
+    WEATHER_HORIZON_DAYS   = os.getenv("WEATHER_HORIZON_DAYS", "openmeteo=16,openweather=7")
+    WEATHER_DEFAULT_HORIZON_DAYS = int(os.getenv("WEATHER_DEFAULT_HORIZON_DAYS", 7))
+
+    # POI vector index: float32 | int8 | pq, re-ranked exactly (see backend/tools/vectors.py)
+    VECTOR_INDEX              = os.getenv("VECTOR_INDEX", "int8")
+    VECTOR_RERANK_OVERSAMPLE  = int(os.getenv("VECTOR_RERANK_OVERSAMPLE", 4))
+    VECTOR_PQ_SUBSPACES       = int(os.getenv("VECTOR_PQ_SUBSPACES", 48))
+
+    # Pre-forking server (see backend/serve.py); WEB_CONCURRENCY as set by most PaaS hosts
+    SERVE_WORKERS         = int(os.getenv("WEB_CONCURRENCY", os.cpu_count() or 1))
+    SERVE_BACKLOG         = int(os.getenv("SERVE_BACKLOG", 2048))
+    SERVE_GRACEFUL_SEC    = int(os.getenv("SERVE_GRACEFUL_SEC", 30))
+
+    # Admission control for /plan, per API worker (see backend/admission.py)
+    PLAN_MAX_CONCURRENT          = int(os.getenv("PLAN_MAX_CONCURRENT", 32))
+    PLAN_MAX_QUEUE               = int(os.getenv("PLAN_MAX_QUEUE", 64))
+    PLAN_DEGRADED_MAX_CONCURRENT = int(os.getenv("PLAN_DEGRADED_MAX_CONCURRENT", 256))
+    PLAN_DEADLINE_MS             = int(os.getenv("PLAN_DEADLINE_MS", 18000))  # under the UI's 20 s timeout
+    PLAN_SERVICE_SEC_INITIAL     = float(os.getenv("PLAN_SERVICE_SEC_INITIAL", 1.0))
+
+    # Planning process pool for alternative itineraries (see backend/executor.py);
+    # by default the cores are split between the API workers. 0 disables it.
+    PLAN_POOL_WORKERS       = int(os.getenv("PLAN_POOL_WORKERS", max(1, (os.cpu_count() or 1) // max(1, SERVE_WORKERS))))
+    PLAN_POOL_SLOTS         = int(os.getenv("PLAN_POOL_SLOTS", 64))
+    PLAN_POOL_START_METHOD  = os.getenv("PLAN_POOL_START_METHOD", "forkserver")
+    PLAN_ALTERNATIVES       = os.getenv("PLAN_ALTERNATIVES", "cheapest,relaxed,interests")
+    PLAN_OPTIMIZE_BUDGET_MS = int(os.getenv("PLAN_OPTIMIZE_BUDGET_MS", 1500))
+
+    # Local hotel inventory, per city sorted by price (see backend/tools/inventory.py)
+    HOTEL_INVENTORY_ENABLED     = os.getenv("HOTEL_INVENTORY_ENABLED", "1") == "1"
+    HOTEL_INVENTORY_MAX_AGE_SEC = int(os.getenv("HOTEL_INVENTORY_MAX_AGE_SEC", 86400))
+    HOTEL_INVENTORY_PAGES       = int(os.getenv("HOTEL_INVENTORY_PAGES", 3))   # Places pages of 20 per city
+    HOTEL_NEAR_KM               = float(os.getenv("HOTEL_NEAR_KM", 2.0))
+    HOTEL_NEAR_POIS             = int(os.getenv("HOTEL_NEAR_POIS", 8))
+
+    # Asynchronous plan jobs (see backend/jobs.py); python -m backend.jobs worker runs the fleet
+    JOB_WORKER_PROCESSES      = int(os.getenv("JOB_WORKER_PROCESSES", os.cpu_count() or 1))
+    JOB_WORKER_CONCURRENCY    = int(os.getenv("JOB_WORKER_CONCURRENCY", 8))   # jobs per worker process
+    JOB_INLINE_WORKERS        = int(os.getenv("JOB_INLINE_WORKERS", -1))      # in API workers; -1 = only without Redis
+    JOB_LEASE_SEC             = int(os.getenv("JOB_LEASE_SEC", 30))
+    JOB_POLL_SEC              = float(os.getenv("JOB_POLL_SEC", 0.2))
+    JOB_MAX_ATTEMPTS          = int(os.getenv("JOB_MAX_ATTEMPTS", 3))
+    JOB_STAGE_RETRIES         = int(os.getenv("JOB_STAGE_RETRIES", 2))
+    JOB_STAGE_RETRY_DELAY_SEC = float(os.getenv("JOB_STAGE_RETRY_DELAY_SEC", 2.0))
+    JOB_RESULT_TTL_SEC        = int(os.getenv("JOB_RESULT_TTL_SEC", 3600))
+    JOB_PENDING_TTL_SEC       = int(os.getenv("JOB_PENDING_TTL_SEC", 86400))
+
     def db_url(self) -> str:
         """Return a SQLAlchemy URL."""
         if self.DATABASE_URL:
@@ -38,4 +177,23 @@ class Settings:
             f"@{self.POSTGRES_HOST}:{self.POSTGRES_PORT}/{self.POSTGRES_DB}"
         )
 
+    def redis_url(self) -> str:
+        """Return a Redis URL, or "" when Redis is not configured."""
+        if self.REDIS_URL:
+            return self.REDIS_URL
+        if self.REDIS_HOST:
+            return f"redis://{self.REDIS_HOST}:{self.REDIS_PORT}/0"
+        return ""
+
+    def async_db_url(self) -> str:
+        """Return db_url() rewritten to an async driver (psycopg async / aiosqlite)."""
+        url = self.db_url()
+        scheme, sep, rest = url.partition("://")
+        backend = scheme.split("+", 1)[0]
+        if backend in ("postgres", "postgresql"):
+            return f"postgresql+psycopg{sep}{rest}"
+        if backend == "sqlite":
+            return f"sqlite+aiosqlite{sep}{rest}"
+        return url
+
 settings = Settings()
\ No newline at end of file
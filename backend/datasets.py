@@ -0,0 +1,242 @@
+# backend/datasets.py
+"""
+Static datasets as memory-mapped columns, shared by every worker.
+
+    python -m backend.datasets build [--embeddings]   # data/*.jsonl -> DATASETS_DIR
+    cat = datasets.catalog()                           # opens the .npy files read-only
+    rows = cat.by_city("Lyon"); cat.row(rows[0])
+
+The POI seed is sorted by city and written as one .npy per numeric column
+(lat, lon, price), a city table (row range + centre per city) and a single
+UTF-8 blob with offsets for the string fields. Workers open the files with
+np.load(mmap_mode="r"), so N workers share one copy through the page cache
+instead of each holding its own list of dicts. Optional POI embeddings
+(EMBED_MODEL, needs sentence-transformers) are stored the same way, with
+quantized codes for backend/tools/vectors.py (VECTOR_INDEX). Tag/price
+bitmaps and a BM25 index for backend/tools/retrieval.py, and opening hours
+compiled to minute intervals (backend/tools/hours.py), are built alongside.
+
+A build writes a new directory and renames it into place, so workers that
+still map the previous files keep reading a consistent snapshot.
+"""
+import argparse
+import hashlib
+import json
+import os
+import shutil
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from backend.config import settings
+
+STRING_FIELDS = ("name", "city", "hours", "tags", "url")
+FORMAT = 3
+
+
+def _fingerprint(path: str) -> str:
+    st = os.stat(path)
+    return hashlib.sha1(f"{os.path.abspath(path)}:{st.st_size}:{st.st_mtime_ns}:{FORMAT}".encode()).hexdigest()[:16]
+
+
+def _read_jsonl(path: str) -> List[dict]:
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def _city_centres() -> Dict[str, Tuple[float, float]]:
+    from backend.agents.planner import CITY_COORDS
+    return dict(CITY_COORDS)
+
+
+def _string_value(row: dict, field: str) -> str:
+    v = row.get(field)
+    if v is None:
+        return ""
+    if isinstance(v, (list, tuple)):
+        return "|".join(str(x) for x in v)
+    return str(v)
+
+
+# --------------------------
+# Build
+# --------------------------
+def build_pois(src: str, out_dir: str, embeddings: bool = False) -> dict:
+    rows = sorted(_read_jsonl(src), key=lambda r: (r.get("city") or "", r.get("name") or ""))
+    n = len(rows)
+    tmp = out_dir + ".tmp"
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+
+    np.save(os.path.join(tmp, "lat.npy"), np.array([float(r.get("lat") or np.nan) for r in rows], np.float64))
+    np.save(os.path.join(tmp, "lon.npy"), np.array([float(r.get("lon") or np.nan) for r in rows], np.float64))
+    np.save(os.path.join(tmp, "price.npy"), np.array([float(r.get("price_eur") or 0.0) for r in rows], np.float32))
+
+    # Strings: one blob, offsets[i * F + f] .. offsets[i * F + f + 1] is field f of row i
+    parts = [_string_value(r, f).encode("utf-8") for r in rows for f in STRING_FIELDS]
+    offsets = np.zeros(len(parts) + 1, np.int64)
+    np.cumsum([len(p) for p in parts], out=offsets[1:])
+    np.save(os.path.join(tmp, "strings.npy"), np.frombuffer(b"".join(parts), np.uint8))
+    np.save(os.path.join(tmp, "offsets.npy"), offsets)
+
+    # City table: rows are sorted by city, so each city is a contiguous range
+    centres = _city_centres()
+    names = sorted({r.get("city") or "" for r in rows} | set(centres))
+    first: Dict[str, int] = {}
+    end: Dict[str, int] = {}
+    for i, r in enumerate(rows):
+        first.setdefault(r.get("city") or "", i)
+        end[r.get("city") or ""] = i + 1
+    ranges = np.array([[first.get(c, 0), end.get(c, 0)] for c in names], np.int64).reshape(-1, 2)
+    centre = np.array([centres.get(c, (np.nan, np.nan)) for c in names], np.float64).reshape(-1, 2)
+    np.save(os.path.join(tmp, "city_rows.npy"), ranges)
+    np.save(os.path.join(tmp, "city_latlon.npy"), centre)
+
+    meta = {"format": FORMAT, "source": _fingerprint(src), "rows": n, "cities": names,
+            "fields": list(STRING_FIELDS), "embed_model": None}
+    from backend.tools import retrieval
+    meta.update(retrieval.build(tmp, rows, ranges))
+    from backend.tools import hours
+    meta.update(hours.build(tmp, rows))
+    if embeddings:
+        from sentence_transformers import SentenceTransformer  # heavy; only for this build step
+        model = SentenceTransformer(settings.EMBED_MODEL)
+        texts = [f"{r.get('name', '')} — {r.get('city', '')} — {', '.join(r.get('tags', []))}" for r in rows]
+        vecs = model.encode(texts, normalize_embeddings=True).astype(np.float32)
+        np.save(os.path.join(tmp, "embeddings.npy"), vecs)
+        meta["embed_model"] = settings.EMBED_MODEL
+        from backend.tools import vectors
+        vectors.build(tmp, settings.VECTOR_INDEX)
+
+    with open(os.path.join(tmp, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+
+    # Swap the directory in; open mmaps of the old files stay valid until unmapped
+    old = out_dir + ".old"
+    shutil.rmtree(old, ignore_errors=True)
+    if os.path.exists(out_dir):
+        os.replace(out_dir, old)
+    os.replace(tmp, out_dir)
+    shutil.rmtree(old, ignore_errors=True)
+    return meta
+
+
+def _pois_dir() -> str:
+    return os.path.join(settings.DATASETS_DIR, "pois")
+
+
+def is_stale(src: Optional[str] = None, out_dir: Optional[str] = None) -> bool:
+    src = src or settings.POI_SEED_PATH
+    try:
+        with open(os.path.join(out_dir or _pois_dir(), "meta.json"), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return True
+    return meta.get("format") != FORMAT or meta.get("source") != _fingerprint(src)
+
+
+def ensure_built(embeddings: bool = False) -> bool:
+    """Build the datasets if missing or older than their source; True if a build ran."""
+    if not os.path.exists(settings.POI_SEED_PATH):
+        print(f"[datasets] {settings.POI_SEED_PATH} not found; skipping")
+        return False
+    if not is_stale():
+        return False
+    meta = build_pois(settings.POI_SEED_PATH, _pois_dir(), embeddings=embeddings)
+    print(f"[datasets] built {meta['rows']} POIs -> {_pois_dir()}")
+    return True
+
+
+# --------------------------
+# Read side
+# --------------------------
+class POICatalog:
+    """Read-only, memory-mapped POI columns."""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(os.path.join(path, "meta.json"), "r", encoding="utf-8") as f:
+            self.meta = json.load(f)
+
+        def load(name: str) -> np.ndarray:
+            return np.load(os.path.join(path, name), mmap_mode="r")
+
+        self.lat = load("lat.npy")
+        self.lon = load("lon.npy")
+        self.price = load("price.npy")
+        self._strings = load("strings.npy")
+        self._offsets = load("offsets.npy")
+        self.city_rows = load("city_rows.npy")
+        self.city_latlon = load("city_latlon.npy")
+        emb = os.path.join(path, "embeddings.npy")
+        self.embeddings = np.load(emb, mmap_mode="r") if os.path.exists(emb) else None
+        self.cities: List[str] = self.meta["cities"]
+        self._city_index = {c: i for i, c in enumerate(self.cities)}
+        self._fields = {f: i for i, f in enumerate(self.meta["fields"])}
+
+    def __len__(self) -> int:
+        return int(self.meta["rows"])
+
+    def text(self, i: int, field: str) -> str:
+        k = i * len(self._fields) + self._fields[field]
+        return bytes(self._strings[self._offsets[k]:self._offsets[k + 1]]).decode("utf-8")
+
+    def row(self, i: int) -> dict:
+        out = {f: self.text(i, f) for f in self._fields}
+        out["tags"] = out["tags"].split("|") if out["tags"] else []
+        out.update(lat=float(self.lat[i]), lon=float(self.lon[i]), price_eur=float(self.price[i]))
+        return out
+
+    def city_id(self, city: str) -> Optional[int]:
+        return self._city_index.get(city)
+
+    def by_city(self, city: str) -> np.ndarray:
+        """Row indices of a city's POIs (a contiguous range)."""
+        c = self._city_index.get(city)
+        if c is None:
+            return np.zeros(0, np.int64)
+        lo, hi = self.city_rows[c]
+        return np.arange(lo, hi)
+
+    def centre(self, city: str) -> Optional[Tuple[float, float]]:
+        c = self._city_index.get(city)
+        if c is None or np.isnan(self.city_latlon[c, 0]):
+            return None
+        return float(self.city_latlon[c, 0]), float(self.city_latlon[c, 1])
+
+    def touch(self) -> int:
+        """Read every page once (page cache warm-up in the master); returns bytes mapped."""
+        total = 0
+        for a in (self.lat, self.lon, self.price, self._strings, self._offsets, self.embeddings):
+            if a is not None:
+                np.asarray(a).sum()
+                total += a.nbytes
+        return total
+
+
+@lru_cache(maxsize=1)
+def catalog() -> Optional[POICatalog]:
+    """The shared POI catalog, or None when it has not been built."""
+    try:
+        return POICatalog(_pois_dir())
+    except (OSError, ValueError, KeyError) as e:
+        print(f"[datasets] POI catalog unavailable: {e}")
+        return None
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Build memory-mapped static datasets")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    b = sub.add_parser("build")
+    b.add_argument("--src", default=settings.POI_SEED_PATH)
+    b.add_argument("--out", default=_pois_dir())
+    b.add_argument("--embeddings", action="store_true", help=f"also encode POIs with {settings.EMBED_MODEL}")
+    args = ap.parse_args()
+
+    meta = build_pois(args.src, args.out, embeddings=args.embeddings)
+    print(f"[datasets] built {meta['rows']} POIs, {len(meta['cities'])} cities -> {args.out}")
+
+
+if __name__ == "__main__":
+    main()
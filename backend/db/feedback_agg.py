@@ -0,0 +1,201 @@
+# backend/db/feedback_agg.py
+"""
+Incremental feedback aggregation.
+
+Ratings arrive through POST /plan/{plan_id}/feedback (record_feedback), one
+`feedback` row per rated city. The job folds new rows into `feedback_stats`
+(count, sum and sum of squares of ratings per city and per (city, activity)). Progress is kept as the last
+processed feedback.id in `job_watermarks`, so each run only range-scans the
+primary key past the watermark; the cost depends on new rows, not table size.
+`activity = ''` holds the city-wide aggregate.
+
+    python -m backend.db.feedback_agg            # catch up once
+    python -m backend.db.feedback_agg --loop 60  # keep running every 60 s
+"""
+import argparse
+import asyncio
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import text
+
+from backend.config import settings
+from backend.deps import engine, init_db, close_db
+
+JOB = "feedback_stats"
+
+_UPSERT_TAIL = """
+ON CONFLICT (city, activity) DO UPDATE
+SET n = feedback_stats.n + excluded.n,
+    rating_sum = feedback_stats.rating_sum + excluded.rating_sum,
+    rating_sq_sum = feedback_stats.rating_sq_sum + excluded.rating_sq_sum,
+    updated_at = excluded.updated_at
+"""
+
+# Per-activity rows, then the city-wide row. The WHERE clause is required by
+# SQLite to parse INSERT ... SELECT ... ON CONFLICT.
+_FOLD_ACTIVITY = """
+INSERT INTO feedback_stats (city, activity, n, rating_sum, rating_sq_sum, updated_at)
+SELECT city, activity, COUNT(*), SUM(rating), SUM(rating * rating), CURRENT_TIMESTAMP
+FROM feedback
+WHERE id > :lo AND id <= :hi AND city IS NOT NULL AND rating IS NOT NULL
+  AND activity IS NOT NULL AND activity <> ''
+GROUP BY city, activity
+""" + _UPSERT_TAIL
+
+_FOLD_CITY = """
+INSERT INTO feedback_stats (city, activity, n, rating_sum, rating_sq_sum, updated_at)
+SELECT city, '', COUNT(*), SUM(rating), SUM(rating * rating), CURRENT_TIMESTAMP
+FROM feedback
+WHERE id > :lo AND id <= :hi AND city IS NOT NULL AND rating IS NOT NULL
+GROUP BY city
+""" + _UPSERT_TAIL
+
+
+_INSERT = """
+INSERT INTO feedback (rating, comments, city, activity)
+VALUES (:rating, :comments, :city, :activity)
+"""
+
+
+async def record_feedback(cities: List[str], rating: float, activity: Optional[str] = None,
+                          comments: Optional[str] = None) -> int:
+    """Store one feedback row per city for the next fold; return how many were written."""
+    rows = [{"rating": rating, "comments": comments, "city": c, "activity": activity or None} for c in cities]
+    async with engine.begin() as conn:
+        await conn.execute(text(_INSERT), rows)
+    return len(rows)
+
+
+def _settled_max_id_sql(dialect: str) -> str:
+    # Postgres hands out ids at INSERT time but rows become visible at COMMIT,
+    # so a fresh high id can be visible before a lower one. Leaving the newest
+    # few seconds for the next run keeps the watermark from skipping rows.
+    cutoff = (
+        "NOW() - make_interval(secs => :settle)"
+        if dialect.startswith("postgres")
+        else "datetime('now', '-' || :settle || ' seconds')"
+    )
+    return f"SELECT MAX(id) FROM feedback WHERE id > :lo AND created_at <= {cutoff}"
+
+
+async def run_once(chunk: int = settings.FEEDBACK_AGG_CHUNK) -> int:
+    """Fold up to `chunk` ids past the watermark; return how many ids were consumed."""
+    is_pg = engine.dialect.name.startswith("postgres")
+    async with engine.begin() as conn:
+        await conn.execute(
+            text("INSERT INTO job_watermarks (job, last_id) VALUES (:job, 0) ON CONFLICT (job) DO NOTHING"),
+            {"job": JOB},
+        )
+        # Row lock keeps two concurrent jobs from double counting
+        lock = " FOR UPDATE" if is_pg else ""
+        lo = int((await conn.execute(
+            text(f"SELECT last_id FROM job_watermarks WHERE job = :job{lock}"), {"job": JOB}
+        )).scalar_one())
+        newest = (await conn.execute(
+            text(_settled_max_id_sql(engine.dialect.name)),
+            {"lo": lo, "settle": settings.FEEDBACK_AGG_SETTLE_SEC},
+        )).scalar()
+        if newest is None:
+            return 0
+        hi = min(int(newest), lo + chunk)
+
+        params = {"lo": lo, "hi": hi}
+        await conn.execute(text(_FOLD_ACTIVITY), params)
+        await conn.execute(text(_FOLD_CITY), params)
+        await conn.execute(
+            text("UPDATE job_watermarks SET last_id = :hi, updated_at = CURRENT_TIMESTAMP WHERE job = :job"),
+            {"hi": hi, "job": JOB},
+        )
+    return hi - lo
+
+
+async def run(chunk: int = settings.FEEDBACK_AGG_CHUNK) -> int:
+    """Catch up to the newest settled feedback row, one chunk per transaction."""
+    total = 0
+    while True:
+        n = await run_once(chunk)
+        if n == 0:
+            return total
+        total += n
+
+
+# --------------------------
+# Planner-side lookup
+# --------------------------
+class FeedbackScores:
+    """
+    Smoothed mean rating per city and per (city, activity).
+
+    Uses a Bayesian average, pulling entries with few ratings towards the
+    global mean, so one 5-star review does not outrank a well-rated staple.
+    """
+
+    __slots__ = ("_scores", "global_mean")
+
+    def __init__(self, rows: Iterable[Tuple[str, str, int, float]], prior_weight: float = 20.0):
+        rows = list(rows)
+        n_all = sum(r[2] for r in rows if r[1] == "")
+        s_all = sum(r[3] for r in rows if r[1] == "")
+        self.global_mean = (s_all / n_all) if n_all else 0.0
+        m = self.global_mean
+        self._scores: Dict[Tuple[str, str], float] = {
+            (city, activity): (s + prior_weight * m) / (n + prior_weight)
+            for city, activity, n, s in rows
+        }
+
+    def score(self, city: str, activity: str = "") -> float:
+        """Activity score, falling back to the city score, then the global mean."""
+        hit = self._scores.get((city, activity))
+        if hit is None:
+            hit = self._scores.get((city, ""), self.global_mean)
+        return hit
+
+    def __len__(self) -> int:
+        return len(self._scores)
+
+
+_scores_cache: Optional[Tuple[float, FeedbackScores]] = None
+
+
+async def load_scores(max_age_sec: float = settings.FEEDBACK_SCORES_TTL_SEC) -> FeedbackScores:
+    """Return the score lookup, re-reading feedback_stats at most every `max_age_sec`."""
+    global _scores_cache
+    now = time.monotonic()
+    if _scores_cache and now - _scores_cache[0] < max_age_sec:
+        return _scores_cache[1]
+    try:
+        async with engine.connect() as conn:
+            rows = (await conn.execute(
+                text("SELECT city, activity, n, rating_sum FROM feedback_stats")
+            )).all()
+        scores = FeedbackScores((r[0], r[1], int(r[2]), float(r[3])) for r in rows)
+    except Exception as e:
+        print(f"[feedback_agg] Scores unavailable: {e}")
+        scores = _scores_cache[1] if _scores_cache else FeedbackScores([])
+    _scores_cache = (now, scores)
+    return scores
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--chunk", type=int, default=settings.FEEDBACK_AGG_CHUNK)
+    ap.add_argument("--loop", type=float, default=0.0, help="Repeat every N seconds (0 = run once)")
+    args = ap.parse_args()
+
+    async def go() -> None:
+        try:
+            await init_db()
+            while True:
+                print(f"[feedback_agg] folded {await run(args.chunk)} feedback ids")
+                if not args.loop:
+                    return
+                await asyncio.sleep(args.loop)
+        finally:
+            await close_db()
+
+    asyncio.run(go())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,273 @@
+# backend/db/migrations.py
+"""
+Versioned schema migrations.
+
+Each migration runs once and is recorded in `schema_migrations`, so a normal
+startup costs a single `SELECT MAX(version)` instead of replaying DDL.
+Add new migrations to the end of MIGRATIONS; never edit one that has shipped.
+
+    python -m backend.db.migrations     # apply pending migrations and exit
+
+backend.serve runs them once in its master; web workers do not. Concurrent
+runs (CLIs, several deploys) are serialised: by an advisory lock on Postgres,
+by holding the database write lock (BEGIN IMMEDIATE) on SQLite.
+"""
+import asyncio
+from typing import List, NamedTuple
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+
+class Migration(NamedTuple):
+    version: int
+    name: str
+    postgres: List[str]
+    sqlite: List[str]
+    # Postgres-only: run outside a transaction (needed for CREATE INDEX CONCURRENTLY)
+    concurrent: bool = False
+
+
+MIGRATIONS: List[Migration] = [
+    Migration(
+        1,
+        "initial schema",
+        postgres=[
+            """
+            CREATE TABLE IF NOT EXISTS users (
+              id SERIAL PRIMARY KEY,
+              email TEXT,
+              locale TEXT,
+              home_airport TEXT,
+              currency TEXT DEFAULT 'EUR',
+              preferences_json JSONB DEFAULT '{}'::jsonb
+            )
+            """,
+            """
+            CREATE TABLE IF NOT EXISTS trips (
+              id SERIAL PRIMARY KEY,
+              user_id INT,
+              origin TEXT,
+              start_date DATE,
+              end_date DATE,
+              budget_eur INT,
+              party_size INT,
+              style TEXT,
+              created_at TIMESTAMP DEFAULT NOW()
+            )
+            """,
+            """
+            CREATE TABLE IF NOT EXISTS feedback (
+              id SERIAL PRIMARY KEY,
+              trip_id INT,
+              rating NUMERIC,
+              comments TEXT,
+              created_at TIMESTAMP DEFAULT NOW()
+            )
+            """,
+        ],
+        sqlite=[
+            """
+            CREATE TABLE IF NOT EXISTS users (
+              id INTEGER PRIMARY KEY AUTOINCREMENT,
+              email TEXT,
+              locale TEXT,
+              home_airport TEXT,
+              currency TEXT DEFAULT 'EUR',
+              preferences_json TEXT DEFAULT '{}'
+            )
+            """,
+            """
+            CREATE TABLE IF NOT EXISTS trips (
+              id INTEGER PRIMARY KEY AUTOINCREMENT,
+              user_id INTEGER,
+              origin TEXT,
+              start_date TEXT,
+              end_date TEXT,
+              budget_eur INTEGER,
+              party_size INTEGER,
+              style TEXT,
+              created_at TEXT DEFAULT (datetime('now'))
+            )
+            """,
+            """
+            CREATE TABLE IF NOT EXISTS feedback (
+              id INTEGER PRIMARY KEY AUTOINCREMENT,
+              trip_id INTEGER,
+              rating REAL,
+              comments TEXT,
+              created_at TEXT DEFAULT (datetime('now'))
+            )
+            """,
+        ],
+    ),
+    Migration(
+        2,
+        "indexes for user history and feedback lookups",
+        # (user_id, start_date) serves "trips of user X, newest first" and plain
+        # user_id lookups; start_date alone serves date-range scans.
+        postgres=[
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_trips_user_id_start_date ON trips (user_id, start_date)",
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_trips_start_date ON trips (start_date)",
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_feedback_trip_id ON feedback (trip_id)",
+        ],
+        sqlite=[
+            "CREATE INDEX IF NOT EXISTS ix_trips_user_id_start_date ON trips (user_id, start_date)",
+            "CREATE INDEX IF NOT EXISTS ix_trips_start_date ON trips (start_date)",
+            "CREATE INDEX IF NOT EXISTS ix_feedback_trip_id ON feedback (trip_id)",
+        ],
+        concurrent=True,
+    ),
+    Migration(
+        3,
+        "feedback targets and rolling rating stats",
+        postgres=[
+            "ALTER TABLE feedback ADD COLUMN IF NOT EXISTS city TEXT",
+            "ALTER TABLE feedback ADD COLUMN IF NOT EXISTS activity TEXT",
+            """
+            CREATE TABLE IF NOT EXISTS feedback_stats (
+              city TEXT NOT NULL,
+              activity TEXT NOT NULL DEFAULT '',
+              n BIGINT NOT NULL DEFAULT 0,
+              rating_sum DOUBLE PRECISION NOT NULL DEFAULT 0,
+              rating_sq_sum DOUBLE PRECISION NOT NULL DEFAULT 0,
+              updated_at TIMESTAMP DEFAULT NOW(),
+              PRIMARY KEY (city, activity)
+            )
+            """,
+            """
+            CREATE TABLE IF NOT EXISTS job_watermarks (
+              job TEXT PRIMARY KEY,
+              last_id BIGINT NOT NULL DEFAULT 0,
+              updated_at TIMESTAMP DEFAULT NOW()
+            )
+            """,
+        ],
+        sqlite=[
+            "ALTER TABLE feedback ADD COLUMN city TEXT",
+            "ALTER TABLE feedback ADD COLUMN activity TEXT",
+            """
+            CREATE TABLE IF NOT EXISTS feedback_stats (
+              city TEXT NOT NULL,
+              activity TEXT NOT NULL DEFAULT '',
+              n INTEGER NOT NULL DEFAULT 0,
+              rating_sum REAL NOT NULL DEFAULT 0,
+              rating_sq_sum REAL NOT NULL DEFAULT 0,
+              updated_at TEXT DEFAULT (datetime('now')),
+              PRIMARY KEY (city, activity)
+            )
+            """,
+            """
+            CREATE TABLE IF NOT EXISTS job_watermarks (
+              job TEXT PRIMARY KEY,
+              last_id INTEGER NOT NULL DEFAULT 0,
+              updated_at TEXT DEFAULT (datetime('now'))
+            )
+            """,
+        ],
+    ),
+]
+
+_VERSION_TABLE = """
+CREATE TABLE IF NOT EXISTS schema_migrations (
+  version INTEGER PRIMARY KEY,
+  name TEXT NOT NULL,
+  applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+)
+"""
+
+# Arbitrary constant; serialises migrations when several workers start at once.
+_PG_LOCK_KEY = 7_310_026
+
+
+async def current_version(engine: AsyncEngine) -> int:
+    async with engine.begin() as conn:
+        await conn.execute(text(_VERSION_TABLE))
+        res = await conn.execute(text("SELECT COALESCE(MAX(version), 0) FROM schema_migrations"))
+        return int(res.scalar_one())
+
+
+async def migrate(engine: AsyncEngine) -> List[int]:
+    """Apply pending migrations in order; return the versions applied."""
+    if MIGRATIONS[-1].version <= await current_version(engine):
+        return []
+    async with engine.connect() as lock_conn:
+        lock_conn = await lock_conn.execution_options(isolation_level="AUTOCOMMIT")
+        if engine.dialect.name.startswith("postgres"):
+            return await _migrate_pg(engine, lock_conn)
+        return await _migrate_sqlite(lock_conn)
+
+
+async def _migrate_pg(engine: AsyncEngine, lock_conn) -> List[int]:
+    applied: List[int] = []
+    await lock_conn.execute(text("SELECT pg_advisory_lock(:k)"), {"k": _PG_LOCK_KEY})
+    try:
+        # Re-read under the lock: another worker may have migrated meanwhile
+        done = await current_version(engine)
+        for m in MIGRATIONS:
+            if m.version <= done:
+                continue
+            if m.concurrent:
+                for stmt in m.postgres:
+                    await lock_conn.execute(text(stmt))
+                async with engine.begin() as conn:
+                    await _record(conn, m)
+            else:
+                async with engine.begin() as conn:
+                    for stmt in m.postgres:
+                        await conn.execute(text(stmt))
+                    await _record(conn, m)
+            applied.append(m.version)
+    finally:
+        await lock_conn.execute(text("SELECT pg_advisory_unlock(:k)"), {"k": _PG_LOCK_KEY})
+    return applied
+
+
+async def _migrate_sqlite(conn) -> List[int]:
+    """
+    All pending migrations in one transaction on `conn`. BEGIN IMMEDIATE takes
+    the write lock up front, so a second process waits (busy timeout) and then
+    finds them applied. SQLite DDL is transactional: a failure leaves nothing behind.
+    """
+    applied: List[int] = []
+    await conn.execute(text("BEGIN IMMEDIATE"))
+    try:
+        await conn.execute(text(_VERSION_TABLE))
+        res = await conn.execute(text("SELECT COALESCE(MAX(version), 0) FROM schema_migrations"))
+        done = int(res.scalar_one())
+        for m in MIGRATIONS:
+            if m.version <= done:
+                continue
+            for stmt in m.sqlite:
+                await conn.execute(text(stmt))
+            await _record(conn, m)
+            applied.append(m.version)
+    except BaseException:
+        await conn.execute(text("ROLLBACK"))
+        raise
+    await conn.execute(text("COMMIT"))
+    return applied
+
+
+async def _record(conn, m: Migration) -> None:
+    await conn.execute(
+        text("INSERT INTO schema_migrations (version, name) VALUES (:v, :n)"),
+        {"v": m.version, "n": m.name},
+    )
+
+
+def main() -> None:
+    from backend.deps import close_db, engine
+
+    async def go() -> None:
+        try:
+            applied = await migrate(engine)
+            print(f"[migrations] applied {applied}" if applied else "[migrations] up to date")
+        finally:
+            await close_db()
+
+    asyncio.run(go())
+
+
+if __name__ == "__main__":
+    main()
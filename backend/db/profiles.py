@@ -0,0 +1,243 @@
+# backend/db/profiles.py
+"""
+User preference profiles with a read-through cache.
+
+Lookup order: per-process LRU -> Redis -> `users` table. Misses are cached
+too (as an empty profile) so unknown user IDs do not hit the DB every time.
+Updates write the DB, bump the user's generation counter, drop the Redis
+key and broadcast an invalidation so every worker evicts its LRU entry. A
+read-through fill only lands if no invalidation ran since the reader looked
+(the generation in Redis, an epoch in the LRU), so a reader that loaded the
+row just before an update cannot cache the old profile.
+"""
+import asyncio
+import json
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from sqlalchemy import text
+
+from backend.config import settings
+from backend.deps import engine, aredis
+from backend.models import PlanRequest, UserPreferences
+
+INVALIDATE_CHANNEL = "tcopilot:profile-invalidate"
+
+# KEYS: profile, generation; ARGV: generation seen before the DB read, ttl, value
+_FILL = """
+if (redis.call('GET', KEYS[2]) or '') == ARGV[1] then
+  redis.call('SETEX', KEYS[1], ARGV[2], ARGV[3])
+end
+"""
+
+# PlanRequest field <- profile key
+_MERGE_FIELDS = {
+    "origin": "home_airport",
+    "interests": "interests",
+    "pace": "pace",
+    "budget_eur": "budget_eur",
+    "party_size": "party_size",
+    "max_walk_km_per_day": "max_walk_km_per_day",
+    "language": "language",
+}
+
+
+class _LRU:
+    """Tiny TTL-bounded LRU keyed by user ID."""
+
+    def __init__(self, maxsize: int, ttl_sec: float):
+        self.maxsize = maxsize
+        self.ttl_sec = ttl_sec
+        self.epoch = 0   # bumped by every eviction; see put_if()
+        self._data: "OrderedDict[int, tuple[float, dict]]" = OrderedDict()
+
+    def get(self, key: int) -> Optional[dict]:
+        item = self._data.get(key)
+        if item is None:
+            return None
+        expires, value = item
+        if expires < time.monotonic():
+            del self._data[key]
+            return None
+        self._data.move_to_end(key)
+        return value
+
+    def put(self, key: int, value: dict) -> None:
+        self._data[key] = (time.monotonic() + self.ttl_sec, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def put_if(self, key: int, value: dict, epoch: int) -> None:
+        """put() unless something was evicted since `epoch` was read."""
+        if epoch == self.epoch:
+            self.put(key, value)
+
+    def pop(self, key: int) -> None:
+        self.epoch += 1
+        self._data.pop(key, None)
+
+    def clear(self) -> None:
+        self.epoch += 1
+        self._data.clear()
+
+
+_lru = _LRU(settings.PROFILE_LRU_SIZE, settings.PROFILE_LRU_TTL_SEC)
+
+
+def _redis_key(user_id: int) -> str:
+    return f"profile:{user_id}"
+
+
+def _gen_key(user_id: int) -> str:
+    return f"profile-gen:{user_id}"
+
+
+def _row_to_profile(home_airport: Optional[str], prefs_raw: Any) -> dict:
+    if isinstance(prefs_raw, (str, bytes)):
+        try:
+            prefs = json.loads(prefs_raw or "{}")
+        except ValueError:
+            prefs = {}
+    else:
+        prefs = dict(prefs_raw or {})  # JSONB arrives already decoded
+    prof = UserPreferences(**{k: v for k, v in prefs.items() if k in UserPreferences.model_fields})
+    if home_airport:
+        prof.home_airport = home_airport
+    return prof.model_dump(exclude_none=True)
+
+
+async def _load_from_db(user_id: int) -> dict:
+    async with engine.connect() as conn:
+        row = (
+            await conn.execute(
+                text("SELECT home_airport, preferences_json FROM users WHERE id = :id"),
+                {"id": user_id},
+            )
+        ).first()
+    return _row_to_profile(row[0], row[1]) if row else {}
+
+
+async def get_profile(user_id: int) -> dict:
+    """Return the saved preferences for a user ({} if none)."""
+    cached = _lru.get(user_id)
+    if cached is not None:
+        return cached
+    epoch = _lru.epoch
+
+    gen = None
+    if aredis is not None:
+        try:
+            raw, gen = await aredis.mget(_redis_key(user_id), _gen_key(user_id))
+            if raw is not None:
+                prof = json.loads(raw)
+                _lru.put_if(user_id, prof, epoch)
+                return prof
+            gen = (gen or b"").decode()
+        except Exception as e:
+            print(f"[profiles] Redis read failed, using DB: {e}")
+
+    prof = await _load_from_db(user_id)
+    _lru.put_if(user_id, prof, epoch)
+    if gen is not None:
+        try:
+            await aredis.eval(_FILL, 2, _redis_key(user_id), _gen_key(user_id),
+                              gen, settings.PROFILE_REDIS_TTL_SEC, json.dumps(prof))
+        except Exception:
+            pass
+    return prof
+
+
+def upsert_sql(dialect: str) -> str:
+    """Insert or replace a user's preferences; email and locale are kept when passed as NULL."""
+    prefs_expr = "CAST(:prefs AS JSONB)" if dialect.startswith("postgres") else ":prefs"
+    return f"""
+INSERT INTO users (id, email, locale, home_airport, preferences_json)
+VALUES (:id, :email, :locale, :home_airport, {prefs_expr})
+ON CONFLICT (id) DO UPDATE
+SET email = COALESCE(excluded.email, users.email),
+    locale = COALESCE(excluded.locale, users.locale),
+    home_airport = excluded.home_airport,
+    preferences_json = excluded.preferences_json
+"""
+
+
+def _params(user_id: int, prefs: UserPreferences) -> dict:
+    body = prefs.model_dump(exclude_none=True)
+    return {"id": user_id, "email": None, "locale": None,
+            "home_airport": body.pop("home_airport", None), "prefs": json.dumps(body)}
+
+
+async def invalidate(*user_ids: int) -> None:
+    """Drop cached profiles here, in Redis, and (via pub/sub) in other workers."""
+    for uid in user_ids:
+        _lru.pop(uid)
+    if aredis is None or not user_ids:
+        return
+    try:
+        pipe = aredis.pipeline(transaction=False)
+        for uid in user_ids:
+            # Fills that read the old generation are refused from here on
+            pipe.incr(_gen_key(uid))
+            pipe.expire(_gen_key(uid), settings.PROFILE_REDIS_TTL_SEC)
+        pipe.delete(*[_redis_key(uid) for uid in user_ids])
+        for uid in user_ids:
+            pipe.publish(INVALIDATE_CHANNEL, str(uid))
+        await pipe.execute()
+    except Exception as e:
+        print(f"[profiles] Redis invalidation failed (LRU TTL will expire it): {e}")
+
+
+async def save_profile(user_id: int, prefs: UserPreferences) -> dict:
+    async with engine.begin() as conn:
+        await conn.execute(text(upsert_sql(engine.dialect.name)), _params(user_id, prefs))
+    await invalidate(user_id)
+    return prefs.model_dump(exclude_none=True)
+
+
+async def listen_for_invalidations() -> None:
+    """Evict LRU entries updated by other workers. Runs for the process lifetime."""
+    if aredis is None:
+        return
+    delay = 1.0
+    reconnect = False
+    while True:
+        pubsub = aredis.pubsub(ignore_subscribe_messages=True)
+        try:
+            await pubsub.subscribe(INVALIDATE_CHANNEL)
+            if reconnect:
+                # We may have missed messages while disconnected
+                _lru.clear()
+            delay = 1.0
+            while True:
+                # Poll with a timeout shorter than the client's socket_timeout so
+                # an idle channel is not mistaken for a dropped connection
+                msg = await pubsub.get_message(timeout=1.0)
+                if msg is not None and msg.get("type") == "message":
+                    try:
+                        _lru.pop(int(msg["data"]))
+                    except ValueError:
+                        pass
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"[profiles] Invalidation listener reconnecting: {e}")
+            reconnect = True
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 30.0)
+        finally:
+            try:
+                await pubsub.aclose()
+            except Exception:
+                pass
+
+
+def apply_profile(req: PlanRequest, profile: Dict[str, Any]) -> PlanRequest:
+    """Fill fields the client did not send from the profile; explicit values win."""
+    updates = {
+        field: profile[key]
+        for field, key in _MERGE_FIELDS.items()
+        if field not in req.model_fields_set and profile.get(key) is not None
+    }
+    return req.model_copy(update=updates) if updates else req
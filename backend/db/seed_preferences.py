@@ -0,0 +1,89 @@
+# backend/db/seed_preferences.py
+"""
+Bulk-load user preferences from a JSONL file.
+
+Each line: {"id": 42, "email": "...", "locale": "fr", "home_airport": "CDG",
+            "preferences": {"interests": ["food"], "pace": "slow", ...}}
+
+The file is streamed and written in batches, so memory stays flat regardless
+of file size. Usage:
+
+    python -m backend.db.seed_preferences prefs.jsonl --batch-size 5000
+"""
+import argparse
+import asyncio
+import json
+from typing import Iterator, List
+
+from sqlalchemy import text
+
+from backend.deps import engine, init_db, close_db
+from backend.db.profiles import invalidate, upsert_sql
+from backend.models import UserPreferences
+
+
+def _rows(path: str) -> Iterator[dict]:
+    with open(path, "r", encoding="utf-8") as f:
+        for lineno, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                rec = json.loads(line)
+                user_id = int(rec.get("id", rec.get("user_id")))
+                prefs = UserPreferences(**(rec.get("preferences") or {}))
+            except Exception as e:
+                print(f"[seed_preferences] line {lineno}: skipped ({e})")
+                continue
+            body = prefs.model_dump(exclude_none=True)
+            body.pop("home_airport", None)
+            yield {
+                "id": user_id,
+                "email": rec.get("email"),
+                "locale": rec.get("locale"),
+                "home_airport": rec.get("home_airport") or prefs.home_airport,
+                "prefs": json.dumps(body),
+            }
+
+
+async def _flush(sql: str, batch: List[dict]) -> None:
+    async with engine.begin() as conn:
+        await conn.execute(text(sql), batch)
+    await invalidate(*[r["id"] for r in batch])
+
+
+async def seed(path: str, batch_size: int = 1000) -> int:
+    await init_db()
+    sql = upsert_sql(engine.dialect.name)
+    total = 0
+    batch: List[dict] = []
+    for row in _rows(path):
+        batch.append(row)
+        if len(batch) >= batch_size:
+            await _flush(sql, batch)
+            total += len(batch)
+            batch = []
+            print(f"[seed_preferences] {total} users written")
+    if batch:
+        await _flush(sql, batch)
+        total += len(batch)
+    return total
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("path", help="JSONL file with one user per line")
+    ap.add_argument("--batch-size", type=int, default=1000)
+    args = ap.parse_args()
+
+    async def run() -> int:
+        try:
+            return await seed(args.path, args.batch_size)
+        finally:
+            await close_db()
+
+    print(f"[seed_preferences] done: {asyncio.run(run())} users")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,78 +1,69 @@
 # backend/deps.py
-from sqlalchemy import create_engine, text
-from sqlalchemy.engine import Engine
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+from sqlalchemy.pool import NullPool
+
 from backend.config import settings
+from backend.db.migrations import migrate
+
+DB_URL = settings.async_db_url()
+
+
+def _engine_kwargs(url: str) -> dict:
+    kwargs = {"pool_pre_ping": True}
+    u = make_url(url)
+    if u.get_backend_name() == "sqlite":
+        if u.database in (None, "", ":memory:"):
+            # Single shared connection; pool sizing does not apply
+            return kwargs
+        # A pooled aiosqlite connection keeps a non-daemon thread alive until
+        # dispose(), which would hang any CLI that exits without close_db().
+        # Opening a SQLite file is cheap, so open one per checkout instead.
+        kwargs["poolclass"] = NullPool
+        return kwargs
+    kwargs.update(
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_recycle=settings.DB_POOL_RECYCLE_SEC,
+        pool_timeout=settings.DB_POOL_TIMEOUT_SEC,
+    )
+    return kwargs
+
 
-DB_URL = settings.db_url()
-engine: Engine = create_engine(DB_URL, pool_pre_ping=True, future=True)
+engine: AsyncEngine = create_async_engine(DB_URL, **_engine_kwargs(DB_URL))
 
-def _schema_sql_postgres() -> str:
-    return """
-CREATE TABLE IF NOT EXISTS users (
-  id SERIAL PRIMARY KEY,
-  email TEXT,
-  locale TEXT,
-  home_airport TEXT,
-  currency TEXT DEFAULT 'EUR',
-  preferences_json JSONB DEFAULT '{}'::jsonb
-);
-CREATE TABLE IF NOT EXISTS trips (
-  id SERIAL PRIMARY KEY,
-  user_id INT,
-  origin TEXT,
-  start_date DATE,
-  end_date DATE,
-  budget_eur INT,
-  party_size INT,
-  style TEXT,
-  created_at TIMESTAMP DEFAULT NOW()
-);
-CREATE TABLE IF NOT EXISTS feedback (
-  id SERIAL PRIMARY KEY,
-  trip_id INT,
-  rating NUMERIC,
-  comments TEXT,
-  created_at TIMESTAMP DEFAULT NOW()
-);
-"""
+if engine.dialect.name == "sqlite":
+    @event.listens_for(engine.sync_engine, "connect")
+    def _sqlite_pragmas(dbapi_conn, _record) -> None:
+        # WAL lets readers proceed while a writer commits
+        cur = dbapi_conn.cursor()
+        cur.execute("PRAGMA journal_mode=WAL")
+        cur.execute("PRAGMA synchronous=NORMAL")
+        cur.close()
 
-def _schema_sql_sqlite() -> str:
-    return """
-CREATE TABLE IF NOT EXISTS users (
-  id INTEGER PRIMARY KEY AUTOINCREMENT,
-  email TEXT,
-  locale TEXT,
-  home_airport TEXT,
-  currency TEXT DEFAULT 'EUR',
-  preferences_json TEXT DEFAULT '{}'
-);
-CREATE TABLE IF NOT EXISTS trips (
-  id INTEGER PRIMARY KEY AUTOINCREMENT,
-  user_id INTEGER,
-  origin TEXT,
-  start_date TEXT,
-  end_date TEXT,
-  budget_eur INTEGER,
-  party_size INTEGER,
-  style TEXT,
-  created_at TEXT DEFAULT (datetime('now'))
-);
-CREATE TABLE IF NOT EXISTS feedback (
-  id INTEGER PRIMARY KEY AUTOINCREMENT,
-  trip_id INTEGER,
-  rating REAL,
-  comments TEXT,
-  created_at TEXT DEFAULT (datetime('now'))
-);
-"""
 
-def init_db() -> None:
+# Optional Redis: `redis` for sync callers, `aredis` for the event loop. None when unset.
+redis = None
+aredis = None
+if settings.redis_url():
+    from redis import Redis
+    from redis.asyncio import Redis as AsyncRedis
+
+    redis = Redis.from_url(settings.redis_url(), socket_timeout=2.0)
+    aredis = AsyncRedis.from_url(settings.redis_url(), socket_timeout=2.0)
+
+
+async def init_db() -> None:
     try:
-        dialect = engine.url.get_backend_name()
-        schema = _schema_sql_postgres() if dialect.startswith("postgres") else _schema_sql_sqlite()
-        with engine.begin() as conn:
-            # Execute each statement separately to appease SQLite
-            for stmt in [s.strip() for s in schema.strip().split(";\n") if s.strip()]:
-                conn.execute(text(stmt))
+        applied = await migrate(engine)
+        if applied:
+            print(f"[deps.init_db] Applied migrations: {applied}")
     except Exception as e:
-        print(f"[deps.init_db] Skipped DB init due to: {e}")
\ No newline at end of file
+        print(f"[deps.init_db] Skipped DB init due to: {e}")
+
+
+async def close_db() -> None:
+    await engine.dispose()
+    if aredis is not None:
+        await aredis.aclose()
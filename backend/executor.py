@@ -0,0 +1,251 @@
+# backend/executor.py
+"""
+Process pool for the CPU-bound optimization phase of planning.
+
+    alts = await executor.get().alternatives(travel, nights, values, interest)
+    # {"cheapest": (order, nights, score), "relaxed": ..., "interests": ...}
+
+Run on the event loop, a search over every subset and order of the cities
+would stall every other request of the worker. Here each objective is one
+task on a bounded ProcessPoolExecutor (PLAN_POOL_WORKERS processes, started
+with PLAN_POOL_START_METHOD so no threads are forked), so the alternatives
+of one request are searched in parallel across cores.
+
+- Inputs (travel matrix, city values, interest weights) are written once
+  into a shared-memory segment (SharedArrays); tasks get its name and array
+  offsets, not pickled arrays, and map the same pages.
+- Cancellation: every request holds a slot in a shared "cancel board", one
+  byte per slot that the search polls between DP layers and scoring chunks.
+  Setting it (time budget spent, request cancelled) stops running tasks;
+  tasks still queued are cancelled outright. The segment and the slot are
+  released when the last task of the request has finished.
+- Bounded: at most PLAN_POOL_SLOTS requests are in the pool per API worker;
+  past that, plans are made without alternatives instead of queueing.
+"""
+import asyncio
+import multiprocessing as mp
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import Dict, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+
+from backend import metrics
+from backend.agents import optimizer
+from backend.config import settings
+
+ArraySpec = Tuple[str, int, Tuple[int, ...], str]      # key, byte offset, shape, dtype
+SharedRef = Tuple[str, Tuple[ArraySpec, ...]]          # segment name, arrays
+Structure = Tuple[List[int], List[int], float]         # order, nights per city, score
+
+
+class SharedArrays:
+    """Numpy arrays packed into one shared-memory segment (64-byte aligned)."""
+
+    def __init__(self, arrays: Dict[str, np.ndarray]):
+        specs: List[ArraySpec] = []
+        off = 0
+        for key, a in arrays.items():
+            off = (off + 63) & ~63
+            specs.append((key, off, tuple(a.shape), np.dtype(a.dtype).str))
+            off += a.nbytes
+        self.shm = shared_memory.SharedMemory(create=True, size=max(off, 1))
+        for (_, o, shape, dt), a in zip(specs, arrays.values()):
+            view = np.ndarray(shape, dt, self.shm.buf, o)
+            view[...] = a
+            del view  # no exported pointers may remain when the segment is closed
+        self.ref: SharedRef = (self.shm.name, tuple(specs))
+
+    def release(self) -> None:
+        self.shm.close()
+        self.shm.unlink()
+
+
+# --------------------------
+# Worker processes
+# --------------------------
+_board: Optional[shared_memory.SharedMemory] = None
+
+
+def _init_worker(board_name: str) -> None:
+    global _board
+    _board = shared_memory.SharedMemory(board_name)
+
+
+def _ping() -> bool:
+    return True
+
+
+def _solve(ref: SharedRef, slot: int, deadline: float, objective: str, nights: int) -> Optional[Structure]:
+    """One objective's search; None when stopped (cancel flag or deadline)."""
+    board = _board.buf
+    shm = shared_memory.SharedMemory(ref[0])
+    result: Optional[Structure] = None
+    error = ""
+    a = {key: np.ndarray(shape, dt, shm.buf, off) for key, off, shape, dt in ref[1]}
+    try:
+        result = optimizer.search_structure(
+            a["travel"], a["values"], a["interest"], nights, optimizer.OBJECTIVES[objective],
+            should_stop=lambda: board[slot] != 0 or time.time() > deadline,
+        )
+    except optimizer.Stopped:
+        pass
+    except Exception as e:  # re-raised below, once the views into the segment are gone
+        error = f"{type(e).__name__}: {e}"
+    a = None
+    shm.close()
+    if error:
+        raise RuntimeError(error)
+    return result
+
+
+# --------------------------
+# API side
+# --------------------------
+class PlanExecutor:
+    def __init__(self, workers: Optional[int] = None, slots: Optional[int] = None):
+        self.workers = settings.PLAN_POOL_WORKERS if workers is None else workers
+        self.slots = settings.PLAN_POOL_SLOTS if slots is None else slots
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._board: Optional[shared_memory.SharedMemory] = None
+        self._free: List[int] = list(range(self.slots))
+        self._active: Set[int] = set()
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.workers > 0
+
+    def start(self) -> None:
+        """Create the pool and spawn its processes now (blocking), not on the first plan."""
+        with self._lock:
+            if not self.enabled or self._pool is not None:
+                return
+            self._board = shared_memory.SharedMemory(create=True, size=max(1, self.slots))
+            self._board.buf[:self.slots] = bytes(self.slots)
+            self._pool = ProcessPoolExecutor(
+                self.workers, mp_context=mp.get_context(settings.PLAN_POOL_START_METHOD),
+                initializer=_init_worker, initargs=(self._board.name,),
+            )
+        for f in [self._pool.submit(_ping) for _ in range(self.workers)]:
+            f.result()
+        print(f"[executor] {self.workers} planning processes ({settings.PLAN_POOL_START_METHOD})")
+
+    def shutdown(self) -> None:
+        with self._lock:
+            pool, board, self._pool, self._board = self._pool, self._board, None, None
+        if pool is not None:
+            pool.shutdown(wait=True, cancel_futures=True)
+        if board is not None:
+            board.close()
+            board.unlink()
+
+    def _take_slot(self) -> Optional[int]:
+        with self._lock:
+            if not self._free or self._pool is None:
+                return None
+            slot = self._free.pop()
+            self._active.add(slot)
+            return slot
+
+    def _release(self, slot: int, shared: SharedArrays) -> None:
+        shared.release()
+        with self._lock:
+            if self._board is not None:
+                self._board.buf[slot] = 0
+            self._active.discard(slot)
+            self._free.append(slot)
+
+    async def alternatives(self, travel: np.ndarray, nights: int, values: Sequence[float],
+                           interest: Sequence[float], objectives: Sequence[str] = (),
+                           budget_sec: Optional[float] = None) -> Dict[str, Structure]:
+        """
+        Best structure per objective, searched in parallel in the pool. Objectives
+        not finished within `budget_sec` (PLAN_OPTIMIZE_BUDGET_MS) are left out.
+        """
+        objectives = list(objectives or (o.strip() for o in settings.PLAN_ALTERNATIVES.split(",") if o.strip()))
+        budget = settings.PLAN_OPTIMIZE_BUDGET_MS / 1000.0 if budget_sec is None else budget_sec
+        if not objectives:
+            return {}
+        slot = self._take_slot()
+        if slot is None:
+            for name in objectives:
+                metrics.PLAN_POOL.labels(name, "shed" if self._pool is not None else "disabled").inc()
+            return {}
+
+        shared = SharedArrays({
+            "travel": np.ascontiguousarray(travel, np.float64),
+            "values": np.asarray(values, np.float64),
+            "interest": np.asarray(interest, np.float64),
+        })
+        deadline = time.time() + budget
+        futures: Dict[str, Future] = {}
+        left = [len(objectives)]
+
+        def done(_: Future) -> None:   # pool thread; the last task of the request frees its resources
+            with self._lock:
+                left[0] -= 1
+                last = left[0] == 0
+            if last:
+                self._release(slot, shared)
+
+        try:
+            for name in objectives:
+                futures[name] = self._pool.submit(_solve, shared.ref, slot, deadline, name, nights)
+        except RuntimeError:   # pool shut down meanwhile
+            for name in objectives:
+                metrics.PLAN_POOL.labels(name, "error").inc()
+            for f in futures.values():
+                f.cancel()
+            self._release(slot, shared)
+            return {}
+        for f in futures.values():
+            f.add_done_callback(done)
+
+        waiting = {asyncio.wrap_future(f): name for name, f in futures.items()}
+        try:
+            finished, _ = await asyncio.wait(waiting, timeout=budget)
+        except asyncio.CancelledError:
+            self._stop(slot, futures.values())
+            for name in objectives:
+                metrics.PLAN_POOL.labels(name, "cancelled").inc()
+            raise
+        self._stop(slot, futures.values())
+
+        out: Dict[str, Structure] = {}
+        for fut, name in waiting.items():
+            if fut not in finished:
+                fut.cancel()
+                metrics.PLAN_POOL.labels(name, "timeout").inc()
+            elif fut.exception() is not None:
+                print(f"[executor] {name} search failed: {fut.exception()}")
+                metrics.PLAN_POOL.labels(name, "error").inc()
+            elif fut.result() is None:
+                metrics.PLAN_POOL.labels(name, "timeout").inc()
+            else:
+                out[name] = fut.result()
+                metrics.PLAN_POOL.labels(name, "ok").inc()
+        return out
+
+    def _stop(self, slot: int, futures) -> None:
+        """Cancel queued tasks and flag running ones of `slot` to stop."""
+        pending = [f for f in futures if not f.done()]
+        if not pending:
+            return
+        with self._lock:
+            if self._board is not None and slot in self._active:   # not yet released and reused
+                self._board.buf[slot] = 1
+        for f in pending:
+            f.cancel()
+
+
+_executor: Optional[PlanExecutor] = None
+
+
+def get() -> PlanExecutor:
+    global _executor
+    if _executor is None:
+        _executor = PlanExecutor()
+    return _executor
@@ -0,0 +1,562 @@
+# backend/jobs.py
+"""
+Asynchronous plan jobs, for trips that take longer than a request should stay open.
+
+    POST /plan/jobs?priority=high     -> {"job_id": ..., "status": "queued", "deduplicated": false}
+    GET  /plan/jobs/{job_id}          -> status, and the /plan body once done
+    GET  /plan/jobs/{job_id}/events   -> the same, as server-sent events
+
+    python -m backend.jobs worker --processes 4 --concurrency 8   # the worker fleet
+
+With Redis configured the queue and the results live there (RedisBroker):
+API workers only enqueue and read, and plans run in the worker processes,
+which scale on their own. Without Redis a LocalBroker in the API process
+stands in and JOB_INLINE_WORKERS consumer tasks there run the jobs (dev and
+tests). JOB_INLINE_WORKERS > 0 with Redis also makes API workers consume.
+
+- Priority: high, normal, low; first come, first served within a priority.
+- De-duplication: a request identical to a job still queued or running gets
+  that job's ID back instead of a new job.
+- Durability: a worker holds a lease on its job and renews it while it runs.
+  Jobs whose lease lapses (the worker died) go back to the queue, up to
+  JOB_MAX_ATTEMPTS runs in total.
+- Retries: a plan whose flight, weather or hotel lookup fell back on a
+  transient provider error (timeout, 429/5xx, dropped connection; not a
+  missing key) is planned again up to JOB_STAGE_RETRIES times, with the same city
+  per night and every good answer kept; fallbacks are never cached, so only
+  the failed lookups reach the providers again. Any other error short of a
+  bad request re-runs the job, with backoff, within JOB_MAX_ATTEMPTS.
+- Results and errors are kept JOB_RESULT_TTL_SEC after the job finishes.
+"""
+import argparse
+import asyncio
+import hashlib
+import heapq
+import json
+import os
+import signal
+import sys
+import time
+import uuid
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+from backend import metrics
+from backend.config import settings
+
+PRIORITIES = {"high": 0, "normal": 1, "low": 2}
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+TERMINAL = (DONE, FAILED)
+_PUBLIC = ("job_id", "status", "priority", "attempts", "created_at", "started_at", "finished_at",
+           "retried_stages", "error", "result")
+
+
+def request_key(payload: dict) -> str:
+    """Identity of a plan request for de-duplication."""
+    return hashlib.sha1(json.dumps(payload, sort_keys=True).encode()).hexdigest()
+
+
+def public(job: dict) -> dict:
+    return {k: job.get(k) for k in _PUBLIC}
+
+
+def _new_job(payload: dict, priority: str) -> dict:
+    now = time.time()
+    return {
+        "job_id": uuid.uuid4().hex, "status": QUEUED, "priority": priority, "request": payload,
+        "key": request_key(payload), "score": PRIORITIES[priority] * 1e13 + now * 1000,
+        "attempts": 0, "created_at": now, "started_at": None, "finished_at": None,
+        "retried_stages": [], "error": None, "result": None,
+    }
+
+
+# --------------------------
+# Brokers
+# --------------------------
+class LocalBroker:
+    """In-process stand-in for RedisBroker: one API worker, jobs lost on restart."""
+
+    def __init__(self):
+        self._jobs: Dict[str, dict] = {}
+        self._expires: Dict[str, float] = {}
+        self._queue: List[Tuple[float, str]] = []
+        self._pending: Dict[str, str] = {}       # request key -> job_id
+        self._subs: Dict[str, List[asyncio.Queue]] = {}
+        self._ready = asyncio.Event()
+
+    async def submit(self, job: dict) -> Tuple[dict, bool]:
+        self._purge()
+        existing = self._pending.get(job["key"])
+        if existing is not None:
+            return self._jobs[existing], False
+        self._jobs[job["job_id"]] = job
+        self._pending[job["key"]] = job["job_id"]
+        heapq.heappush(self._queue, (job["score"], job["job_id"]))
+        self._ready.set()
+        return job, True
+
+    async def load(self, job_id: str) -> Optional[dict]:
+        self._purge()
+        job = self._jobs.get(job_id)
+        return dict(job) if job is not None else None
+
+    async def claim(self, wait_sec: float) -> Optional[dict]:
+        if not self._queue:
+            self._ready.clear()
+            try:
+                await asyncio.wait_for(self._ready.wait(), wait_sec)
+            except asyncio.TimeoutError:
+                return None
+            if not self._queue:
+                return None
+        _, job_id = heapq.heappop(self._queue)
+        return dict(self._jobs[job_id])
+
+    async def save(self, job: dict) -> None:
+        self._jobs[job["job_id"]] = job
+        if job["status"] in TERMINAL:
+            self._expires[job["job_id"]] = time.time() + settings.JOB_RESULT_TTL_SEC
+            if self._pending.get(job["key"]) == job["job_id"]:
+                del self._pending[job["key"]]
+        for q in self._subs.get(job["job_id"], ()):
+            q.put_nowait(public(job))
+
+    async def renew(self, job_id: str) -> None:
+        pass
+
+    async def recover(self) -> List[str]:
+        return []
+
+    async def subscribe(self, job_id: str) -> "_LocalSubscription":
+        return _LocalSubscription(self._subs, job_id)
+
+    def _purge(self) -> None:
+        now = time.time()
+        for job_id in [j for j, t in self._expires.items() if t <= now]:
+            del self._expires[job_id]
+            self._jobs.pop(job_id, None)
+
+
+class _LocalSubscription:
+    def __init__(self, subs: Dict[str, List[asyncio.Queue]], job_id: str):
+        self.subs, self.job_id = subs, job_id
+        self.q: asyncio.Queue = asyncio.Queue()
+        subs.setdefault(job_id, []).append(self.q)
+
+    async def next(self, timeout: float) -> Optional[dict]:
+        try:
+            return await asyncio.wait_for(self.q.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    async def close(self) -> None:
+        self.subs[self.job_id].remove(self.q)
+        if not self.subs[self.job_id]:
+            del self.subs[self.job_id]
+
+
+# Enqueue unless an identical request is pending; returns the job JSON in force
+_SUBMIT = """
+local existing = redis.call('GET', KEYS[1])
+if existing then
+  local job = redis.call('GET', ARGV[4] .. existing)
+  if job then return job end
+end
+redis.call('SET', KEYS[1], ARGV[1], 'EX', ARGV[5])
+redis.call('SET', KEYS[2], ARGV[2], 'EX', ARGV[5])
+redis.call('ZADD', KEYS[3], ARGV[3], ARGV[1])
+return ARGV[2]
+"""
+# Move the first queued job to the leased set; returns its JSON
+_CLAIM = """
+local ids = redis.call('ZRANGE', KEYS[1], 0, 0)
+if #ids == 0 then return false end
+redis.call('ZREM', KEYS[1], ids[1])
+local job = redis.call('GET', ARGV[2] .. ids[1])
+if not job then return false end
+redis.call('ZADD', KEYS[2], ARGV[1], ids[1])
+return job
+"""
+# Put jobs whose lease lapsed back in the queue; returns their IDs
+_RECOVER = """
+local ids = redis.call('ZRANGEBYSCORE', KEYS[2], '-inf', ARGV[1])
+local out = {}
+for _, id in ipairs(ids) do
+  redis.call('ZREM', KEYS[2], id)
+  local job = redis.call('GET', ARGV[2] .. id)
+  if job then
+    redis.call('ZADD', KEYS[1], cjson.decode(job)['score'], id)
+    table.insert(out, id)
+  end
+end
+return out
+"""
+_RELEASE = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then redis.call('DEL', KEYS[1]) end
+"""
+
+
+class RedisBroker:
+    """Queue (sorted set by priority, then age), leases, jobs and events in Redis."""
+
+    P = "tcopilot:jobs:"
+
+    def __init__(self, redis):
+        self.r = redis
+        self._submit = redis.register_script(_SUBMIT)
+        self._claim = redis.register_script(_CLAIM)
+        self._recover = redis.register_script(_RECOVER)
+        self._release = redis.register_script(_RELEASE)
+
+    def _job(self, job_id: str) -> str:
+        return f"{self.P}job:{job_id}"
+
+    async def submit(self, job: dict) -> Tuple[dict, bool]:
+        raw = await self._submit(
+            keys=[f"{self.P}pending:{job['key']}", self._job(job["job_id"]), f"{self.P}queue"],
+            args=[job["job_id"], json.dumps(job), job["score"], f"{self.P}job:", settings.JOB_PENDING_TTL_SEC],
+        )
+        stored = json.loads(raw)
+        return stored, stored["job_id"] == job["job_id"]
+
+    async def load(self, job_id: str) -> Optional[dict]:
+        raw = await self.r.get(self._job(job_id))
+        return json.loads(raw) if raw else None
+
+    async def claim(self, wait_sec: float) -> Optional[dict]:
+        raw = await self._claim(keys=[f"{self.P}queue", f"{self.P}leased"],
+                                args=[time.time() + settings.JOB_LEASE_SEC, f"{self.P}job:"])
+        if not raw:
+            await asyncio.sleep(min(wait_sec, settings.JOB_POLL_SEC))
+            return None
+        return json.loads(raw)
+
+    async def save(self, job: dict) -> None:
+        body = json.dumps(job)
+        async with self.r.pipeline(transaction=False) as pipe:
+            if job["status"] in TERMINAL:
+                pipe.set(self._job(job["job_id"]), body, ex=settings.JOB_RESULT_TTL_SEC)
+                pipe.zrem(f"{self.P}leased", job["job_id"])
+            else:
+                pipe.set(self._job(job["job_id"]), body, ex=settings.JOB_PENDING_TTL_SEC)
+            pipe.publish(f"{self.P}events:{job['job_id']}", json.dumps(public(job)))
+            await pipe.execute()
+        if job["status"] in TERMINAL:
+            await self._release(keys=[f"{self.P}pending:{job['key']}"], args=[job["job_id"]])
+
+    async def renew(self, job_id: str) -> None:
+        await self.r.zadd(f"{self.P}leased", {job_id: time.time() + settings.JOB_LEASE_SEC}, xx=True)
+
+    async def recover(self) -> List[str]:
+        ids = await self._recover(keys=[f"{self.P}queue", f"{self.P}leased"], args=[time.time(), f"{self.P}job:"])
+        return [i.decode() if isinstance(i, bytes) else i for i in ids]
+
+    async def subscribe(self, job_id: str) -> "_RedisSubscription":
+        pubsub = self.r.pubsub()
+        await pubsub.subscribe(f"{self.P}events:{job_id}")
+        await pubsub.get_message(timeout=1.0)   # the confirmation: subscribed from here on
+        return _RedisSubscription(pubsub)
+
+
+class _RedisSubscription:
+    def __init__(self, pubsub):
+        self.pubsub = pubsub
+
+    async def next(self, timeout: float) -> Optional[dict]:
+        msg = await self.pubsub.get_message(ignore_subscribe_messages=True, timeout=timeout)
+        return json.loads(msg["data"]) if msg else None
+
+    async def close(self) -> None:
+        await self.pubsub.unsubscribe()
+        await self.pubsub.aclose()
+
+
+_broker = None
+
+
+def broker():
+    global _broker
+    if _broker is None:
+        from backend.deps import aredis
+        _broker = RedisBroker(aredis) if aredis is not None else LocalBroker()
+    return _broker
+
+
+# --------------------------
+# API side
+# --------------------------
+async def submit(payload: dict, priority: str = "normal") -> Tuple[dict, bool]:
+    """Queue a plan request; (job, created), with created False for a duplicate of a pending job."""
+    job, created = await broker().submit(_new_job(payload, priority))
+    metrics.JOBS.labels("submitted" if created else "deduplicated").inc()
+    return job, created
+
+
+async def load(job_id: str) -> Optional[dict]:
+    return await broker().load(job_id)
+
+
+async def watch(job_id: str, keepalive_sec: float = 15.0) -> AsyncIterator[Optional[dict]]:
+    """The job now, then on every change until it finishes; None as a keep-alive tick."""
+    sub = await broker().subscribe(job_id)   # before the snapshot, so no change is missed
+    try:
+        job = await load(job_id)
+        if job is None:
+            return
+        yield public(job)
+        status = job["status"]
+        while status not in TERMINAL:
+            event = await sub.next(keepalive_sec)
+            yield event
+            if event is not None:
+                status = event["status"]
+    finally:
+        await sub.close()
+
+
+async def sse(job_id: str) -> AsyncIterator[str]:
+    """watch() as a text/event-stream body."""
+    async for event in watch(job_id):
+        yield ": keep-alive\n\n" if event is None else f"event: {event['status']}\ndata: {json.dumps(event)}\n\n"
+
+
+# --------------------------
+# Workers
+# --------------------------
+class BadRequest(ValueError):
+    """A job that cannot succeed however often it runs."""
+
+
+def failed_stages(state: dict) -> List[str]:
+    """
+    Provider lookups of a planner state that fell back on a transient error
+    (timeout, 429/5xx, dropped connection): "flight", "weather:<date>",
+    "hotel:<date>". Fallbacks that would recur, like a missing API key, are left out.
+    """
+    out = []
+    flight = state["flight"]
+    if flight.get("retryable") and any(c.startswith("skyscanner-fallback:") for c in flight["citations"]):
+        out.append("flight")
+    for d in state["days"]:
+        if d["weather"].get("fallback") and d["weather"].get("transient"):
+            out.append(f"weather:{d['date']}")
+        if "fallback" in d["hotel"].get("provider", "") and d["hotel"].get("transient"):
+            out.append(f"hotel:{d['date']}")
+    return out
+
+
+def _keep_good(state: dict, failed: List[str]) -> dict:
+    """`state` as the `previous` of a re-plan, without the failed lookups."""
+    dates = {s.split(":", 1)[1] for s in failed if ":" in s}
+    keep = dict(state, days=[d for d in state["days"] if d["date"] not in dates])
+    if "flight" in failed:
+        keep["flight"] = None
+    return keep
+
+
+async def run_plan(job: dict) -> dict:
+    """Plan a job's request, re-planning failed provider lookups; returns the /plan body."""
+    from backend import capture, plan_store
+    from backend.agents.critic import check
+    from backend.agents.planner import build_plan
+    from backend.db.profiles import apply_profile, get_profile
+    from backend.models import PlanRequest
+    from backend.tools.seeding import set_request_seed
+
+    try:
+        req = PlanRequest(**job["request"])
+        if req.user_id is not None:
+            req = apply_profile(req, await get_profile(req.user_id))
+        set_request_seed(capture.request_seed(req.model_dump()))
+        result, state, _ = await build_plan(req)
+    except ValueError as e:
+        raise BadRequest(str(e)) from e
+    for attempt in range(settings.JOB_STAGE_RETRIES):
+        failed = failed_stages(state)
+        if not failed:
+            break
+        job["retried_stages"] = sorted(set(job["retried_stages"]) | set(failed))
+        await broker().save(job)
+        metrics.JOBS.labels("stage_retry").inc()
+        await asyncio.sleep(settings.JOB_STAGE_RETRY_DELAY_SEC * 2 ** attempt)
+        result, retried, _ = await build_plan(req, state["day_cities"], previous=_keep_good(state, failed))
+        state = dict(retried, alternatives=state["alternatives"])
+    issues = check(result, req)
+    plan_id = await plan_store.save(state, result)
+    return {
+        "plan_id": plan_id,
+        "result": result.model_dump(),
+        "issues": [i.message for i in issues],
+        "issue_details": [i.as_dict() for i in issues],
+        "alternatives": state.get("alternatives", []),
+        "mode": "normal",
+    }
+
+
+async def _renew(job_id: str) -> None:
+    while True:
+        await asyncio.sleep(settings.JOB_LEASE_SEC / 3)
+        try:
+            await broker().renew(job_id)
+        except Exception as e:
+            print(f"[jobs] lease renewal failed for {job_id}: {e}")
+
+
+async def _finish(job: dict, status: str, result: Optional[dict] = None, error: Optional[str] = None) -> None:
+    job.update(status=status, result=result, error=error, finished_at=time.time())
+    await broker().save(job)
+    metrics.JOBS.labels(status).inc()
+
+
+async def execute(job: dict) -> None:
+    """Run one claimed job to completion, failure or its attempt limit."""
+    if job["attempts"] >= settings.JOB_MAX_ATTEMPTS:   # requeued after its last worker died
+        return await _finish(job, FAILED, error=job.get("error") or "worker lost")
+    renewer = asyncio.create_task(_renew(job["job_id"]))
+    try:
+        while True:
+            job.update(status=RUNNING, attempts=job["attempts"] + 1, started_at=time.time())
+            await broker().save(job)
+            try:
+                body = await run_plan(job)
+            except BadRequest as e:
+                return await _finish(job, FAILED, error=str(e))
+            except Exception as e:
+                if job["attempts"] >= settings.JOB_MAX_ATTEMPTS:
+                    return await _finish(job, FAILED, error=f"{type(e).__name__}: {e}")
+                print(f"[jobs] {job['job_id']} attempt {job['attempts']} failed, retrying: {e}")
+                job["error"] = f"{type(e).__name__}: {e}"
+                metrics.JOBS.labels("retried").inc()
+                await asyncio.sleep(settings.JOB_STAGE_RETRY_DELAY_SEC * 2 ** (job["attempts"] - 1))
+                continue
+            return await _finish(job, DONE, result=body)
+    finally:
+        renewer.cancel()
+
+
+async def consume(concurrency: int, stop: asyncio.Event) -> None:
+    """Claim and run jobs, `concurrency` at a time, until `stop` is set; then finish those running."""
+    slots = asyncio.Semaphore(concurrency)
+    running: set = set()
+    next_recover = 0.0
+    while not stop.is_set():
+        await slots.acquire()
+        try:
+            if time.monotonic() >= next_recover:
+                next_recover = time.monotonic() + settings.JOB_LEASE_SEC
+                recovered = await broker().recover()
+                if recovered:
+                    print(f"[jobs] requeued {len(recovered)} jobs with a lapsed lease")
+                    metrics.JOBS.labels("recovered").inc(len(recovered))
+            job = await broker().claim(wait_sec=1.0)
+        except Exception as e:
+            slots.release()
+            print(f"[jobs] queue unavailable: {e}")
+            await asyncio.sleep(1.0)
+            continue
+        if job is None:
+            slots.release()
+            continue
+        task = asyncio.create_task(execute(job))
+        running.add(task)
+        task.add_done_callback(running.discard)
+        task.add_done_callback(lambda _: slots.release())
+    if running:
+        await asyncio.wait(running)
+
+
+def start_inline() -> Optional[asyncio.Task]:
+    """Consumer task for an API worker (JOB_INLINE_WORKERS; by default only without Redis)."""
+    n = settings.JOB_INLINE_WORKERS
+    if n < 0:
+        n = 0 if isinstance(broker(), RedisBroker) else settings.JOB_WORKER_CONCURRENCY
+    if n == 0:
+        return None
+    return asyncio.create_task(consume(n, asyncio.Event()))
+
+
+# --------------------------
+# Worker fleet
+# --------------------------
+def _worker_process(concurrency: int) -> None:
+    from backend import deps, executor
+
+    async def main() -> None:
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            loop.add_signal_handler(sig, stop.set)
+        try:
+            await asyncio.to_thread(executor.get().start)
+        except Exception as e:
+            print(f"[jobs] planning pool unavailable, plans come without alternatives: {e}")
+        try:
+            await consume(concurrency, stop)
+        finally:
+            await asyncio.to_thread(executor.get().shutdown)
+            await deps.close_db()
+
+    asyncio.run(main())
+
+
+def _fleet(processes: int, concurrency: int) -> None:
+    """Fork the worker processes and replace any that die, until SIGTERM/SIGINT."""
+    children: Dict[int, int] = {}
+    stopping = False
+
+    def spawn(slot: int) -> None:
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                _worker_process(concurrency)
+            except BaseException as e:
+                print(f"[jobs] worker {os.getpid()} failed: {e}", file=sys.stderr)
+                code = 1
+            finally:
+                sys.stdout.flush()
+                sys.stderr.flush()
+                os._exit(code)
+        children[pid] = slot
+
+    def stop(_signum, _frame) -> None:
+        nonlocal stopping
+        stopping = True
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    for slot in range(processes):
+        spawn(slot)
+    print(f"[jobs] {processes} worker processes x {concurrency} jobs (master pid {os.getpid()})")
+    while children:
+        try:
+            pid, status = os.waitpid(-1, 0)
+        except ChildProcessError:
+            break
+        except InterruptedError:
+            continue
+        slot = children.pop(pid, None)
+        if slot is not None and not stopping:
+            print(f"[jobs] worker {slot} (pid {pid}) exited with status {status}; restarting")
+            time.sleep(1.0)
+            spawn(slot)
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Plan job workers")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    w = sub.add_parser("worker", help="run the worker fleet (needs REDIS_URL)")
+    w.add_argument("--processes", type=int, default=settings.JOB_WORKER_PROCESSES)
+    w.add_argument("--concurrency", type=int, default=settings.JOB_WORKER_CONCURRENCY, help="jobs per process")
+    args = ap.parse_args()
+    if not settings.redis_url():
+        sys.exit("[jobs] REDIS_URL not set: workers would not share a queue with the API")
+    _fleet(max(1, args.processes), max(1, args.concurrency))
+
+
+if __name__ == "__main__":
+    main()
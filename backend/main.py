@@ -1,16 +1,37 @@
 # backend/main.py
-from fastapi import FastAPI, HTTPException
+import asyncio
+import datetime
+import gc
+import time
+from contextlib import asynccontextmanager
+from typing import Optional
+
+from fastapi import FastAPI, HTTPException, Request, Response
+from fastapi.responses import StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 
-from backend.models import PlanRequest
-from backend.agents.planner import plan_itinerary
-from backend.agents.critic import validate
-from backend.deps import init_db
+from backend.models import Feedback, PlanRequest, PlanDelta, UserPreferences
+from backend.agents.planner import build_plan
+from backend.agents.replanner import apply_delta, replan as replan_trip
+from backend.agents.critic import Issue, check
+from backend.deps import close_db
+from backend.db.profiles import get_profile, save_profile, apply_profile, listen_for_invalidations
+from backend.db.feedback_agg import record_feedback
 from backend.config import settings
+from backend import admission, metrics, capture, prefetch, plan_store, executor, jobs
+from backend.tools.seeding import set_request_seed
+from backend.tools import providers, registry, retrieval
 
 
 app = FastAPI(title="Travel Copilot FR", version="1.0.0")
 
+if settings.PRELOAD:
+    # Runs once in a preloading master (e.g. gunicorn --preload); forked workers
+    # share the imported modules copy-on-write. gc.freeze() keeps the collector
+    # from touching (and so copying) those pages in every worker.
+    registry.warm()
+    gc.freeze()
+
 # CORS (open for local dev; restrict in prod)
 app.add_middleware(
     CORSMiddleware,
@@ -21,12 +42,27 @@ app.add_middleware(
 
 
 @app.on_event("startup")
-def startup():
-    # Don’t crash the server if DB isn’t available in dev
+async def startup():
+    # Migrations run once before the workers start (backend.serve, or
+    # `python -m backend.db.migrations`), not in every worker
+    app.state.profile_listener = asyncio.create_task(listen_for_invalidations())
+    app.state.prefetcher = asyncio.create_task(prefetch.run()) if settings.PREFETCH_ENABLED else None
     try:
-        init_db()
+        await asyncio.to_thread(executor.get().start)
     except Exception as e:
-        print(f"[deps.init_db] Skipped DB init due to: {e}")
+        print(f"[executor] planning pool unavailable, plans come without alternatives: {e}")
+    app.state.job_consumer = jobs.start_inline()
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    app.state.profile_listener.cancel()
+    if app.state.prefetcher is not None:
+        app.state.prefetcher.cancel()
+    if app.state.job_consumer is not None:
+        app.state.job_consumer.cancel()
+    await asyncio.to_thread(executor.get().shutdown)
+    await close_db()
 
 
 @app.get("/health")
@@ -58,15 +94,233 @@ def config():
     }
 
 
+@app.get("/metrics")
+def prometheus_metrics():
+    body, content_type = metrics.exposition()
+    return Response(content=body, media_type=content_type)
+
+
+@app.get("/prefetch")
+def prefetch_stats():
+    """Hot provider keys and the latency prefetching has saved so far (this worker)."""
+    return prefetch.stats()
+
+
+@app.get("/pois")
+def pois(city: str, q: str = "", interests: str = "", max_price: Optional[float] = None, k: int = 8,
+         date: Optional[str] = None, at: str = "", minutes: int = 60):
+    """
+    Hybrid POI search (tag/price bitmaps, BM25, dense) over the shared catalog;
+    interests comma-separated. With `date` and `at` (HH:MM), only POIs open
+    from then for `minutes`.
+    """
+    r = retrieval.retriever()
+    if r is None:
+        raise HTTPException(status_code=503, detail="POI catalog not built")
+    wanted = [i.strip() for i in interests.split(",") if i.strip()]
+    open_at = None
+    if date and at:
+        try:
+            open_at = (datetime.date.fromisoformat(date), int(at[:2]) * 60 + int(at[3:5]), minutes)
+        except ValueError:
+            raise HTTPException(status_code=422, detail="date must be YYYY-MM-DD and at HH:MM")
+    hits = r.search(city, q, wanted, max_price, k=max(1, min(k, 50)), open_at=open_at)
+    return {"city": city, "results": [{**r.cat.row(i), "score": round(s, 5)} for i, s in hits]}
+
+
+@asynccontextmanager
+async def _admitted(request: Request, response: Response):
+    """
+    Admission slot for a plan request, yielding the degraded-mode source list
+    (None in normal mode). Overload is a 503 with Retry-After.
+    """
+    try:
+        async with admission.get().admit(admission.deadline_from(request.headers.get("x-deadline-ms", ""))) as mode:
+            if mode == admission.DEGRADED:
+                response.headers["X-Plan-Mode"] = "degraded"
+                with providers.degraded() as sources:
+                    yield sources
+            else:
+                yield None
+    except admission.Overloaded as e:
+        metrics.PLANS.labels("shed").inc()
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+
+
+def _flag_degraded(result, issues: list, sources) -> None:
+    """Mark a plan made in degraded mode in its citations and issues."""
+    if sources is None:
+        return
+    citations, message = admission.degraded_notes(sources)
+    result.citations.extend(citations)
+    issues.insert(0, Issue("degraded", "warning", message))
+
+
+@app.get("/admission")
+def admission_stats():
+    """Plans in flight, queued and in degraded mode (this worker)."""
+    return admission.get().stats()
+
+
 @app.post("/plan")
-async def plan(req: PlanRequest):
+async def plan(req: PlanRequest, request: Request, response: Response):
     """
     Create an itinerary. The planner internally calls weather / flights / hotels tools
     based on provider flags and uses graceful fallbacks where configured.
+
+    Send `X-Debug-Timing: 1` to get a per-stage timing breakdown back in
+    `timings` and the Server-Timing header. Under overload the plan may be made
+    in degraded mode (cached or estimated provider data; `mode`, the X-Plan-Mode
+    header, `citations` and `issues` say so) or refused with 503.
     """
+    async with _admitted(request, response) as degraded:
+        return await _plan(req, request, response, degraded)
+
+
+async def _plan(req: PlanRequest, request: Request, response: Response, degraded) -> dict:
+    debug = request.headers.get("x-debug-timing", "") not in ("", "0")
+    if debug:
+        metrics.track_request()
+    t0 = time.perf_counter()
+    sess = None
     try:
-        result = await plan_itinerary(req)
-        issues = validate(result)
-        return {"result": result.model_dump(), "issues": issues}
+        with metrics.stage("plan"):
+            if req.user_id is not None:
+                with metrics.stage("profile"):
+                    req = apply_profile(req, await get_profile(req.user_id))
+            payload = req.model_dump()
+            seed = capture.request_seed(payload)
+            set_request_seed(seed)
+            sess = capture.start(seed)
+            result, state, _ = await build_plan(req)
+            with metrics.stage("critic"):
+                issues = check(result, req)
+            _flag_degraded(result, issues, degraded)
     except Exception as e:
-        raise HTTPException(status_code=400, detail=str(e))
\ No newline at end of file
+        metrics.PLANS.labels("error").inc()
+        if sess is not None:
+            capture.finish(sess, payload, None, (time.perf_counter() - t0) * 1000.0, error=str(e))
+        raise HTTPException(status_code=400, detail=str(e))
+    metrics.PLANS.labels("ok" if degraded is None else "degraded").inc()
+    result_dict = result.model_dump()
+    capture.finish(sess, payload, result_dict, (time.perf_counter() - t0) * 1000.0)
+    plan_id = await plan_store.save(state, result)
+    body = {
+        "plan_id": plan_id,
+        "result": result_dict,
+        "issues": [i.message for i in issues],
+        "issue_details": [i.as_dict() for i in issues],
+        "alternatives": state.get("alternatives", []),
+        "mode": admission.NORMAL if degraded is None else admission.DEGRADED,
+    }
+    if debug:
+        summary = metrics.summarize(metrics.timings() or [])
+        response.headers["Server-Timing"] = metrics.server_timing(summary)
+        body["timings"] = summary
+    return body
+
+
+@app.post("/plan/jobs", status_code=202)
+async def submit_plan_job(req: PlanRequest, priority: str = "normal"):
+    """
+    Queue a plan and return its job ID at once (priority: high|normal|low).
+    An identical request still queued or running returns that job instead.
+    """
+    if priority not in jobs.PRIORITIES:
+        raise HTTPException(status_code=422, detail=f"priority must be one of {', '.join(jobs.PRIORITIES)}")
+    job, created = await jobs.submit(req.model_dump(), priority)
+    return {"job_id": job["job_id"], "status": job["status"], "deduplicated": not created}
+
+
+@app.get("/plan/jobs/{job_id}")
+async def read_plan_job(job_id: str):
+    """Job status; `result` holds the /plan body once `status` is done."""
+    job = await jobs.load(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"unknown or expired job_id: {job_id}")
+    return jobs.public(job)
+
+
+@app.get("/plan/jobs/{job_id}/events")
+async def plan_job_events(job_id: str):
+    """Server-sent events: the job now, then each change until it is done or failed."""
+    if await jobs.load(job_id) is None:
+        raise HTTPException(status_code=404, detail=f"unknown or expired job_id: {job_id}")
+    return StreamingResponse(jobs.sse(job_id), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+@app.get("/plan/{plan_id}")
+async def read_plan(plan_id: str):
+    state = await plan_store.load(plan_id)
+    if state is None:
+        raise HTTPException(status_code=404, detail=f"unknown or expired plan_id: {plan_id}")
+    return {"plan_id": plan_id, "parent_id": state.get("parent_id"), "result": state["response"].to_response().model_dump()}
+
+
+@app.post("/plan/{plan_id}/replan")
+async def replan(plan_id: str, delta: PlanDelta, request: Request, response: Response):
+    """
+    Re-plan a stored plan with a delta (dates, cities, swap_cities, budget, ...).
+    Only days, legs and provider lookups the delta invalidates are recomputed;
+    `diff` says per date what was added, removed, changed or kept.
+    Admission and degraded mode work as for /plan.
+    """
+    async with _admitted(request, response) as degraded:
+        return await _replan(plan_id, delta, degraded)
+
+
+async def _replan(plan_id: str, delta: PlanDelta, degraded) -> dict:
+    state = await plan_store.load(plan_id)
+    if state is None:
+        raise HTTPException(status_code=404, detail=f"unknown or expired plan_id: {plan_id}")
+    try:
+        with metrics.stage("replan"):
+            req = apply_delta(PlanRequest(**state["request"]), delta)
+            set_request_seed(capture.request_seed(req.model_dump()))
+            result, new_state, diff = await replan_trip(state, req, delta.swap_cities)
+            issues = check(result, req)
+            _flag_degraded(result, issues, degraded)
+    except Exception as e:
+        metrics.PLANS.labels("error").inc()
+        raise HTTPException(status_code=400, detail=str(e))
+    metrics.PLANS.labels("ok" if degraded is None else "degraded").inc()
+    new_id = await plan_store.save(new_state, result, parent_id=plan_id)
+    return {
+        "plan_id": new_id,
+        "parent_id": plan_id,
+        "result": result.model_dump(),
+        "issues": [i.message for i in issues],
+        "issue_details": [i.as_dict() for i in issues],
+        "diff": diff,
+        "mode": admission.NORMAL if degraded is None else admission.DEGRADED,
+    }
+
+
+@app.post("/plan/{plan_id}/feedback")
+async def plan_feedback(plan_id: str, fb: Feedback):
+    """
+    Rate a stored plan, one of its cities (`city`) or an activity there
+    (`activity`). Ratings reach the planner's city values after the next
+    feedback_agg run.
+    """
+    state = await plan_store.load(plan_id)
+    if state is None:
+        raise HTTPException(status_code=404, detail=f"unknown or expired plan_id: {plan_id}")
+    cities = list(dict.fromkeys(state["day_cities"]))
+    if fb.city is not None:
+        if fb.city not in cities:
+            raise HTTPException(status_code=422, detail=f"city must be one of {', '.join(cities)}")
+        cities = [fb.city]
+    recorded = await record_feedback(cities, fb.rating, fb.activity, fb.comments)
+    return {"plan_id": plan_id, "recorded": recorded}
+
+
+@app.get("/users/{user_id}/preferences")
+async def read_preferences(user_id: int):
+    return {"user_id": user_id, "preferences": await get_profile(user_id)}
+
+
+@app.put("/users/{user_id}/preferences")
+async def update_preferences(user_id: int, prefs: UserPreferences):
+    return {"user_id": user_id, "preferences": await save_profile(user_id, prefs)}
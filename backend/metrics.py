@@ -0,0 +1,175 @@
+# backend/metrics.py
+"""
+Prometheus metrics and per-request timing spans.
+
+    with metrics.stage("weather"):                 # planner stage timing
+        with metrics.provider_call("openmeteo") as call:
+            w = await forecast(...)
+            if w.get("fallback"):
+                call.outcome = "fallback"          # hit | miss | fallback | error | prefetch | climatology
+
+Each span costs two perf_counter() calls and one histogram observe. Per-request
+breakdowns are only collected when a request opts in via track_request().
+"""
+import os
+import time
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Tuple
+
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram, generate_latest, multiprocess
+
+# Provider calls range from sub-ms cache hits to multi-second retry storms
+_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+PROVIDER_SECONDS = Histogram(
+    "tcopilot_provider_call_seconds",
+    "Latency of provider calls",
+    ["provider", "outcome"],
+    buckets=_BUCKETS,
+)
+STAGE_SECONDS = Histogram(
+    "tcopilot_plan_stage_seconds",
+    "Latency of planner stages",
+    ["stage"],
+    buckets=_BUCKETS,
+)
+FALLBACKS = Counter(
+    "tcopilot_provider_fallback_total",
+    "Times a provider was replaced by its fallback",
+    ["provider", "reason"],
+)
+RETRIES = Counter(
+    "tcopilot_provider_retry_total",
+    "Provider call retries",
+    ["provider", "reason"],
+)
+HEDGES = Counter(
+    "tcopilot_provider_hedge_total",
+    "Hedged provider calls (secondary started) by which answer was used",
+    ["provider", "winner"],  # primary | secondary | none
+)
+PLANS = Counter(
+    "tcopilot_plan_requests_total",
+    "Plan requests by result",
+    ["status"],
+)
+PLAN_POOL = Counter(
+    "tcopilot_plan_pool_tasks_total",
+    "Alternative-itinerary searches in the planning pool",
+    ["objective", "outcome"],  # ok | timeout | cancelled | error | shed | disabled
+)
+ADMISSION = Counter(
+    "tcopilot_admission_total",
+    "Plan requests by admission decision",
+    ["outcome"],  # admitted | queued | degraded | shed
+)
+ADMISSION_QUEUE = Gauge(
+    "tcopilot_admission_queue",
+    "Plan requests waiting for a slot",
+    multiprocess_mode="livesum",
+)
+JOBS = Counter(
+    "tcopilot_plan_jobs_total",
+    "Plan job events",
+    ["event"],  # submitted | deduplicated | done | failed | retried | stage_retry | recovered
+)
+PREFETCH_REFRESHES = Counter(
+    "tcopilot_prefetch_refresh_total",
+    "Prefetch refresh attempts",
+    ["provider", "outcome"],  # ok | uncacheable | error | budget
+)
+PREFETCH_HITS = Counter(
+    "tcopilot_prefetch_hit_total",
+    "User lookups served from a prefetched cache entry",
+    ["provider"],
+)
+PREFETCH_SAVED = Counter(
+    "tcopilot_prefetch_saved_seconds_total",
+    "Estimated user-facing provider latency avoided by prefetching",
+    ["provider"],
+)
+
+# (span name, seconds) for the current request, or None when not tracking
+_timings: ContextVar[Optional[List[Tuple[str, float]]]] = ContextVar("timings", default=None)
+
+
+def track_request() -> None:
+    """Start collecting spans for the current request (see timings())."""
+    _timings.set([])
+
+
+def timings() -> Optional[List[Tuple[str, float]]]:
+    return _timings.get()
+
+
+def _record(name: str, seconds: float) -> None:
+    spans = _timings.get()
+    if spans is not None:
+        spans.append((name, seconds))
+
+
+class stage:
+    """Time a planner stage."""
+
+    __slots__ = ("name", "_t0")
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __enter__(self) -> "stage":
+        self._t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        dt = time.perf_counter() - self._t0
+        STAGE_SECONDS.labels(self.name).observe(dt)
+        _record(self.name, dt)
+
+
+class provider_call:
+    """Time one provider call; outcome defaults to 'miss', or 'error' if it raises."""
+
+    __slots__ = ("provider", "outcome", "_t0")
+
+    def __init__(self, provider: str):
+        self.provider = provider
+        self.outcome = "miss"
+
+    def __enter__(self) -> "provider_call":
+        self._t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        dt = time.perf_counter() - self._t0
+        if exc_type is not None:
+            self.outcome = "error"
+        PROVIDER_SECONDS.labels(self.provider, self.outcome).observe(dt)
+        _record(f"{self.provider}:{self.outcome}", dt)
+
+
+def summarize(spans: List[Tuple[str, float]]) -> Dict[str, dict]:
+    """Aggregate spans by name: {name: {"count": n, "ms": total}}."""
+    out: Dict[str, dict] = {}
+    for name, dt in spans:
+        agg = out.setdefault(name, {"count": 0, "ms": 0.0})
+        agg["count"] += 1
+        agg["ms"] += dt * 1000.0
+    for agg in out.values():
+        agg["ms"] = round(agg["ms"], 2)
+    return out
+
+
+def server_timing(summary: Dict[str, dict]) -> str:
+    """Render a summary as a Server-Timing header value."""
+    return ", ".join(
+        f"{name.replace(':', '-')};dur={agg['ms']}" for name, agg in summary.items()
+    )
+
+
+def exposition() -> Tuple[bytes, str]:
+    """Prometheus text exposition body and content type (summed over workers under backend.serve)."""
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(), CONTENT_TYPE_LATEST
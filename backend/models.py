@@ -1,8 +1,9 @@
 from pydantic import BaseModel, Field
-from typing import List, Optional
+from typing import Dict, List, Optional
 
 class PlanRequest(BaseModel):
-    origin: str = Field(..., example="CDG")
+    user_id: Optional[int] = Field(None, description="Fill unset fields from this user's saved preferences")
+    origin: Optional[str] = Field(None, example="CDG", description="Defaults to the user's home_airport")
     cities: List[str] = Field(..., example=["Paris", "Lyon"])
     start_date: str
     end_date: str
@@ -12,6 +13,38 @@ class PlanRequest(BaseModel):
     interests: List[str] = Field(default_factory=lambda: ["food", "art", "history"])
     max_walk_km_per_day: float = 10.0
     language: str = Field("en", description="en|fr")
+    keep_city_order: bool = Field(False, description="Visit cities in the given order instead of the optimized route")
+
+class PlanDelta(BaseModel):
+    """Changes to a stored plan for /plan/{plan_id}/replan; unset fields keep their value."""
+    start_date: Optional[str] = None
+    end_date: Optional[str] = None
+    cities: Optional[List[str]] = None
+    swap_cities: Dict[str, str] = Field(default_factory=dict, example={"Lyon": "Bordeaux"})
+    budget_eur: Optional[int] = None
+    party_size: Optional[int] = None
+    pace: Optional[str] = None
+    interests: Optional[List[str]] = None
+    max_walk_km_per_day: Optional[float] = None
+    language: Optional[str] = None
+    keep_city_order: Optional[bool] = None
+
+class UserPreferences(BaseModel):
+    """Saved defaults for PlanRequest; None means 'not set'."""
+    home_airport: Optional[str] = None
+    interests: Optional[List[str]] = None
+    pace: Optional[str] = None
+    budget_eur: Optional[int] = None
+    party_size: Optional[int] = None
+    max_walk_km_per_day: Optional[float] = None
+    language: Optional[str] = None
+
+class Feedback(BaseModel):
+    """Rating of a stored plan for /plan/{plan_id}/feedback."""
+    rating: float = Field(..., ge=1, le=5, example=4.5)
+    city: Optional[str] = Field(None, example="Lyon", description="One of the plan's cities; unset rates every city of the plan")
+    activity: Optional[str] = Field(None, example="Museum/landmark", description="Rate one activity of the city instead of the whole stay")
+    comments: Optional[str] = None
 
 class Activity(BaseModel):
     title: str
@@ -21,11 +54,17 @@ class Activity(BaseModel):
     cost_eur: float
     transport_mode: str
     url: Optional[str] = None
+    lat: Optional[float] = None
+    lon: Optional[float] = None
+    hours: Optional[str] = Field(None, example="09:00-18:00", description="Opening hours, same format as POI hours")
+    outdoor: bool = False
 
 class DayPlan(BaseModel):
     date: str
     city: str
     activities: List[Activity]
+    lodging_eur: float = 0.0
+    rain_risk: Optional[float] = None
 
 class PlanResponse(BaseModel):
     summary: str
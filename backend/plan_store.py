@@ -0,0 +1,31 @@
+# backend/plan_store.py
+"""
+Stored plans for incremental re-planning.
+
+/plan saves the planner state (request, city per night, flight and per-day
+provider answers) under a plan ID; /plan/{plan_id}/replan loads it, applies
+a delta and reuses whatever the delta leaves valid. Backed by the shared TTL
+cache, so plans live in Redis when configured and expire after
+PLAN_STORE_TTL_SEC. In Redis they are stored with backend/codec.py.
+"""
+import uuid
+from typing import Optional
+
+from backend.cache import TTLCache
+from backend.codec import PlanRecord
+from backend.config import settings
+from backend.models import PlanResponse
+
+_store = TTLCache("plan", maxsize=settings.PLAN_STORE_LOCAL_MAXSIZE, stale_grace_sec=0)
+
+
+async def save(state: dict, response: PlanResponse, parent_id: Optional[str] = None) -> str:
+    """Store a plan; the response is kept as a tuple-backed PlanRecord."""
+    plan_id = uuid.uuid4().hex
+    value = dict(state, parent_id=parent_id, response=PlanRecord.from_response(response))
+    await _store.set(plan_id, value, settings.PLAN_STORE_TTL_SEC)
+    return plan_id
+
+
+async def load(plan_id: str) -> Optional[dict]:
+    return await _store.get(plan_id)
@@ -0,0 +1,210 @@
+# backend/prefetch.py
+"""
+Background prefetch of hot provider keys.
+
+The provider layer (backend/tools/providers.py) reports every cached lookup
+here: weather by (coords, date), flights by (origin, destination, date) and
+hotels by (city, date, party, cap). Each key keeps an exponentially decayed
+request count (half-life PREFETCH_HALF_LIFE_SEC). Every PREFETCH_INTERVAL_SEC
+the scheduler takes the PREFETCH_TOP_N hottest keys and refreshes those that
+are missing or within PREFETCH_LEAD_SEC of expiry, so the next user request
+is a cache hit instead of a provider round trip.
+
+Prefetch traffic is rate limited per provider (PREFETCH_BUDGETS, calls per
+minute, token bucket); user traffic is not counted against it. When a user
+request is served from a prefetched entry after the entry it replaced would
+have expired, the typical miss latency for that provider kind is credited as
+latency saved (see stats() and /metrics).
+
+Started from backend/main.py when PREFETCH_ENABLED=1.
+"""
+import asyncio
+import time
+from datetime import date
+from typing import Dict, List, Optional, Tuple
+
+from backend import metrics
+from backend.config import settings
+
+# Position of the travel date in each kind's provider arguments
+_DATE_ARG = {"weather": 2, "flights": 2, "hotels": 1}
+
+Key = Tuple[str, str, tuple]  # (kind, provider name, args)
+
+
+class _Hot:
+    __slots__ = ("score", "ts")
+
+    def __init__(self, score: float, ts: float):
+        self.score = score
+        self.ts = ts
+
+
+class HotKeys:
+    """Decayed request counts per provider key, bounded to max_keys."""
+
+    def __init__(self, half_life_sec: float, max_keys: int):
+        self.half_life_sec = half_life_sec
+        self.max_keys = max_keys
+        self._keys: Dict[Key, _Hot] = {}
+
+    def _decayed(self, h: _Hot, now: float) -> float:
+        return h.score * 0.5 ** ((now - h.ts) / self.half_life_sec)
+
+    def record(self, key: Key, now: Optional[float] = None) -> None:
+        now = now or time.time()
+        h = self._keys.get(key)
+        if h is None:
+            self._keys[key] = _Hot(1.0, now)
+            if len(self._keys) > self.max_keys:
+                self._prune(now)
+        else:
+            h.score = self._decayed(h, now) + 1.0
+            h.ts = now
+
+    def _prune(self, now: float) -> None:
+        ranked = sorted(self._keys.items(), key=lambda kv: self._decayed(kv[1], now))
+        for k, _ in ranked[: len(ranked) - self.max_keys * 9 // 10]:
+            del self._keys[k]
+
+    def top(self, n: int, min_score: float = 0.0) -> List[Tuple[Key, float]]:
+        now = time.time()
+        scored = ((k, self._decayed(h, now)) for k, h in self._keys.items())
+        hot = [kv for kv in scored if kv[1] >= min_score]
+        hot.sort(key=lambda kv: kv[1], reverse=True)
+        return hot[:n]
+
+    def drop(self, key: Key) -> None:
+        self._keys.pop(key, None)
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+
+class TokenBucket:
+    __slots__ = ("rate", "capacity", "tokens", "ts")
+
+    def __init__(self, per_minute: float):
+        self.rate = per_minute / 60.0
+        self.capacity = max(1.0, per_minute / 6.0)  # allow ~10s worth of burst
+        self.tokens = self.capacity
+        self.ts = time.monotonic()
+
+    def take(self) -> bool:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.ts) * self.rate)
+        self.ts = now
+        if self.tokens >= 1.0:
+            self.tokens -= 1.0
+            return True
+        return False
+
+
+def _parse_budgets(spec: str) -> Dict[str, float]:
+    out: Dict[str, float] = {}
+    for part in spec.split(","):
+        name, _, rate = part.partition("=")
+        if name.strip() and rate.strip():
+            out[name.strip()] = float(rate)
+    return out
+
+
+HOT = HotKeys(settings.PREFETCH_HALF_LIFE_SEC, settings.PREFETCH_MAX_KEYS)
+_budgets = _parse_budgets(settings.PREFETCH_BUDGETS)
+_buckets: Dict[str, TokenBucket] = {}
+
+# EWMA of provider miss latency per kind, the yardstick for "latency saved"
+_miss_latency: Dict[str, float] = {}
+_saved: Dict[str, float] = {}
+_hits: Dict[str, int] = {}
+
+
+def _bucket(provider: str) -> TokenBucket:
+    b = _buckets.get(provider)
+    if b is None:
+        b = _buckets[provider] = TokenBucket(_budgets.get(provider, settings.PREFETCH_DEFAULT_BUDGET))
+    return b
+
+
+def record(kind: str, name: str, args: tuple) -> None:
+    HOT.record((kind, name, args))
+
+
+def observe_miss(kind: str, seconds: float) -> None:
+    prev = _miss_latency.get(kind)
+    _miss_latency[kind] = seconds if prev is None else 0.9 * prev + 0.1 * seconds
+
+
+def served(provider: str, kind: str) -> None:
+    """A user lookup hit a prefetched entry that it would otherwise have missed."""
+    saved = _miss_latency.get(kind, 0.0)
+    metrics.PREFETCH_HITS.labels(provider).inc()
+    metrics.PREFETCH_SAVED.labels(provider).inc(saved)
+    _hits[provider] = _hits.get(provider, 0) + 1
+    _saved[provider] = _saved.get(provider, 0.0) + saved
+
+
+def _expired(kind: str, args: tuple) -> bool:
+    try:
+        return date.fromisoformat(str(args[_DATE_ARG[kind]])[:10]) < date.today()
+    except (IndexError, KeyError, ValueError):
+        return False
+
+
+async def _refresh(key: Key, sem: asyncio.Semaphore) -> None:
+    from backend.tools import providers, registry
+
+    kind, name, args = key
+    label = registry.label(kind, name)
+    async with sem:
+        entry = await providers.peek(kind, name, args)
+        if entry is not None and entry.ttl_left() > settings.PREFETCH_LEAD_SEC:
+            return
+        if not _bucket(label).take():
+            metrics.PREFETCH_REFRESHES.labels(label, "budget").inc()
+            return
+        try:
+            ok = await providers.refresh(kind, name, args)
+            metrics.PREFETCH_REFRESHES.labels(label, "ok" if ok else "uncacheable").inc()
+        except Exception as e:
+            metrics.PREFETCH_REFRESHES.labels(label, "error").inc()
+            print(f"[prefetch] {kind}:{name}{args} failed: {type(e).__name__}: {e}")
+
+
+async def tick() -> int:
+    """One scheduling pass; returns the number of hot keys considered."""
+    keys = []
+    for key, _ in HOT.top(settings.PREFETCH_TOP_N, settings.PREFETCH_MIN_SCORE):
+        if _expired(key[0], key[2]):
+            HOT.drop(key)  # travel date has passed; nobody will ask again
+            continue
+        keys.append(key)
+    sem = asyncio.Semaphore(settings.PREFETCH_CONCURRENCY)
+    await asyncio.gather(*(_refresh(k, sem) for k in keys))
+    return len(keys)
+
+
+async def run() -> None:
+    """Scheduler loop; runs until cancelled."""
+    while True:
+        try:
+            await tick()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"[prefetch] pass failed: {e}")
+        await asyncio.sleep(settings.PREFETCH_INTERVAL_SEC)
+
+
+def stats(top: int = 10) -> dict:
+    return {
+        "enabled": settings.PREFETCH_ENABLED,
+        "tracked_keys": len(HOT),
+        "hot": [
+            {"kind": k[0], "provider": k[1], "args": list(k[2]), "score": round(s, 2)}
+            for k, s in HOT.top(top)
+        ],
+        "hits": dict(_hits),
+        "saved_sec": {p: round(s, 3) for p, s in _saved.items()},
+        "miss_latency_ms": {k: round(v * 1000.0, 1) for k, v in _miss_latency.items()},
+    }
@@ -0,0 +1,104 @@
+# backend/replay.py
+"""
+Replay captured /plan traffic offline.
+
+Runs plan_itinerary for each line of a capture log, answering every provider
+call from the recording (no network). Mock providers are re-seeded with the
+recorded seed, so results must match the captured result digest.
+
+    python -m backend.replay requests.jsonl                   # as fast as possible
+    python -m backend.replay requests.jsonl --timing recorded # sleep recorded provider latency
+    python -m backend.replay requests.jsonl --profile out.prof --limit 200
+"""
+import argparse
+import asyncio
+import cProfile
+import json
+import time
+from typing import Iterator
+
+from backend import capture
+from backend.agents.planner import plan_itinerary
+from backend.deps import close_db
+from backend.models import PlanRequest
+from backend.tools.seeding import set_request_seed
+
+
+def _records(path: str) -> Iterator[dict]:
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            rec = json.loads(line)
+            if "request" in rec and "calls" in rec:
+                yield rec
+
+
+async def _replay_one(rec: dict, recorded_timing: bool) -> dict:
+    set_request_seed(rec.get("seed", ""))
+    capture.start_replay(rec["calls"], recorded_timing)
+    t0 = time.perf_counter()
+    try:
+        result = await plan_itinerary(PlanRequest(**rec["request"]))
+        digest = capture.result_digest(result.model_dump())
+        error = ""
+    except capture.ReplayMiss as e:
+        digest, error = None, f"replay miss: {e}"
+    except Exception as e:
+        digest, error = None, f"{type(e).__name__}: {e}"
+    return {
+        "elapsed_ms": (time.perf_counter() - t0) * 1000.0,
+        "recorded_ms": rec.get("elapsed_ms", 0.0),
+        "match": digest == rec.get("result_sha1"),
+        "error": error,
+    }
+
+
+async def replay(path: str, recorded_timing: bool, limit: int) -> dict:
+    n = matches = 0
+    elapsed = recorded = 0.0
+    for rec in _records(path):
+        if limit and n >= limit:
+            break
+        out = await _replay_one(rec, recorded_timing)
+        n += 1
+        matches += out["match"]
+        elapsed += out["elapsed_ms"]
+        recorded += out["recorded_ms"]
+        if not out["match"]:
+            print(f"[replay] #{n} mismatch {out['error'] or 'result differs'}: {rec['request'].get('cities')}")
+    return {
+        "requests": n,
+        "identical": matches,
+        "replay_ms_total": round(elapsed, 2),
+        "recorded_ms_total": round(recorded, 2),
+    }
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("path")
+    ap.add_argument("--timing", choices=["fast", "recorded"], default="fast")
+    ap.add_argument("--limit", type=int, default=0)
+    ap.add_argument("--profile", help="Write cProfile stats here")
+    args = ap.parse_args()
+
+    async def go() -> dict:
+        try:
+            return await replay(args.path, args.timing == "recorded", args.limit)
+        finally:
+            await close_db()
+
+    run = lambda: asyncio.run(go())
+    if args.profile:
+        prof = cProfile.Profile()
+        summary = prof.runcall(run)
+        prof.dump_stats(args.profile)
+    else:
+        summary = run()
+    print(json.dumps(summary, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,201 @@
+# backend/serve.py
+"""
+Production entry point: a pre-forking server for backend.main:app.
+
+    python -m backend.serve --host 0.0.0.0 --port 8000 --workers 4
+
+The master process
+- points prometheus_client at a fresh multiprocess directory, so /metrics in
+  any worker reports the sum over all workers,
+- runs the DB migrations once,
+- builds the memory-mapped datasets if they are missing or stale
+  (backend/datasets.py) and reads them once into the page cache,
+- builds the hotel inventory of cities that have none (backend/tools/inventory.py),
+- binds the listening socket,
+- imports the app with PRELOAD=1 (providers warmed, gc.freeze()), and then
+- forks the workers. Each runs its own uvicorn server and event loop on the
+  shared socket; the kernel spreads connections across them.
+
+Workers share imported code copy-on-write and the datasets through the page
+cache. Per-worker state (DB/Redis connections, the provider and plan LRUs,
+the prefetcher) is created after the fork. The local LRUs sit in front of
+the shared Redis tier, so with REDIS_URL set a value fetched by one worker
+is a Redis hit for the others; without Redis each worker caches on its own.
+
+A worker that dies is replaced. SIGTERM/SIGINT are passed on to the workers,
+which finish in-flight requests (SERVE_GRACEFUL_SEC) before exiting.
+"""
+import argparse
+import os
+import shutil
+import signal
+import socket
+import sys
+import tempfile
+import time
+from typing import Dict, Optional
+
+
+def _bind(host: str, port: int, backlog: int) -> socket.socket:
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+def _worker(app, sock: socket.socket, args: argparse.Namespace) -> None:
+    import asyncio
+
+    import uvicorn
+
+    from backend.config import settings
+
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    config = uvicorn.Config(
+        app,
+        log_level=args.log_level,
+        access_log=args.access_log,
+        timeout_graceful_shutdown=settings.SERVE_GRACEFUL_SEC,
+    )
+    server = uvicorn.Server(config)
+    asyncio.run(server.serve(sockets=[sock]))
+
+
+class Master:
+    def __init__(self, app, sock: socket.socket, args: argparse.Namespace):
+        self.app = app
+        self.sock = sock
+        self.args = args
+        self.workers: Dict[int, int] = {}   # pid -> slot
+        self.stopping = False
+
+    def spawn(self, slot: int) -> None:
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                _worker(self.app, self.sock, self.args)
+            except BaseException as e:
+                print(f"[serve] worker {os.getpid()} failed: {e}", file=sys.stderr)
+                code = 1
+            finally:
+                sys.stdout.flush()
+                sys.stderr.flush()
+                os._exit(code)
+        self.workers[pid] = slot
+        print(f"[serve] worker {slot} started (pid {pid})")
+
+    def _stop(self, signum, _frame) -> None:
+        self.stopping = True
+        for pid in list(self.workers):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    def run(self) -> None:
+        from prometheus_client import multiprocess
+
+        signal.signal(signal.SIGTERM, self._stop)
+        signal.signal(signal.SIGINT, self._stop)
+        for slot in range(self.args.workers):
+            self.spawn(slot)
+
+        deadline: Optional[float] = None
+        while self.workers:
+            try:
+                pid, status = os.waitpid(-1, 0)
+            except ChildProcessError:
+                break
+            except InterruptedError:
+                continue
+            slot = self.workers.pop(pid, None)
+            if slot is None:
+                continue
+            multiprocess.mark_process_dead(pid)
+            if self.stopping:
+                continue
+            print(f"[serve] worker {slot} (pid {pid}) exited with status {status}; restarting")
+            # Crash loop guard: don't respawn faster than once a second
+            if deadline is not None and time.monotonic() < deadline:
+                time.sleep(1.0)
+            deadline = time.monotonic() + 1.0
+            self.spawn(slot)
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Pre-forking server for backend.main:app")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=int(os.getenv("PORT", 8000)))
+    ap.add_argument("--workers", type=int, default=None, help="default: WEB_CONCURRENCY or CPU count")
+    ap.add_argument("--log-level", default="info")
+    ap.add_argument("--access-log", action="store_true")
+    ap.add_argument("--skip-datasets", action="store_true", help="don't build/refresh data/ mmaps")
+    args = ap.parse_args()
+
+    # Both are read at import time (prometheus_client, backend.config), so set them first
+    metrics_dir = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+    own_metrics_dir = not metrics_dir
+    if own_metrics_dir:
+        metrics_dir = tempfile.mkdtemp(prefix="tcopilot-metrics-")
+        os.environ["PROMETHEUS_MULTIPROC_DIR"] = metrics_dir
+    else:
+        # Stale files from a previous run would be summed into the new one
+        for name in os.listdir(metrics_dir):
+            if name.endswith(".db"):
+                os.remove(os.path.join(metrics_dir, name))
+    os.environ.setdefault("PRELOAD", "1")
+
+    from backend.config import settings
+    from backend import datasets
+    from backend.tools import climatology
+
+    args.workers = max(1, args.workers or settings.SERVE_WORKERS)
+    if args.workers > 1 and not settings.redis_url():
+        print("[serve] REDIS_URL not set: provider and plan caches are per worker "
+              "(and plans saved by one worker are unknown to the others)")
+
+    if not args.skip_datasets:
+        datasets.ensure_built()
+        climatology.table()
+        cat = datasets.catalog()
+        if cat is not None:
+            print(f"[serve] {len(cat)} POIs mapped ({cat.touch()} bytes) from {cat.path}")
+        if settings.HOTEL_INVENTORY_ENABLED:
+            import asyncio
+            from backend.tools import inventory
+
+            # Only cities without an inventory; refreshing stale ones is `inventory refresh`
+            built = asyncio.run(inventory.refresh(max_age_sec=float("inf")))
+            if built:
+                print(f"[serve] hotel inventory built for {', '.join(built)}")
+
+    # Migrate once here; the workers' startup hook does not.
+    # The engine is disposed so no pooled connection is inherited across fork.
+    import asyncio
+    from backend import deps
+
+    async def _migrate() -> None:
+        await deps.init_db()
+        await deps.engine.dispose()
+
+    asyncio.run(_migrate())
+
+    sock = _bind(args.host, args.port, settings.SERVE_BACKLOG)
+    from backend.main import app
+
+    print(f"[serve] listening on {args.host}:{args.port} with {args.workers} workers (master pid {os.getpid()})")
+    try:
+        Master(app, sock, args).run()
+    finally:
+        sock.close()
+        if own_metrics_dir:
+            shutil.rmtree(metrics_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
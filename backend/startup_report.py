@@ -0,0 +1,86 @@
+# backend/startup_report.py
+"""
+Break down API cold-start time by imported module.
+
+Runs `python -X importtime -c "import backend.main"` in a fresh interpreter
+and ranks modules by cumulative import time, plus a per-package rollup.
+
+    python -m backend.startup_report             # top 25 modules
+    python -m backend.startup_report --top 50 --target backend.agents.planner
+    python -m backend.startup_report --json
+"""
+import argparse
+import json
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from typing import Dict, List
+
+
+def measure(target: str = "backend.main") -> Dict[str, object]:
+    t0 = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {target}"],
+        capture_output=True,
+        text=True,
+    )
+    wall = time.perf_counter() - t0
+    if proc.returncode != 0:
+        raise SystemExit(proc.stderr.strip().splitlines()[-1] if proc.stderr else "import failed")
+
+    modules: List[dict] = []
+    for line in proc.stderr.splitlines():
+        # "import time:   self [us] | cumulative | imported package"
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        try:
+            self_us, cum_us, name = line[len("import time:"):].split("|", 2)
+            depth = (len(name) - len(name.lstrip())) // 2
+            modules.append({
+                "module": name.strip(),
+                "self_ms": int(self_us) / 1000.0,
+                "cumulative_ms": int(cum_us) / 1000.0,
+                "depth": depth,
+            })
+        except ValueError:
+            continue
+
+    by_package: Dict[str, float] = defaultdict(float)
+    for m in modules:
+        by_package[m["module"].split(".")[0]] += m["self_ms"]
+
+    return {
+        "target": target,
+        "interpreter_wall_ms": round(wall * 1000.0, 1),
+        "imports_ms": round(sum(m["self_ms"] for m in modules), 1),
+        "modules": sorted(modules, key=lambda m: m["cumulative_ms"], reverse=True),
+        "packages": dict(sorted(by_package.items(), key=lambda kv: kv[1], reverse=True)),
+    }
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--target", default="backend.main")
+    ap.add_argument("--top", type=int, default=25)
+    ap.add_argument("--json", action="store_true")
+    args = ap.parse_args()
+
+    report = measure(args.target)
+    if args.json:
+        report["modules"] = report["modules"][: args.top]
+        print(json.dumps(report, indent=2))
+        return
+
+    print(f"import {report['target']}: {report['imports_ms']} ms in imports, "
+          f"{report['interpreter_wall_ms']} ms wall (incl. interpreter start)\n")
+    print(f"{'cumulative ms':>14}{'self ms':>10}  module")
+    for m in report["modules"][: args.top]:
+        print(f"{m['cumulative_ms']:>14.1f}{m['self_ms']:>10.1f}  {'  ' * m['depth']}{m['module']}")
+    print(f"\n{'self ms':>14}  package")
+    for pkg, ms in list(report["packages"].items())[: args.top]:
+        print(f"{ms:>14.1f}  {pkg}")
+
+
+if __name__ == "__main__":
+    main()
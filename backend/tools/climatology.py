@@ -0,0 +1,315 @@
+# backend/tools/climatology.py
+"""
+Day-of-year climate normals for dates beyond the live forecast horizon.
+
+    w = climatology.lookup(lat, lon, "2027-03-14")   # None if no station is near
+    w = climatology.lookup(lat, lon, "2027-03-14", provider="openweather")  # "summary" as that provider reports it
+    climatology.in_horizon("openmeteo", "2027-03-14") # False -> answer from the table
+
+The table is normals.npy, float32 (stations, 366, 3) = high °C, low °C and
+rain probability (share of days with >= 1 mm), plus stations.npy with
+coordinates. It is memory-mapped, so a lookup is a nearest-station search
+over a handful of rows and one indexed read. Day 59 is Feb 29 in every year's
+index, so Mar 1 is always day 60.
+
+Two ways to build it (python -m backend.tools.climatology build ...):
+- from the committed monthly normals (CLIMATE_NORMALS_PATH), interpolated
+  periodically to day of year; done automatically on first use, and again
+  when that file changes (size, mtime and path are fingerprinted);
+- with --archive, from daily history in the Open-Meteo archive API, averaged
+  per day of year over --years and smoothed with a ±7 day circular window.
+"""
+import argparse
+import asyncio
+import json
+import math
+import hashlib
+import os
+import shutil
+import time
+from datetime import date
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from backend.config import settings
+
+FORMAT = 1
+DAYS = 366
+HIGH, LOW, RAIN = 0, 1, 2
+RAIN_MM = 1.0
+SMOOTH_DAYS = 7
+_MONTH_DAYS = (31, 29, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31)
+
+
+def day_index(d: date) -> int:
+    """0..365 on a leap-year calendar (Feb 29 = 59)."""
+    return (date(2000, d.month, d.day) - date(2000, 1, 1)).days
+
+
+def _parse_horizons(spec: str) -> Dict[str, int]:
+    out: Dict[str, int] = {}
+    for part in spec.split(","):
+        name, sep, days = part.partition("=")
+        if sep and name.strip():
+            out[name.strip()] = int(days)
+    return out
+
+
+_horizons = _parse_horizons(settings.WEATHER_HORIZON_DAYS)
+
+
+def in_horizon(provider: str, date_iso: str, today: Optional[date] = None) -> bool:
+    """True if `provider` forecasts `date_iso` (today up to its horizon, in days)."""
+    try:
+        ahead = (date.fromisoformat(date_iso) - (today or date.today())).days
+    except ValueError:
+        return True  # let the provider deal with odd input
+    return 0 <= ahead <= _horizons.get(provider, settings.WEATHER_DEFAULT_HORIZON_DAYS)
+
+
+# --------------------------
+# Build
+# --------------------------
+def from_monthly(values: Sequence[float]) -> np.ndarray:
+    """Twelve monthly values (at mid-month) -> 366 daily values, periodic linear interpolation."""
+    starts = np.cumsum((0,) + _MONTH_DAYS[:-1])
+    mids = starts + np.array(_MONTH_DAYS) / 2.0
+    return np.interp(np.arange(DAYS), mids, np.asarray(values, np.float64), period=DAYS)
+
+
+def _smooth(daily: np.ndarray, half: int = SMOOTH_DAYS) -> np.ndarray:
+    """Circular moving average along the day axis; NaN days are ignored."""
+    ok = ~np.isnan(daily)
+    vals = np.where(ok, daily, 0.0)
+    kernel = np.ones(2 * half + 1)
+    pad = lambda a: np.concatenate([a[-half:], a, a[:half]])  # noqa: E731
+    num = np.convolve(pad(vals), kernel, mode="valid")
+    den = np.convolve(pad(ok.astype(np.float64)), kernel, mode="valid")
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return num / den
+
+
+def normals_from_monthly(path: str) -> Tuple[List[str], np.ndarray, np.ndarray, str]:
+    with open(path, "r", encoding="utf-8") as f:
+        js = json.load(f)
+    names = list(js["stations"])
+    coords = np.array([[js["stations"][n]["lat"], js["stations"][n]["lon"]] for n in names], np.float64)
+    table = np.zeros((len(names), DAYS, 3), np.float32)
+    for i, n in enumerate(names):
+        s = js["stations"][n]
+        table[i, :, HIGH] = from_monthly(s["high_c"])
+        table[i, :, LOW] = from_monthly(s["low_c"])
+        table[i, :, RAIN] = from_monthly([d / m for d, m in zip(s["rain_days"], _MONTH_DAYS)])
+    return names, coords, table, js.get("source", os.path.basename(path))
+
+
+async def _archive_daily(client, lat: float, lon: float, first: int, last: int) -> dict:
+    params = {
+        "latitude": lat,
+        "longitude": lon,
+        "start_date": f"{first}-01-01",
+        "end_date": f"{last}-12-31",
+        "daily": "temperature_2m_max,temperature_2m_min,precipitation_sum",
+        "timezone": "Europe/Paris",
+    }
+    r = await client.get(settings.OPEN_METEO_ARCHIVE_BASE, params=params)
+    r.raise_for_status()
+    return r.json()["daily"]
+
+
+def normals_from_daily(days: Sequence[str], high: Sequence, low: Sequence, precip: Sequence) -> np.ndarray:
+    """(366, 3) per-day-of-year means of a daily history, smoothed."""
+    idx = np.array([day_index(date.fromisoformat(d)) for d in days])
+    as_arr = lambda xs: np.array([np.nan if x is None else x for x in xs], np.float64)  # noqa: E731
+    cols = (as_arr(high), as_arr(low), (as_arr(precip) >= RAIN_MM).astype(np.float64))
+    cols[2][np.isnan(as_arr(precip))] = np.nan
+    out = np.zeros((DAYS, 3), np.float32)
+    for k, col in enumerate(cols):
+        ok = ~np.isnan(col)
+        num = np.bincount(idx[ok], weights=col[ok], minlength=DAYS)
+        den = np.bincount(idx[ok], minlength=DAYS).astype(np.float64)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            out[:, k] = _smooth(num / den)
+    return out
+
+
+async def normals_from_archive(names: List[str], coords: np.ndarray, first: int, last: int) -> np.ndarray:
+    import httpx
+
+    table = np.zeros((len(names), DAYS, 3), np.float32)
+    async with httpx.AsyncClient(timeout=60.0) as client:
+        for i, (n, (lat, lon)) in enumerate(zip(names, coords)):
+            js = await _archive_daily(client, float(lat), float(lon), first, last)
+            table[i] = normals_from_daily(js["time"], js["temperature_2m_max"],
+                                          js["temperature_2m_min"], js["precipitation_sum"])
+            print(f"[climatology] {n}: {len(js['time'])} days")
+    return table
+
+
+def write_table(out_dir: str, names: List[str], coords: np.ndarray, table: np.ndarray, source: str,
+                built_from: str) -> None:
+    tmp = f"{out_dir}.tmp{os.getpid()}"
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+    np.save(os.path.join(tmp, "stations.npy"), np.asarray(coords, np.float64))
+    np.save(os.path.join(tmp, "normals.npy"), np.asarray(table, np.float32))
+    with open(os.path.join(tmp, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump({"format": FORMAT, "stations": names, "source": source, "built_from": built_from}, f)
+    old = f"{out_dir}.old{os.getpid()}"
+    if os.path.exists(out_dir):
+        os.replace(out_dir, old)
+    os.replace(tmp, out_dir)
+    shutil.rmtree(old, ignore_errors=True)
+
+
+def _table_dir() -> str:
+    return os.path.join(settings.DATASETS_DIR, "climate")
+
+
+def _fingerprint(path: str) -> str:
+    st = os.stat(path)
+    return hashlib.sha1(f"{os.path.abspath(path)}:{st.st_size}:{st.st_mtime_ns}:{FORMAT}".encode()).hexdigest()[:16]
+
+
+def is_stale(src: Optional[str] = None, out_dir: Optional[str] = None) -> bool:
+    """True if the table is missing, of another format or built from another normals file (archive builds are kept)."""
+    src = src or settings.CLIMATE_NORMALS_PATH
+    try:
+        with open(os.path.join(out_dir or _table_dir(), "meta.json"), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return True
+    if meta.get("format") != FORMAT:
+        return True
+    return meta.get("built_from") != "archive" and meta.get("built_from") != _fingerprint(src)
+
+
+def ensure_built() -> bool:
+    """Build the table from the monthly normals if missing or stale; True if a build ran."""
+    if not os.path.exists(settings.CLIMATE_NORMALS_PATH):
+        return False
+    if not is_stale():
+        return False
+    names, coords, table, source = normals_from_monthly(settings.CLIMATE_NORMALS_PATH)
+    try:
+        write_table(_table_dir(), names, coords, table, source, _fingerprint(settings.CLIMATE_NORMALS_PATH))
+    except OSError:
+        if is_stale():
+            raise
+        return False  # another process built it first
+    print(f"[climatology] built {len(names)} stations from {settings.CLIMATE_NORMALS_PATH}")
+    return True
+
+
+# --------------------------
+# Read side
+# --------------------------
+class ClimateTable:
+    """Memory-mapped normals with a nearest-station lookup."""
+
+    def __init__(self, path: str):
+        with open(os.path.join(path, "meta.json"), "r", encoding="utf-8") as f:
+            self.meta = json.load(f)
+        self.names: List[str] = self.meta["stations"]
+        self.coords = np.load(os.path.join(path, "stations.npy"), mmap_mode="r")
+        self.normals = np.load(os.path.join(path, "normals.npy"), mmap_mode="r")
+        self._rad = np.radians(np.asarray(self.coords))
+
+    def nearest(self, lat: float, lon: float) -> Tuple[int, float]:
+        """(station index, distance in km)."""
+        la, lo = math.radians(lat), math.radians(lon)
+        h = (np.sin((self._rad[:, 0] - la) / 2) ** 2
+             + np.cos(la) * np.cos(self._rad[:, 0]) * np.sin((self._rad[:, 1] - lo) / 2) ** 2)
+        km = 2 * 6371.0 * np.arcsin(np.sqrt(np.clip(h, 0.0, 1.0)))
+        i = int(km.argmin())
+        return i, float(km[i])
+
+    def day(self, station: int, d: date) -> Tuple[float, float, float]:
+        high, low, rain = self.normals[station, day_index(d)]
+        return float(high), float(low), float(rain)
+
+
+_table: Optional[ClimateTable] = None
+_retry_at = 0.0
+_RETRY_SEC = 60.0
+
+
+def table() -> Optional[ClimateTable]:
+    """The shared table, built on first use; after a failure, retried at most every _RETRY_SEC."""
+    global _table, _retry_at
+    if _table is None and time.monotonic() >= _retry_at:
+        try:
+            ensure_built()
+            _table = ClimateTable(_table_dir())
+        except (OSError, ValueError, KeyError) as e:
+            print(f"[climatology] table unavailable: {e}")
+            _retry_at = time.monotonic() + _RETRY_SEC
+    return _table
+
+
+# "summary" in each weather provider's format: Open-Meteo reports WMO codes,
+# OpenWeather the condition name ("main") of its weather entry
+SUMMARIES: Dict[str, Dict[str, object]] = {
+    "openmeteo": {"rain": 61, "overcast": 3, "partly_cloudy": 2, "clear": 0},
+    "openweather": {"rain": "Rain", "overcast": "Clouds", "partly_cloudy": "Clouds", "clear": "Clear"},
+}
+
+
+def summary(condition: str, provider: str = "openmeteo") -> object:
+    """A condition ("rain", "overcast", "partly_cloudy", "clear") as `provider` would report it."""
+    return SUMMARIES.get(provider, SUMMARIES["openmeteo"])[condition]
+
+
+def _summary(rain: float, provider: str) -> object:
+    return summary("rain" if rain >= 0.5 else "overcast" if rain >= 0.3 else "partly_cloudy", provider)
+
+
+def lookup(lat: float, lon: float, date_iso: str, provider: str = "openmeteo") -> Optional[dict]:
+    """
+    Normal weather for a date at the nearest station within CLIMATE_MAX_KM,
+    else None. "summary" follows the format of the weather `provider`.
+    """
+    t = table()
+    if t is None:
+        return None
+    try:
+        d = date.fromisoformat(date_iso)
+    except ValueError:
+        return None
+    i, km = t.nearest(lat, lon)
+    if km > settings.CLIMATE_MAX_KM:
+        return None
+    high, low, rain = t.day(i, d)
+    return {
+        "summary": _summary(rain, provider),
+        "high_c": round(high, 1),
+        "low_c": round(low, 1),
+        "rain_risk": round(rain, 2),
+        "climatology": True,
+        "station": t.names[i],
+    }
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Build the day-of-year climatology table")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    b = sub.add_parser("build")
+    b.add_argument("--normals", default=settings.CLIMATE_NORMALS_PATH, help="monthly normals JSON (stations)")
+    b.add_argument("--archive", action="store_true", help="average daily history from the Open-Meteo archive")
+    b.add_argument("--years", default=f"{date.today().year - 10}-{date.today().year - 1}")
+    b.add_argument("--out", default=_table_dir())
+    args = ap.parse_args()
+
+    names, coords, table_, source = normals_from_monthly(args.normals)
+    built_from = _fingerprint(args.normals)
+    if args.archive:
+        first, _, last = args.years.partition("-")
+        table_ = asyncio.run(normals_from_archive(names, coords, int(first), int(last or first)))
+        source, built_from = f"open-meteo archive {args.years}", "archive"
+    write_table(args.out, names, coords, table_, source, built_from)
+    print(f"[climatology] {len(names)} stations ({source}) -> {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,40 +1,127 @@
 # backend/tools/flights_amadeus.py
-from amadeus import Client, ResponseError
+"""
+Amadeus Flight Offers Search over plain HTTP.
+
+The offers list is parsed from the response stream (backend/tools/jsonstream.py):
+only the `data` array is read, one offer at a time, and the `dictionaries`
+block after it is never downloaded. The OAuth token is cached until shortly
+before it expires.
+"""
+import heapq
+import re
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+import httpx
 from tenacity import retry, stop_after_attempt, wait_exponential
+
 from backend.config import settings
+from backend.tools import jsonstream
+
+TEST_BASE_URL = "https://test.api.amadeus.com"
+TOP_K = 3
+FALLBACK_PRICE_EUR = 140.0
+
+_token_lock = threading.Lock()
+_token: Dict[str, Any] = {"value": "", "expires": 0.0}
+
 
-def _client() -> Client:
+def _base() -> str:
+    return (settings.AMADEUS_BASE_URL or TEST_BASE_URL).rstrip("/")
+
+
+def _access_token() -> str:
     if not settings.AMADEUS_CLIENT_ID or not settings.AMADEUS_CLIENT_SECRET:
         raise RuntimeError("Amadeus credentials missing")
-    return Client(
-        client_id=settings.AMADEUS_CLIENT_ID,
-        client_secret=settings.AMADEUS_CLIENT_SECRET
-    )
+    with _token_lock:
+        if _token["value"] and time.time() < _token["expires"]:
+            return _token["value"]
+        r = httpx.post(
+            f"{_base()}/v1/security/oauth2/token",
+            data={
+                "grant_type": "client_credentials",
+                "client_id": settings.AMADEUS_CLIENT_ID,
+                "client_secret": settings.AMADEUS_CLIENT_SECRET,
+            },
+            timeout=10.0,
+        )
+        r.raise_for_status()
+        js = r.json()
+        _token["value"] = js["access_token"]
+        _token["expires"] = time.time() + max(0, int(js.get("expires_in", 1799)) - 60)
+        return _token["value"]
+
+
+_ISO_DURATION = re.compile(r"PT(?:(\d+)H)?(?:(\d+)M)?")
+
+
+def _minutes(iso: str) -> Optional[int]:
+    m = _ISO_DURATION.fullmatch(iso or "")
+    if not m:
+        return None
+    return int(m.group(1) or 0) * 60 + int(m.group(2) or 0)
+
+
+def _summary(offer: Any) -> Optional[Dict[str, Any]]:
+    try:
+        price = float(offer["price"].get("grandTotal") or offer["price"]["total"])
+    except Exception:
+        return None
+    itin = (offer.get("itineraries") or [{}])[0]
+    segments = itin.get("segments") or []
+    return {
+        "price_eur": round(price, 2),
+        "carrier": (offer.get("validatingAirlineCodes") or [""])[0],
+        "duration_min": _minutes(itin.get("duration", "")),
+        "stops": max(0, len(segments) - 1),
+        "deeplink": "",
+    }
+
+
+def _offers(origin: str, dest_airport: str, depart_date: str, max_offers: int = 5) -> List[Dict[str, Any]]:
+    params = {
+        "originLocationCode": origin,
+        "destinationLocationCode": dest_airport,
+        "departureDate": depart_date,
+        "adults": 1,
+        "currencyCode": "EUR",
+        "max": max_offers,
+    }
+    headers = {"Authorization": f"Bearer {_access_token()}"}
+    picker = jsonstream.Picker(arrays=("data",))
+    found: List[Dict[str, Any]] = []
+    with httpx.stream("GET", f"{_base()}/v2/shopping/flight-offers", params=params, headers=headers, timeout=20.0) as r:
+        if r.status_code == 401:
+            _token["value"] = ""  # expired early; the retry fetches a new one
+        r.raise_for_status()
+        for chunk in r.iter_bytes():
+            found.extend(s for s in (_summary(o) for _, o in picker.feed(chunk)) if s is not None)
+            if picker.closed:
+                break
+        else:
+            found.extend(s for s in (_summary(o) for _, o in picker.finish()) if s is not None)
+    return heapq.nsmallest(TOP_K, found, key=lambda s: s["price_eur"])
+
 
 @retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=0.5, min=0.5, max=2))
 def flight_eur(origin: str, dest_airport: str, depart_date: str) -> dict:
     """
     Uses Amadeus Flight Offers Search (IATA codes recommended).
     """
-    am = _client()
     try:
-        res = am.shopping.flight_offers_search.get(
-            originLocationCode=origin,
-            destinationLocationCode=dest_airport,
-            departureDate=depart_date,
-            adults=1,
-            currencyCode="EUR",
-            max=5,
-        )
-        data = res.data or []
-        price = min([float(o["price"]["total"]) for o in data]) if data else 140.0
-    except ResponseError:
-        price = 140.0
+        top = _offers(origin, dest_airport, depart_date)
+    except httpx.HTTPStatusError as e:
+        if e.response.status_code == 401:
+            raise  # token rejected; retried with a fresh one
+        top = []
+    price = top[0]["price_eur"] if top else FALLBACK_PRICE_EUR
 
     return {
         "provider": "amadeus",
         "price_eur": round(price, 2),
         "currency": "EUR",
         "url": "https://developers.amadeus.com/",
+        "itineraries": top,
         "ttl_min": 15,
-    }
\ No newline at end of file
+    }
@@ -1,181 +1,274 @@
 # backend/tools/flights_skyscanner.py
 import os
 import time
-import json
+import asyncio
 import hashlib
-from typing import Any, Dict, Optional
+import heapq
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
 
 import httpx
 
-# ---- Config (env-driven) -----------------------------------------------------
+from backend import codec, metrics
+from backend.tools import hedge, jsonstream
 
-RAPIDAPI_KEY   = os.getenv("RAPIDAPI_KEY", "")
-# Match exactly what your RapidAPI subscription shows as "X-RapidAPI-Host"
-RAPIDAPI_HOST  = os.getenv("RAPIDAPI_HOST", "skyscanner80.p.rapidapi.com")
-# Match the sample path from your vendor page
-ENDPOINT       = os.getenv("FLIGHTS_SKY_ENDPOINT", "/api/v1/flights/search-one-way")
-# "fromId" (IATA) or "fromEntityId" (entity IDs), depends on vendor
-PARAM_STYLE    = os.getenv("FLIGHTS_SKY_PARAM_STYLE", "fromId")  # or "fromEntityId"
+# ---- Config (env-driven, read on first use rather than at import) ------------
 
-# Caching (seconds) — avoids hammering the API for identical queries
-CACHE_TTL_SEC  = int(os.getenv("FLIGHTS_CACHE_TTL_SEC", "900"))  # 15 min default
-ERROR_TTL_SEC  = int(os.getenv("FLIGHTS_ERROR_TTL_SEC", "60"))   # cache errors for 1 min
+class _Config:
+    def __init__(self) -> None:
+        self.RAPIDAPI_KEY   = os.getenv("RAPIDAPI_KEY", "")
+        # Match exactly what your RapidAPI subscription shows as "X-RapidAPI-Host"
+        self.RAPIDAPI_HOST  = os.getenv("RAPIDAPI_HOST", "skyscanner80.p.rapidapi.com")
+        # Match the sample path from your vendor page
+        self.ENDPOINT       = os.getenv("FLIGHTS_SKY_ENDPOINT", "/api/v1/flights/search-one-way")
+        # Scheme + host to call; override to target a local stand-in
+        self.BASE_URL       = os.getenv("FLIGHTS_SKY_BASE_URL", f"https://{self.RAPIDAPI_HOST}")
+        # "fromId" (IATA) or "fromEntityId" (entity IDs), depends on vendor
+        self.PARAM_STYLE    = os.getenv("FLIGHTS_SKY_PARAM_STYLE", "fromId")  # or "fromEntityId"
 
-# Market / locale settings (tweak if needed)
-DEFAULT_MARKET   = os.getenv("FLIGHTS_MARKET", "FR")
-DEFAULT_LOCALE   = os.getenv("FLIGHTS_LOCALE", "en-GB")
-DEFAULT_CURRENCY = os.getenv("FLIGHTS_CURRENCY", "EUR")
+        # Caching (seconds) — avoids hammering the API for identical queries
+        self.CACHE_TTL_SEC  = int(os.getenv("FLIGHTS_CACHE_TTL_SEC", "900"))  # 15 min default
+        self.ERROR_TTL_SEC  = int(os.getenv("FLIGHTS_ERROR_TTL_SEC", "60"))   # cache errors for 1 min
 
-# ---- Optional Redis cache (reuses your deps.redis). Falls back to local dict. ----
+        # Market / locale settings (tweak if needed)
+        self.DEFAULT_MARKET   = os.getenv("FLIGHTS_MARKET", "FR")
+        self.DEFAULT_LOCALE   = os.getenv("FLIGHTS_LOCALE", "en-GB")
+        self.DEFAULT_CURRENCY = os.getenv("FLIGHTS_CURRENCY", "EUR")
 
-_redis = None
-try:
-    from backend.deps import redis as _redis  # if Redis is running per your project
-except Exception:
-    _redis = None
+        # Itineraries kept per quote (cheapest first), and a cap on how many are scanned
+        self.TOP_K            = int(os.getenv("FLIGHTS_TOP_K", "3"))
+        self.MAX_SCAN         = int(os.getenv("FLIGHTS_MAX_SCAN", "1000"))
+
+@lru_cache(maxsize=1)
+def _cfg() -> _Config:
+    return _Config()
+
+# ---- Optional Redis cache (reuses deps.aredis). Falls back to local dict. ---
+
+_UNSET = object()
+_redis_client = _UNSET
+
+def _redis():
+    global _redis_client
+    if _redis_client is _UNSET:
+        try:
+            from backend.deps import aredis as client  # None unless Redis is configured
+        except Exception:
+            client = None
+        _redis_client = client
+    return _redis_client
 
 _LOCAL_CACHE: Dict[str, tuple[float, dict]] = {}
 
-def _cache_get(key: str) -> Optional[dict]:
-    if _redis:
-        val = _redis.get(key)
-        return json.loads(val) if val else None
+async def _cache_get(key: str) -> Optional[dict]:
+    r = _redis()
+    if r:
+        # A Redis blip is a cache miss, not a failed quote
+        try:
+            val = await r.get(key)
+            return codec.loads(val) if val else None
+        except codec.CodecError:
+            return None
+        except Exception as e:
+            print(f"[skyscanner] Redis read failed, treating as miss: {e}")
+            return None
     # in-proc fallback
     item = _LOCAL_CACHE.get(key)
     if not item:
         return None
     ts, payload = item
-    if time.time() - ts <= CACHE_TTL_SEC:
+    if time.time() - ts <= _cfg().CACHE_TTL_SEC:
         return payload
     return None
 
-def _cache_set(key: str, value: dict, ttl: int = CACHE_TTL_SEC) -> None:
-    if _redis:
-        _redis.setex(key, ttl, json.dumps(value))
+async def _cache_set(key: str, value: dict, ttl: Optional[int] = None) -> None:
+    r = _redis()
+    if r:
+        try:
+            await r.setex(key, ttl or _cfg().CACHE_TTL_SEC, codec.dumps(value))
+        except Exception as e:
+            print(f"[skyscanner] Redis write failed, not cached: {e}")
         return
     _LOCAL_CACHE[key] = (time.time(), value)
 
 def _cache_key(origin: str, dest: str, date_iso: str) -> str:
-    raw = f"{origin}|{dest}|{date_iso}|{RAPIDAPI_HOST}|{ENDPOINT}|{PARAM_STYLE}|{DEFAULT_MARKET}|{DEFAULT_LOCALE}|{DEFAULT_CURRENCY}"
+    c = _cfg()
+    raw = f"{origin}|{dest}|{date_iso}|{c.RAPIDAPI_HOST}|{c.ENDPOINT}|{c.PARAM_STYLE}|{c.DEFAULT_MARKET}|{c.DEFAULT_LOCALE}|{c.DEFAULT_CURRENCY}"
     return "sky:" + hashlib.sha1(raw.encode()).hexdigest()
 
 # ---- Helpers -----------------------------------------------------------------
 
 def _params(origin: str, dest: str, depart_date: str) -> Dict[str, Any]:
+    c = _cfg()
     base = {
         "adults": 1,
-        "currency": DEFAULT_CURRENCY,
-        "market": DEFAULT_MARKET,
-        "locale": DEFAULT_LOCALE,
+        "currency": c.DEFAULT_CURRENCY,
+        "market": c.DEFAULT_MARKET,
+        "locale": c.DEFAULT_LOCALE,
         "departDate": depart_date,
     }
-    if PARAM_STYLE == "fromEntityId":
+    if c.PARAM_STYLE == "fromEntityId":
         base.update({"fromEntityId": origin, "toEntityId": dest})
     else:  # default: fromId/toId (IATA)
         base.update({"fromId": origin, "toId": dest})
     return base
 
-def _extract_price(js: Dict[str, Any]) -> float:
+def _summary(item: Any) -> Optional[Dict[str, Any]]:
     """
-    Vendors on RapidAPI expose slightly different shapes.
-    Try common patterns in order; return 0.0 if none match.
+    Compact itinerary from either vendor layout:
+    data.itineraries[] ({price: {amount}, legs: [...], deeplink}) or results[] ({price}).
     """
     try:
-        return float(js["data"]["itineraries"][0]["price"]["amount"])
+        price = item["price"]
+        price = float(price.get("amount", price.get("raw")) if isinstance(price, dict) else price)
     except Exception:
-        pass
+        return None
+    if price <= 0:
+        return None
+    legs = item.get("legs") or []
+    carrier = ""
     try:
-        return float(js["price"]["amount"])
+        carrier = legs[0]["carriers"]["marketing"][0]["name"]
     except Exception:
         pass
+    duration = sum(int(l.get("durationInMinutes") or 0) for l in legs if isinstance(l, dict))
+    return {
+        "price_eur": round(price, 2),
+        "carrier": carrier,
+        "duration_min": duration or None,
+        "stops": sum(int(l.get("stopCount") or 0) for l in legs if isinstance(l, dict)),
+        "deeplink": item.get("deeplink") or "",
+    }
+
+
+async def _scan(resp: httpx.Response, top_k: int, max_scan: int) -> Tuple[float, List[Dict[str, Any]]]:
+    """
+    Cheapest price and the top_k cheapest itineraries from a streamed body.
+    Stops reading at the end of the itinerary list (or after max_scan entries).
+    Also accepts a bare {"price": {"amount": ...}} body.
+    """
+    picker = jsonstream.Picker(arrays=("data.itineraries", "results"), scalars=("price.amount",))
+    found: List[Dict[str, Any]] = []
+    scanned = 0
+    async for chunk in resp.aiter_bytes():
+        for _, item in picker.feed(chunk):
+            scanned += 1
+            s = _summary(item)
+            if s is not None:
+                found.append(s)
+        if picker.closed or scanned >= max_scan:
+            break
+    else:
+        for _, item in picker.finish():
+            s = _summary(item)
+            if s is not None:
+                found.append(s)
+
+    top = heapq.nsmallest(top_k, found, key=lambda s: s["price_eur"])
+    if top:
+        return top[0]["price_eur"], top
     try:
-        return float(js["results"][0]["price"])
-    except Exception:
-        pass
-    return 0.0
+        return float(picker.values.get("price.amount") or 0.0), []
+    except (TypeError, ValueError):
+        return 0.0, []
 
 # ---- Public API --------------------------------------------------------------
 
-def flight_eur(origin: str, dest_city_or_code: str, depart_date: str) -> dict:
+async def flight_eur(origin: str, dest_city_or_code: str, depart_date: str, fresh: bool = False) -> dict:
     """
     Returns a dict:
       {
         "provider": "skyscanner",
-        "price_eur": float,
+        "price_eur": float,                  # cheapest itinerary
         "currency": "EUR",
-        "url": "https://www.skyscanner.net/",
+        "url": "https://www.skyscanner.net/",  # or the cheapest itinerary's deeplink
+        "itineraries": [{"price_eur", "carrier", "duration_min", "stops", "deeplink"}, ...],
         "ttl_min": 15,
-        # optional "error": "...",
+        # optional "error": "...", "transient": bool (worth retrying later),
         # optional "cached": True
       }
+    fresh=True skips the cache read (the prefetcher uses it to refresh a quote).
     """
-    if not RAPIDAPI_KEY:
+    c = _cfg()
+    if not c.RAPIDAPI_KEY:
         raise RuntimeError("RAPIDAPI_KEY missing for Skyscanner (RapidAPI)")
 
     # cache check
     ck = _cache_key(origin, dest_city_or_code, depart_date)
-    cached = _cache_get(ck)
+    cached = None if fresh else await _cache_get(ck)
     if cached:
         out = dict(cached)
         out["cached"] = True
         return out
 
-    url = f"https://{RAPIDAPI_HOST}{ENDPOINT}"
-    headers = {"X-RapidAPI-Key": RAPIDAPI_KEY, "X-RapidAPI-Host": RAPIDAPI_HOST}
+    url = f"{c.BASE_URL}{c.ENDPOINT}"
+    headers = {"X-RapidAPI-Key": c.RAPIDAPI_KEY, "X-RapidAPI-Host": c.RAPIDAPI_HOST}
     params  = _params(origin, dest_city_or_code, depart_date)
 
     # Retry w/ exponential backoff on 429/5xx to tame rate limits
     attempt = 0
     last_err = ""
-    with httpx.Client(timeout=20.0) as client:
+    transient = False   # whether last_err may clear on a later try
+    async with httpx.AsyncClient(timeout=20.0) as client:
         while attempt < 4:
             try:
-                resp = client.get(url, headers=headers, params=params)
-                status = resp.status_code
+                # Streamed: the body is parsed as it arrives and the tail never read
+                async with client.stream("GET", url, headers=headers, params=params) as resp:
+                    status = resp.status_code
+                    if status == 200:
+                        price, top = await _scan(resp, c.TOP_K, c.MAX_SCAN)
+                    else:
+                        text = (await resp.aread())[:200].decode("utf-8", "replace")
 
                 if status == 200:
-                    js = resp.json()
-                    price = _extract_price(js)
                     if price > 0:
                         out = {
                             "provider": "skyscanner",
                             "price_eur": round(price, 2),
-                            "currency": DEFAULT_CURRENCY,
-                            "url": "https://www.skyscanner.net/",
+                            "currency": c.DEFAULT_CURRENCY,
+                            "url": (top[0]["deeplink"] if top else "") or "https://www.skyscanner.net/",
+                            "itineraries": top,
                             "ttl_min": 15,
                         }
-                        _cache_set(ck, out, ttl=CACHE_TTL_SEC)
+                        await _cache_set(ck, out, ttl=c.CACHE_TTL_SEC)
                         return out
                     # 200 OK but schema not recognized
                     last_err = "200 OK but price not found in response"
+                    transient = False
                     break
 
                 if status in (429, 500, 502, 503, 504):
                     # Exponential backoff with a touch of jitter
                     wait = (2 ** attempt) + (attempt * 0.25)
-                    last_err = f"{status}: {resp.text[:200]}"
-                    time.sleep(wait)
+                    last_err = f"{status}: {text}"
+                    transient = True
+                    metrics.RETRIES.labels("skyscanner", str(status)).inc()
+                    await asyncio.sleep(wait)
                     attempt += 1
                     continue
 
                 # Other non-retryable errors
-                last_err = f"{status}: {resp.text[:200]}"
+                last_err = f"{status}: {text}"
+                transient = False
                 break
 
             except httpx.HTTPError as e:
                 last_err = f"HTTPError {type(e).__name__}: {e}"
+                transient = hedge.transient(e)
+                metrics.RETRIES.labels("skyscanner", type(e).__name__).inc()
                 wait = (2 ** attempt) + 0.5
-                time.sleep(wait)
+                await asyncio.sleep(wait)
                 attempt += 1
 
     # Return non-fatal result; your planner will fall back to mock if needed
     out = {
         "provider": "skyscanner",
         "price_eur": 0.0,
-        "currency": DEFAULT_CURRENCY,
+        "currency": c.DEFAULT_CURRENCY,
         "url": "https://www.skyscanner.net/",
         "error": last_err or "unknown error",
+        "transient": transient,
     }
     # Cache the error briefly to avoid hammering on repeated queries
-    _cache_set(ck, out, ttl=ERROR_TTL_SEC)
+    await _cache_set(ck, out, ttl=c.ERROR_TTL_SEC)
     return out
\ No newline at end of file
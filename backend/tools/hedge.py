@@ -0,0 +1,117 @@
+# backend/tools/hedge.py
+"""
+Hedged provider calls.
+
+    res = await hedge.hedged("skyscanner", primary, secondary, good=has_price)
+
+`primary` and `secondary` are zero-argument coroutine functions. The primary
+starts alone; if it has not produced a good answer within the hedge deadline
+(the HEDGE_PERCENTILE latency of that provider's recent calls), the secondary
+starts too and the first good answer wins. A primary that fails or answers
+badly before the deadline hands over to the secondary straight away. The
+losing call is cancelled (a blocking provider running in a worker thread
+finishes in the background and its answer is dropped).
+
+Because the deadline tracks the primary's own tail, only the slowest few
+percent of calls are hedged, so upstream traffic grows by about that much.
+
+transient(e) tells a failure worth trying again (timeout, 429/5xx, dropped
+connection) from one that will recur (missing key, bad request, bad answer).
+"""
+import asyncio
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Tuple
+
+import httpx
+
+from backend import metrics
+from backend.config import settings
+
+Call = Callable[[], Awaitable[Any]]
+
+_windows: Dict[str, Deque[float]] = {}
+
+
+def observe(label: str, seconds: float) -> None:
+    w = _windows.get(label)
+    if w is None:
+        w = _windows[label] = deque(maxlen=settings.HEDGE_WINDOW)
+    w.append(seconds)
+
+
+def deadline(label: str) -> float:
+    """Seconds to wait on the primary before starting the secondary."""
+    w = _windows.get(label)
+    if not w or len(w) < settings.HEDGE_MIN_SAMPLES:
+        return settings.HEDGE_DEFAULT_DELAY_MS / 1000.0
+    ranked = sorted(w)
+    q = ranked[int(settings.HEDGE_PERCENTILE * (len(ranked) - 1))]
+    return min(max(q, settings.HEDGE_MIN_DELAY_MS / 1000.0), settings.HEDGE_MAX_DELAY_MS / 1000.0)
+
+
+def transient(e: BaseException) -> bool:
+    """Whether a failed provider call may succeed if tried again."""
+    if isinstance(e, httpx.HTTPStatusError):
+        return e.response.status_code == 429 or e.response.status_code >= 500
+    return isinstance(e, (asyncio.TimeoutError, httpx.TransportError))
+
+
+def _outcome(task: "asyncio.Future", good: Callable[[Any], bool]) -> Tuple[Any, bool]:
+    if task.cancelled() or task.exception() is not None:
+        return None, False
+    res = task.result()
+    return res, good(res)
+
+
+async def hedged(label: str, primary: Call, secondary: Call,
+                 good: Callable[[Any], bool] = lambda r: True,
+                 cancel_loser: bool = True) -> Any:
+    """
+    Race primary against a delayed secondary; return the first good answer.
+    If neither is good, the primary's answer (or exception) is returned as-is.
+    """
+    if not settings.HEDGE_ENABLED:
+        return await primary()
+
+    wait = deadline(label)
+    t0 = time.perf_counter()
+
+    def _track(t: "asyncio.Future") -> None:
+        # A cancelled primary still took at least `wait`; count it so the deadline can't drift down
+        if t.cancelled():
+            observe(label, wait)
+        else:
+            t.exception()  # mark retrieved; a primary left running may fail after losing
+            observe(label, time.perf_counter() - t0)
+
+    p = asyncio.ensure_future(primary())
+    p.add_done_callback(_track)
+    s = None
+    try:
+        done, _ = await asyncio.wait({p}, timeout=wait)
+        if done:
+            res, ok = _outcome(p, good)
+            if ok:
+                return res
+
+        s = asyncio.ensure_future(secondary())
+        pending = {s} if done else {p, s}
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for t in done:
+                res, ok = _outcome(t, good)
+                if ok:
+                    if cancel_loser:
+                        for loser in pending:
+                            loser.cancel()
+                    metrics.HEDGES.labels(label, "primary" if t is p else "secondary").inc()
+                    return res
+    except asyncio.CancelledError:
+        for t in (p, s):
+            if t is not None:
+                t.cancel()
+        raise
+
+    metrics.HEDGES.labels(label, "none").inc()
+    return p.result()
@@ -1,14 +1,37 @@
 import random
+from typing import List
+
+from backend.tools.seeding import rng
 
 def nightly_hotel(city: str, date: str, guests: int, max_price: int) -> dict:
     """Return a mock nightly hotel price (EUR)."""
+    r = rng("hotel", city, date, guests)
     return {
         "provider": "mock-booking",
         "city": city,
         "checkin": date,
         "nights": 1,
         "guests": guests,
-        "price_eur": min(max_price, round(random.uniform(80, 180), 2)),
-        "rating": round(random.uniform(3.8, 4.8), 1),
+        "price_eur": min(max_price, round(r.uniform(80, 180), 2)),
+        "rating": round(r.uniform(3.8, 4.8), 1),
         "url": f"https://example.com/hotels?c={city}&ci={date}",
     }
+
+def candidates(city: str, n: int = 40) -> List[dict]:
+    """Mock inventory for a city: `n` hotels within ~4 km of its centre, the same on every call."""
+    from backend.agents.planner import CITY_COORDS
+    lat, lon = CITY_COORDS.get(city, CITY_COORDS["Paris"])
+    r = random.Random(f"inventory|{city}")
+    return [
+        {
+            "id": f"mock-{city}-{i}",
+            "name": f"Hotel {city} {i + 1}",
+            "price_eur": round(r.uniform(60, 260), 2),
+            "price_source": "estimate",
+            "rating": round(r.uniform(3.0, 4.9), 1),
+            "lat": lat + r.uniform(-0.035, 0.035),
+            "lon": lon + r.uniform(-0.05, 0.05),
+            "url": f"https://example.com/hotels?c={city}&h={i}",
+        }
+        for i in range(n)
+    ]
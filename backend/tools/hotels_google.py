@@ -1,7 +1,67 @@
 import os
+import time
 import urllib.parse
+from typing import List
+
 import httpx
 from backend.config import settings
+from backend.tools import hedge, jsonstream
+
+
+def _first_result(url: str, params: dict) -> dict:
+    """First Text Search result, read from the stream; the remaining results are never downloaded."""
+    picker = jsonstream.Picker(arrays=("results",))
+    with httpx.stream("GET", url, params=params, timeout=10.0) as r:
+        r.raise_for_status()
+        for chunk in r.iter_bytes():
+            for _, item in picker.feed(chunk):
+                return item if isinstance(item, dict) else {}
+            if picker.closed:
+                return {}
+    for _, item in picker.finish():
+        return item if isinstance(item, dict) else {}
+    return {}
+
+# Places gives a price level (0-4), not a rate; the inventory stores these estimates
+PRICE_LEVEL_EUR = {0: 60.0, 1: 80.0, 2: 120.0, 3: 180.0, 4: 280.0}
+DEFAULT_PRICE_EUR = 150.0
+
+
+def candidates(city: str) -> List[dict]:
+    """
+    Every lodging result of a Text Search for the city, following
+    next_page_token up to HOTEL_INVENTORY_PAGES pages (for backend/tools/inventory.py).
+    Raises when there is no API key or the API fails.
+    """
+    api_key = settings.GOOGLE_MAPS_API_KEY or os.getenv("GOOGLE_MAPS_API_KEY", "")
+    if not api_key:
+        raise RuntimeError("GOOGLE_MAPS_API_KEY not set")
+    url = f"{settings.GOOGLE_MAPS_BASE}/maps/api/place/textsearch/json"
+    params = {"query": f"hotels in {city}, France", "type": "lodging", "key": api_key}
+    out: List[dict] = []
+    for page in range(settings.HOTEL_INVENTORY_PAGES):
+        r = httpx.get(url, params=params, timeout=10.0)
+        r.raise_for_status()
+        body = r.json()
+        for item in body.get("results", []):
+            loc = (item.get("geometry") or {}).get("location") or {}
+            name = item.get("name") or f"Hotel in {city}"
+            out.append({
+                "id": item.get("place_id"),
+                "name": name,
+                "rating": item.get("rating"),
+                "lat": loc.get("lat"),
+                "lon": loc.get("lng"),
+                "price_eur": PRICE_LEVEL_EUR.get(item.get("price_level"), DEFAULT_PRICE_EUR),
+                "price_source": "estimate",
+                "url": f"https://www.google.com/maps/search/?api=1&query={urllib.parse.quote_plus(name + ' ' + city)}",
+            })
+        token = body.get("next_page_token")
+        if not token:
+            break
+        time.sleep(2.0)  # a page token only becomes valid after a short delay
+        params = {"pagetoken": token, "key": api_key}
+    return out
 
 def nightly_hotel(city: str, date: str, guests: int, max_price: int) -> dict:
     """
@@ -30,15 +90,7 @@ def nightly_hotel(city: str, date: str, guests: int, max_price: int) -> dict:
             "type": "lodging",
             "key": api_key,
         }
-        r = httpx.get(
-            "https://maps.googleapis.com/maps/api/place/textsearch/json",
-            params=params,
-            timeout=10.0,
-        )
-        r.raise_for_status()
-        js = r.json()
-        results = js.get("results") or []
-        top = results[0] if results else {}
+        top = _first_result(f"{settings.GOOGLE_MAPS_BASE}/maps/api/place/textsearch/json", params)
         name = top.get("name", f"Hotel in {city}")
         rating = float(top.get("rating", 4.2))
         maps_url = f"https://www.google.com/maps/search/?api=1&query={urllib.parse.quote_plus(name+' '+city)}"
@@ -53,10 +105,11 @@ def nightly_hotel(city: str, date: str, guests: int, max_price: int) -> dict:
             "rating": rating,
             "url": maps_url,
         }
-    except Exception:
+    except Exception as e:
         # Any error -> graceful fallback
         return {
             "provider": "google-places(error-fallback)",
+            "transient": hedge.transient(e),
             "city": city,
             "checkin": date,
             "nights": 1,
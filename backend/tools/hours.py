@@ -0,0 +1,293 @@
+# backend/tools/hours.py
+"""
+Opening hours compiled once into integer minute intervals.
+
+    idx = hours.index()                                    # over datasets.catalog()
+    ok = idx.is_open(rows, "2026-07-14", 14 * 60, 90)      # bool per row
+    idx = hours.HoursIndex.from_records(payloads)          # seed rows or Qdrant payloads
+
+Accepted `hours` strings (case-insensitive, rules separated by ";"):
+
+    09:00-18:00                      every day
+    09:00-12:00,14:00-18:00          several intervals
+    Mo-Fr 09:00-18:00; Sa 10:00-14:00; Su off
+    22:00-02:00                      past midnight: the tail opens the next day
+    24/7
+    Apr-Oct: 09:00-19:00; Nov-Mar: Tu-Su 10:00-17:00
+    Dec 25,Jan 1 off                 fixed closure dates
+
+A later rule replaces earlier ones for the days (and months) it names; rules
+without a day or month selector add to each other, so "09:00-12:00;
+14:00-18:00" is two intervals. An end of 23:59 means midnight.
+
+Compiled form, per POI: up to S weekly schedules ("variants", one per
+distinct season), each 7 weekdays x K intervals as int16 open/close minutes
+(padded with empty intervals), a 12-entry month -> variant table, and a
+sorted array of closure dates. S and K are the largest in the dataset (1 and
+1 for the seed). A query is a handful of gathers and compares over the whole
+candidate set; nothing is parsed after the build.
+"""
+import os
+import re
+from datetime import date, timedelta
+from functools import lru_cache
+from typing import Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+from backend import datasets
+
+DAYS = ("mo", "tu", "we", "th", "fr", "sa", "su")
+MONTHS = ("jan", "feb", "mar", "apr", "may", "jun", "jul", "aug", "sep", "oct", "nov", "dec")
+DAY_MINUTES = 24 * 60
+
+Week = Tuple[Tuple[Tuple[int, int], ...], ...]   # 7 weekdays x intervals
+
+
+class Compiled(NamedTuple):
+    known: bool
+    variants: Tuple[Week, ...]
+    month_variant: Tuple[int, ...]          # 12 entries
+    closed: Tuple[Tuple[int, int], ...]     # (month, day)
+
+    def spans(self, d: date) -> Tuple[Tuple[int, int], ...]:
+        """Open intervals on date `d`."""
+        if (d.month, d.day) in self.closed:
+            return ()
+        return self.variants[self.month_variant[d.month - 1]][d.weekday()]
+
+
+_MON = "|".join(MONTHS)
+_DAY = "|".join(DAYS)
+_CLOSURE = re.compile(rf"^((?:(?:{_MON})\s+\d{{1,2}}\s*,?\s*)+)\s*:?\s*(?:off|closed)$")
+_MONTH_SEL = re.compile(rf"^((?:{_MON})(?:\s*-\s*(?:{_MON}))?(?:\s*,\s*(?:{_MON})(?:\s*-\s*(?:{_MON}))?)*)\s*:?\s+(.*)$")
+_DAY_SEL = re.compile(rf"^((?:{_DAY})(?:\s*-\s*(?:{_DAY}))?(?:\s*,\s*(?:{_DAY})(?:\s*-\s*(?:{_DAY}))?)*)\s*:?\s*(.*)$")
+_SPAN = re.compile(r"^(\d{1,2}):(\d{2})\s*-\s*(\d{1,2}):(\d{2})$")
+
+
+def _ranges(spec: str, names: Sequence[str]) -> List[int]:
+    """'mo-fr,su' -> [0, 1, 2, 3, 4, 6]; ranges may wrap ('fr-mo')."""
+    out: List[int] = []
+    for part in spec.split(","):
+        a, _, b = (x.strip() for x in part.partition("-"))
+        i = names.index(a)
+        j = names.index(b) if b else i
+        out.extend((i + k) % len(names) for k in range((j - i) % len(names) + 1))
+    return out
+
+
+def _minutes(h: str, m: str) -> int:
+    return int(h) * 60 + int(m)
+
+
+def _times(spec: str) -> Optional[List[Tuple[int, int]]]:
+    """Intervals of a rule body; [] for off/closed, None if unparseable."""
+    spec = spec.strip()
+    if spec in ("off", "closed"):
+        return []
+    if spec in ("24/7", "00:00-24:00"):
+        return [(0, DAY_MINUTES)]
+    out = []
+    for part in spec.split(","):
+        m = _SPAN.match(part.strip())
+        if not m:
+            return None
+        lo, hi = _minutes(m.group(1), m.group(2)), _minutes(m.group(3), m.group(4))
+        if hi == DAY_MINUTES - 1:
+            hi = DAY_MINUTES
+        out.append((lo, hi))
+    return out
+
+
+@lru_cache(maxsize=16384)
+def compile_one(hours: Optional[str]) -> Compiled:
+    """Parse one `hours` string. Unknown or unparseable hours give known=False (no intervals)."""
+    empty = Compiled(False, (((),) * 7,), (0,) * 12, ())
+    text = (hours or "").strip().lower()
+    if not text:
+        return empty
+    # table[month][weekday] -> intervals opening that day (before the midnight split)
+    table: List[List[List[Tuple[int, int]]]] = [[[] for _ in DAYS] for _ in MONTHS]
+    closed: List[Tuple[int, int]] = []
+    additive = True   # previous rules had no selector
+    for rule in (r.strip() for r in text.split(";")):
+        if not rule:
+            continue
+        m = _CLOSURE.match(rule)
+        if m:
+            for md in re.findall(rf"({_MON})\s+(\d{{1,2}})", m.group(1)):
+                closed.append((MONTHS.index(md[0]) + 1, int(md[1])))
+            continue
+        months, days = list(range(12)), list(range(7))
+        selected = False
+        m = _MONTH_SEL.match(rule)
+        if m:
+            months, rule, selected = _ranges(m.group(1), MONTHS), m.group(2), True
+        m = _DAY_SEL.match(rule)
+        if m:
+            days, rule, selected = _ranges(m.group(1), DAYS), m.group(2) or "off", True
+        spans = _times(rule)
+        if spans is None:
+            return empty
+        for mo in months:
+            for d in days:
+                if selected or not additive:
+                    table[mo][d] = list(spans)
+                else:
+                    table[mo][d].extend(spans)
+        additive = additive and not selected
+
+    # Split intervals past midnight into the next weekday; dedupe weeks into variants
+    variants: List[Week] = []
+    month_variant = []
+    for mo in range(12):
+        week: List[List[Tuple[int, int]]] = [[] for _ in DAYS]
+        for d in range(7):
+            for lo, hi in table[mo][d]:
+                if hi > lo:
+                    week[d].append((lo, hi))
+                elif hi < lo:
+                    week[d].append((lo, DAY_MINUTES))
+                    if hi:
+                        week[(d + 1) % 7].append((0, hi))
+        frozen = tuple(tuple(sorted(w)) for w in week)
+        if frozen not in variants:
+            variants.append(frozen)
+        month_variant.append(variants.index(frozen))
+    return Compiled(True, tuple(variants), tuple(month_variant), tuple(sorted(set(closed))))
+
+
+def _as_date(d) -> date:
+    return d if isinstance(d, date) else date.fromisoformat(str(d)[:10])
+
+
+class HoursIndex:
+    """Opening hours of N POIs as padded integer arrays."""
+
+    def __init__(self, opens: np.ndarray, closes: np.ndarray, month_variant: np.ndarray,
+                 known: np.ndarray, closed_keys: np.ndarray):
+        self.opens = opens                  # (n, S, 7, K) int16, padded with 0
+        self.closes = closes                # (n, S, 7, K) int16, padded with 0 (empty)
+        self.month_variant = month_variant  # (n, 12) uint8
+        self.known = known                  # (n,) bool
+        self.closed_keys = closed_keys      # sorted int64: row * 512 + month * 32 + day
+        self._closed_on: Dict[int, np.ndarray] = {}
+
+    def __len__(self) -> int:
+        return len(self.known)
+
+    @classmethod
+    def compile(cls, hours: Iterable[Optional[str]]) -> "HoursIndex":
+        compiled = [compile_one(h) for h in hours]
+        n = len(compiled)
+        s = max((len(c.variants) for c in compiled), default=1)
+        k = max((len(iv) for c in compiled for w in c.variants for iv in w), default=1) or 1
+        opens = np.zeros((n, s, 7, k), np.int16)
+        closes = np.zeros((n, s, 7, k), np.int16)
+        keys = []
+        for i, c in enumerate(compiled):
+            for v, week in enumerate(c.variants):
+                for d, spans in enumerate(week):
+                    for j, (lo, hi) in enumerate(spans):
+                        opens[i, v, d, j], closes[i, v, d, j] = lo, hi
+            keys.extend(i * 512 + mo * 32 + dd for mo, dd in c.closed)
+        return cls(opens, closes, np.array([c.month_variant for c in compiled], np.uint8).reshape(n, 12),
+                   np.array([c.known for c in compiled], bool), np.array(sorted(keys), np.int64))
+
+    @classmethod
+    def from_records(cls, records: Iterable[dict]) -> "HoursIndex":
+        """From POI dicts with an `hours` field: seed JSONL rows or Qdrant point payloads."""
+        return cls.compile(r.get("hours") for r in records)
+
+    def _week(self, rows: np.ndarray, d: date) -> Tuple[np.ndarray, np.ndarray]:
+        """Intervals of `rows` on the weekday of `d`, (len(rows), K); one flat gather per array."""
+        n, s, _, k = self.opens.shape
+        flat = rows * (s * 7) + d.weekday()
+        if s > 1:
+            flat += self.month_variant[rows, d.month - 1].astype(np.int64) * 7
+        return self.opens.reshape(-1, k)[flat], self.closes.reshape(-1, k)[flat]
+
+    def _closed(self, rows: np.ndarray, d: date) -> np.ndarray:
+        if not len(self.closed_keys):
+            return np.zeros(len(rows), bool)
+        md = d.month * 32 + d.day
+        closed = self._closed_on.get(md)
+        if closed is None:   # few POIs close on any given date; rows sorted
+            closed = self._closed_on[md] = self.closed_keys[self.closed_keys % 512 == md] // 512
+        if not len(closed):
+            return np.zeros(len(rows), bool)
+        return np.isin(rows, closed)
+
+    def is_open(self, rows: Optional[np.ndarray], day, start, minutes=0, unknown: bool = True) -> np.ndarray:
+        """
+        Whether each POI is open from `start` (minute of day) for `minutes` on `day`.
+        `start`/`minutes` may be scalars or arrays aligned with `rows` (None = all
+        POIs). A visit past midnight also needs the next day to open at 00:00
+        until its end. POIs with unknown hours count as `unknown`.
+        """
+        rows = np.arange(len(self)) if rows is None else np.asarray(rows, np.int64)
+        d = _as_date(day)
+        lo, hi = self._week(rows, d)
+        start = np.asarray(start, np.int32)
+        end = start + np.asarray(minutes, np.int32)
+        today_end = np.minimum(end, DAY_MINUTES)
+        ok = ((lo <= start[..., None]) & (today_end[..., None] <= hi) & (hi > lo)).any(axis=-1)
+        ok &= ~self._closed(rows, d)
+        over = end > DAY_MINUTES
+        if over.any():
+            # The overflow runs in the next day's interval that opens at midnight
+            nxt = d + timedelta(days=1)
+            lo2, hi2 = self._week(rows, nxt)
+            tail = ((lo2 == 0) & ((end - DAY_MINUTES)[..., None] <= hi2) & (hi2 > lo2)).any(axis=-1)
+            ok &= ~over | (tail & ~self._closed(rows, nxt))
+        return np.where(self.known[rows], ok, unknown)
+
+    def window(self, rows: Optional[np.ndarray], day, minute) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        (open, close) of the interval containing `minute`, else of the interval
+        starting closest to it; NaN when unknown or closed all day.
+        """
+        rows = np.arange(len(self)) if rows is None else np.asarray(rows, np.int64)
+        d = _as_date(day)
+        lo, hi = (x.astype(np.float64) for x in self._week(rows, d))
+        valid = (hi > lo) & ~self._closed(rows, d)[:, None] & self.known[rows, None]
+        minute = np.asarray(minute, np.float64)[..., None]
+        inside = valid & (lo <= minute) & (minute < hi)
+        dist = np.where(inside, -1.0, np.where(valid, np.abs(lo - minute), np.inf))
+        j = dist.argmin(axis=-1)
+        pick = np.arange(len(rows))
+        any_valid = valid.any(axis=-1)
+        return (np.where(any_valid, lo[pick, j], np.nan), np.where(any_valid, hi[pick, j], np.nan))
+
+    # --------------------------
+    # Persistence (next to the dataset columns)
+    # --------------------------
+    def save(self, path: str) -> None:
+        for name in ("opens", "closes", "month_variant", "known", "closed_keys"):
+            np.save(os.path.join(path, f"hours_{name}.npy"), getattr(self, name))
+
+    @classmethod
+    def load(cls, path: str) -> "HoursIndex":
+        def load(name: str) -> np.ndarray:
+            return np.load(os.path.join(path, f"hours_{name}.npy"), mmap_mode="r")
+        return cls(load("opens"), load("closes"), load("month_variant"), load("known"), load("closed_keys"))
+
+
+def build(path: str, rows: List[dict]) -> dict:
+    """Compile the hours of `rows` into `path` (called from datasets.build_pois)."""
+    idx = HoursIndex.from_records(rows)
+    idx.save(path)
+    return {"hours_unknown": int((~idx.known).sum())}
+
+
+@lru_cache(maxsize=1)
+def index() -> Optional[HoursIndex]:
+    """Hours of datasets.catalog(), or None when it has not been built."""
+    cat = datasets.catalog()
+    if cat is None:
+        return None
+    try:
+        return HoursIndex.load(cat.path)
+    except OSError as e:
+        print(f"[hours] index unavailable: {e}")
+        return None
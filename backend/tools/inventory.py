@@ -0,0 +1,335 @@
+# backend/tools/inventory.py
+"""
+Local hotel inventory: every candidate the hotel provider returns, plus
+imported rate feeds, in a columnar store per city.
+
+    h = inventory.best("Lyon", max_price=140, near=[(45.76, 4.83)])   # dict or None
+    python -m backend.tools.inventory refresh [--max-age-sec N] [--city Lyon]
+    python -m backend.tools.inventory import rates.jsonl --source partner
+
+Each city is a directory under DATASETS_DIR/hotels with one .npy per
+numeric column (price, rating, lat, lon), rows sorted by price, and a UTF-8
+blob with offsets for the string fields (as in backend/datasets.py). A query
+under max_price is a binary search for the cheapest slice, then a
+vectorized distance and rating pass over it; no provider is called.
+
+Rows are keyed by the provider's place ID, or by name. A source ("places"
+for the configured hotel provider, "feed:<name>" for imports) replaces its
+own rows when it refreshes. A feed price replaces the estimate derived from
+a Places price level, and a Places estimate never replaces a feed price.
+`price_from` records which source set the price; when that source stops
+listing a row, its price goes too, and the row waits for another source.
+`refresh` only re-fetches cities whose Places data is older than
+HOTEL_INVENTORY_MAX_AGE_SEC, and rewrites one city at a time (new directory,
+then rename), so readers never see a half-written city.
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import re
+import shutil
+import time
+import unicodedata
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from backend.config import settings
+
+FORMAT = 2
+STRING_FIELDS = ("key", "name", "url", "sources", "price_source", "price_from")
+PLACES = "places"
+_KM_PER_DEG = 6371.0 * math.pi / 180.0
+
+_cities: Dict[str, Tuple[int, "CityHotels"]] = {}   # slug -> (meta mtime, columns)
+
+
+def _root() -> str:
+    return os.path.join(settings.DATASETS_DIR, "hotels")
+
+
+def slug(city: str) -> str:
+    text = unicodedata.normalize("NFKD", city.lower())
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    return re.sub(r"[^a-z0-9]+", "-", text).strip("-") or "_"
+
+
+def row_key(rec: dict) -> str:
+    """Place ID when the source has one, else the normalized name."""
+    return str(rec.get("id") or "") or "name:" + slug(rec.get("name") or "")
+
+
+# --------------------------
+# Read side
+# --------------------------
+class CityHotels:
+    """Read-only, memory-mapped hotel columns of one city, sorted by price."""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(os.path.join(path, "meta.json"), "r", encoding="utf-8") as f:
+            self.meta = json.load(f)
+
+        def load(name: str) -> np.ndarray:
+            return np.load(os.path.join(path, name), mmap_mode="r")
+
+        self.price = load("price.npy")
+        self.rating = load("rating.npy")
+        self.lat = load("lat.npy")
+        self.lon = load("lon.npy")
+        self._strings = load("strings.npy")
+        self._offsets = load("offsets.npy")
+        self._fields = {f: i for i, f in enumerate(self.meta["fields"])}
+
+    def __len__(self) -> int:
+        return int(self.meta["rows"])
+
+    def text(self, i: int, field: str) -> str:
+        k = i * len(self._fields) + self._fields[field]
+        return bytes(self._strings[self._offsets[k]:self._offsets[k + 1]]).decode("utf-8")
+
+    def row(self, i: int) -> dict:
+        out = {f: self.text(i, f) for f in self._fields}
+        out["sources"] = out["sources"].split("|") if out["sources"] else []
+        out.update(price_eur=round(float(self.price[i]), 2), rating=_opt(self.rating[i], 2),
+                   lat=_opt(self.lat[i]), lon=_opt(self.lon[i]))
+        return out
+
+    def rows(self) -> List[dict]:
+        return [self.row(i) for i in range(len(self))]
+
+    def under(self, max_price: float) -> int:
+        """Number of rows priced <= max_price (they are rows 0..n-1)."""
+        return int(np.searchsorted(self.price, max_price, side="right"))
+
+    def best(self, max_price: float, near: Sequence[Tuple[float, float]] = (), radius_km: float = 0.0,
+             k: int = 1) -> List[Tuple[int, float]]:
+        """
+        Best-rated rows priced <= max_price, cheaper first among equal ratings,
+        as (row, km to the nearest of `near`). Rows within radius_km of a point
+        of `near` come first; when there are none, all rows under the price are
+        ranked. Rows without a rating rank last.
+        """
+        n = self.under(max_price)
+        if n == 0:
+            return []
+        if near:
+            # Equirectangular distances: negligible error at city scale, and no trigonometry per row
+            pts = np.asarray(near, np.float64)
+            kx = _KM_PER_DEG * np.cos(np.radians(pts[:, 0].mean()))
+            km2 = np.full(n, np.inf)
+            for plat, plon in pts:
+                d = ((self.lat[:n] - plat) * _KM_PER_DEG) ** 2 + ((self.lon[:n] - plon) * kx) ** 2
+                np.fmin(km2, d, out=km2)
+            km = np.sqrt(km2)
+        else:
+            km = np.zeros(n)
+        rows = np.arange(n)
+        if near and radius_km > 0:
+            close = km <= radius_km
+            if close.any():
+                rows = rows[close]
+        rating = np.nan_to_num(np.asarray(self.rating[rows], np.float64), nan=-np.inf)
+        top = rows[np.argsort(-rating, kind="stable")[:k]]   # stable: price order breaks ties
+        return [(int(i), float(km[i])) for i in top]
+
+
+def _opt(x, digits: Optional[int] = None) -> Optional[float]:
+    x = float(x)
+    if math.isnan(x):
+        return None
+    return round(x, digits) if digits is not None else x
+
+
+def city(name: str) -> Optional[CityHotels]:
+    """A city's inventory, or None; reopened when a refresh has replaced it."""
+    path = os.path.join(_root(), slug(name))
+    try:
+        mtime = os.stat(os.path.join(path, "meta.json")).st_mtime_ns
+    except OSError:
+        return None
+    cached = _cities.get(slug(name))
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
+    try:
+        hotels = CityHotels(path)
+    except (OSError, ValueError, KeyError) as e:
+        print(f"[inventory] {name} unavailable: {e}")
+        return None
+    _cities[slug(name)] = (mtime, hotels)
+    return hotels
+
+
+def best(city_name: str, max_price: float, near: Sequence[Tuple[float, float]] = (),
+         radius_km: Optional[float] = None) -> Optional[dict]:
+    """Best-rated hotel in a city priced <= max_price near `near` (lat, lon) points, or None."""
+    hotels = city(city_name)
+    if hotels is None:
+        return None
+    found = hotels.best(max_price, near, settings.HOTEL_NEAR_KM if radius_km is None else radius_km)
+    if not found:
+        return None
+    i, km = found[0]
+    return dict(hotels.row(i), distance_km=round(km, 2) if near and not math.isinf(km) else None)
+
+
+# --------------------------
+# Write side
+# --------------------------
+def write_city(name: str, rows: List[dict], refreshed: Dict[str, float]) -> str:
+    """Write a city's rows (any order) and swap the directory in; returns its path."""
+    rows = sorted(rows, key=lambda r: (float(r["price_eur"]), r["key"]))
+    out = os.path.join(_root(), slug(name))
+    tmp = f"{out}.tmp{os.getpid()}"
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+
+    def col(field: str, dtype) -> np.ndarray:
+        return np.array([np.nan if r.get(field) is None else float(r[field]) for r in rows], dtype)
+
+    np.save(os.path.join(tmp, "price.npy"), col("price_eur", np.float32))
+    np.save(os.path.join(tmp, "rating.npy"), col("rating", np.float32))
+    np.save(os.path.join(tmp, "lat.npy"), col("lat", np.float64))
+    np.save(os.path.join(tmp, "lon.npy"), col("lon", np.float64))
+    parts = []
+    for r in rows:
+        for f in STRING_FIELDS:
+            v = r.get(f) or ""
+            parts.append(("|".join(v) if isinstance(v, list) else str(v)).encode("utf-8"))
+    offsets = np.zeros(len(parts) + 1, np.int64)
+    np.cumsum([len(p) for p in parts], out=offsets[1:])
+    np.save(os.path.join(tmp, "strings.npy"), np.frombuffer(b"".join(parts), np.uint8))
+    np.save(os.path.join(tmp, "offsets.npy"), offsets)
+    with open(os.path.join(tmp, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump({"format": FORMAT, "city": name, "rows": len(rows), "fields": list(STRING_FIELDS),
+                   "refreshed": refreshed}, f)
+
+    old = f"{out}.old{os.getpid()}"
+    if os.path.exists(out):
+        os.replace(out, old)
+    os.replace(tmp, out)
+    shutil.rmtree(old, ignore_errors=True)
+    return out
+
+
+def _price_from(row: dict) -> str:
+    """Source that set a row's price; inferred for rows written before `price_from` existed."""
+    if row.get("price_from"):
+        return row["price_from"]
+    if row.get("price_source") != "feed":
+        return PLACES
+    feeds = [s for s in row["sources"] if s != PLACES]
+    return feeds[0] if len(feeds) == 1 else ""
+
+
+def merge(rows: List[dict], source: str, records: Iterable[dict]) -> List[dict]:
+    """
+    `rows` with `source` replaced by `records`: values the source has win,
+    except that an estimated price never replaces a feed price. A price the
+    source set goes with its rows, and rows left without a source or a price
+    are dropped.
+    """
+    by_key: Dict[str, dict] = {}
+    for row in rows:
+        r = dict(row, sources=[s for s in row["sources"] if s != source], price_from=_price_from(row))
+        if r["price_from"] == source:
+            for f in ("price_eur", "price_source", "price_from"):
+                r.pop(f, None)
+        by_key[r["key"]] = r
+    for rec in records:
+        key = row_key(rec)
+        r = by_key.setdefault(key, {"key": key, "sources": []})
+        r["sources"] = sorted(set(r["sources"]) | {source})
+        for f in ("name", "url", "rating", "lat", "lon"):
+            if rec.get(f) is not None:
+                r[f] = rec[f]
+        price_source = rec.get("price_source", "feed")
+        if rec.get("price_eur") is not None and (price_source == "feed" or r.get("price_source") != "feed"):
+            r.update(price_eur=float(rec["price_eur"]), price_source=price_source, price_from=source)
+    return [r for r in by_key.values() if r["sources"] and r.get("price_eur") is not None]
+
+
+def ingest(name: str, source: str, records: List[dict]) -> int:
+    """Replace one source's rows of a city; returns the city's row count."""
+    current = city(name)
+    refreshed = dict(current.meta.get("refreshed", {})) if current is not None else {}
+    refreshed[source] = time.time()
+    rows = merge(current.rows() if current is not None else [], source, records)
+    write_city(name, rows, refreshed)
+    return len(rows)
+
+
+def is_stale(name: str, max_age_sec: Optional[float] = None) -> bool:
+    hotels = city(name)
+    if hotels is None:
+        return True
+    age = time.time() - hotels.meta.get("refreshed", {}).get(PLACES, 0.0)
+    return age > (settings.HOTEL_INVENTORY_MAX_AGE_SEC if max_age_sec is None else max_age_sec)
+
+
+def known_cities() -> List[str]:
+    from backend.agents.planner import CITY_COORDS
+    names = set(CITY_COORDS)
+    if os.path.isdir(_root()):
+        for d in os.listdir(_root()):
+            try:
+                with open(os.path.join(_root(), d, "meta.json"), "r", encoding="utf-8") as f:
+                    names.add(json.load(f)["city"])
+            except (OSError, ValueError, KeyError):
+                pass
+    return sorted(names)
+
+
+async def refresh(cities: Optional[Sequence[str]] = None, max_age_sec: Optional[float] = None) -> Dict[str, int]:
+    """Re-fetch the hotel provider's candidates for stale cities only; {city: rows}."""
+    from backend.tools import registry
+
+    fetch = registry.resolve("hotels_inventory")
+    blocking = registry.blocking("hotels_inventory", registry.selected("hotels_inventory"))
+    out: Dict[str, int] = {}
+    for name in cities or known_cities():
+        if not is_stale(name, max_age_sec):
+            continue
+        try:
+            records = await asyncio.to_thread(fetch, name) if blocking else fetch(name)
+        except Exception as e:
+            print(f"[inventory] {name}: provider failed, keeping the current rows: {e}")
+            continue
+        out[name] = await asyncio.to_thread(ingest, name, PLACES, records)
+    return out
+
+
+def import_feed(path: str, source: str) -> Dict[str, int]:
+    """Load a JSONL rate feed (city, name, price_eur; optional id, rating, lat, lon, url)."""
+    per_city: Dict[str, List[dict]] = {}
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                rec = json.loads(line)
+                per_city.setdefault(rec["city"], []).append(dict(rec, price_source="feed"))
+    return {c: ingest(c, f"feed:{source}", recs) for c, recs in per_city.items()}
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Local hotel inventory")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    r = sub.add_parser("refresh", help="re-fetch stale cities from the hotel provider")
+    r.add_argument("--city", action="append", help="only these cities (default: all known)")
+    r.add_argument("--max-age-sec", type=float, default=settings.HOTEL_INVENTORY_MAX_AGE_SEC)
+    i = sub.add_parser("import", help="import a JSONL rate feed")
+    i.add_argument("path")
+    i.add_argument("--source", required=True, help="feed name; a new import replaces its previous rows")
+    args = ap.parse_args()
+
+    if args.cmd == "refresh":
+        counts = asyncio.run(refresh(args.city, args.max_age_sec))
+        print(f"[inventory] refreshed {len(counts)} cities: {counts}")
+    else:
+        counts = import_feed(args.path, args.source)
+        print(f"[inventory] imported {args.source} into {len(counts)} cities: {counts}")
+
+
+if __name__ == "__main__":
+    main()
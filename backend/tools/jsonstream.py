@@ -0,0 +1,113 @@
+# backend/tools/jsonstream.py
+"""
+Incremental extraction of arrays from streamed JSON responses.
+
+    picker = jsonstream.Picker(arrays=("data.itineraries", "results"))
+    async with client.stream("GET", url) as resp:
+        async for chunk in resp.aiter_bytes():
+            for path, item in picker.feed(chunk):
+                ...                        # one array element, fully built
+            if picker.closed:              # the array has ended:
+                break                      # stop reading, skip the rest of the body
+
+Paths use ijson's dotted prefixes (no ".item"). Only elements of the listed
+arrays (and the listed scalar paths) are materialized; everything else in
+the body is parsed as events and dropped, and nothing after the closing
+bracket of the first array found is read at all. Provider payloads carry
+large lookup tables (carriers, agents, dictionaries) after the result list,
+so most of the body is never downloaded.
+
+Needs the optional `ijson` package; without it the body is buffered and
+parsed whole on finish(), with the same results.
+"""
+import json
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+try:
+    import ijson
+    from ijson.common import ObjectBuilder
+except ImportError:  # optional; falls back to json.loads of the whole body
+    ijson = None
+
+Picked = Tuple[str, Any]
+
+
+class Picker:
+    def __init__(self, arrays: Sequence[str] = (), scalars: Sequence[str] = ()):
+        self.arrays = tuple(arrays)
+        self.scalars = tuple(scalars)
+        self.values: Dict[str, Any] = {}   # scalar path -> value
+        self.closed = False                 # an array in `arrays` has been read to its end
+        self.bytes_read = 0
+        self._items = {a + ".item": a for a in self.arrays}
+        self._builder: Optional["ObjectBuilder"] = None
+        self._building: Optional[str] = None
+        if ijson is not None:
+            self._events = ijson.sendable_list()
+            self._coro = ijson.parse_coro(self._events, use_float=True)
+        else:
+            self._buf: List[bytes] = []
+
+    def feed(self, chunk: bytes) -> List[Picked]:
+        """Parse one chunk; returns the array elements completed by it."""
+        self.bytes_read += len(chunk)
+        if ijson is None:
+            self._buf.append(chunk)
+            return []
+        self._coro.send(chunk)
+        return self._drain()
+
+    def finish(self) -> List[Picked]:
+        """End of body; returns any remaining elements. Not needed after `closed`."""
+        if ijson is None:
+            return self._parse_whole(b"".join(self._buf))
+        if not self.closed:
+            self._coro.close()
+            return self._drain()
+        return []
+
+    def _drain(self) -> List[Picked]:
+        out: List[Picked] = []
+        items, builder, building = self._items, self._builder, self._building
+        for path, event, value in self._events:
+            if builder is not None:
+                builder.event(event, value)
+                if path == building and (event == "end_map" or event == "end_array"):
+                    out.append((items[path], builder.value))
+                    builder = building = None
+            elif path in items:
+                if event == "start_map" or event == "start_array":
+                    builder, building = ObjectBuilder(), path
+                    builder.event(event, value)
+                else:
+                    out.append((items[path], value))
+            elif event == "end_array" and path in self.arrays:
+                self.closed = True
+            elif path in self.scalars and event in ("number", "string", "boolean", "null"):
+                self.values.setdefault(path, value)
+        self._builder, self._building = builder, building
+        del self._events[:]
+        return out
+
+    def _parse_whole(self, body: bytes) -> List[Picked]:
+        js = json.loads(body) if body else None
+
+        def at(path: str) -> Any:
+            node = js
+            for part in path.split("."):
+                if not isinstance(node, dict) or part not in node:
+                    return None
+                node = node[part]
+            return node
+
+        for s in self.scalars:
+            v = at(s)
+            if v is not None and not isinstance(v, (dict, list)):
+                self.values[s] = v
+        out: List[Picked] = []
+        for a in self.arrays:
+            v = at(a)
+            if isinstance(v, list):
+                out.extend((a, item) for item in v)
+                self.closed = True
+        return out
@@ -20,7 +20,7 @@ async def transit_minutes(origin_latlon: tuple[float,float], dest_latlon: tuple[
         "departure_time": "now" if mode=="transit" else None,
     }
     async with httpx.AsyncClient(timeout=10.0) as client:
-        r = await client.get("https://maps.googleapis.com/maps/api/directions/json", params={k:v for k,v in params.items() if v})
+        r = await client.get(f"{settings.GOOGLE_MAPS_BASE}/maps/api/directions/json", params={k:v for k,v in params.items() if v})
         r.raise_for_status()
         js = r.json()
     routes = js.get("routes") or []
@@ -1,10 +1,11 @@
-import random
+from backend.tools.seeding import rng
 
 def flight_eur(origin: str, dest_airport: str, depart_date: str) -> dict:
     """Return a mock flight quote (EUR). Replace with real API later."""
+    r = rng("flight", origin, dest_airport, depart_date)
     return {
         "provider": "mock-skyscanner",
-        "price_eur": round(random.uniform(60, 180), 2),
+        "price_eur": round(r.uniform(60, 180), 2),
         "currency": "EUR",
         "url": f"https://example.com/flights?o={origin}&d={dest_airport}&dt={depart_date}",
         "ttl_min": 30,
@@ -0,0 +1,204 @@
+# backend/tools/providers.py
+"""
+Cached provider layer between the planner and the provider tools.
+
+    w = await providers.weather(lat, lon, date)
+    q = await providers.flight(origin, dest, date)            # configured provider
+    q = await providers.flight(origin, dest, date, name="mock")
+    h = await providers.hotel(city, date, guests, max_price)
+
+Live responses are kept in the shared TTL cache (backend/cache.py); hits come
+back with "cached": True. Fallback/error responses are never cached; an
+expired entry is hedged against the live call and served with "stale": True
+if the provider is slower than usual (see hedge.py). Weather for dates past
+the provider's forecast horizon comes from the climatology table instead. Every lookup is counted
+by the prefetcher, which refreshes hot keys before they expire. Blocking
+providers run in a worker thread so they don't stall the loop.
+
+Inside `with providers.degraded() as sources:` (overload, see
+backend/admission.py) no provider is called: cached answers of any age
+within the stale grace are served, else offline estimates (mock flights and
+hotels, weather defaults). Answers carry "degraded": True and every lookup
+appends (kind, "cache" | "stale" | "estimate") to `sources`.
+"""
+import asyncio
+import inspect
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Iterator, List, Optional, Tuple
+
+from backend import metrics, prefetch
+from backend.cache import Entry, TTLCache
+from backend.config import settings
+from backend.tools import climatology, hedge, registry
+
+_cache = TTLCache("prov")
+
+_TTL = {
+    "weather": settings.WEATHER_CACHE_TTL_SEC,
+    "flights": settings.FLIGHTS_CACHE_TTL_SEC,
+    "hotels": settings.HOTELS_CACHE_TTL_SEC,
+}
+
+# Providers with their own cache that accept fresh=True to bypass it
+_FRESH_KW = {("flights", "skyscanner")}
+
+# (kind, source) of every lookup of the current plan while in degraded mode; None otherwise
+_degraded: ContextVar[Optional[List[Tuple[str, str]]]] = ContextVar("degraded", default=None)
+
+
+@contextmanager
+def degraded() -> Iterator[List[Tuple[str, str]]]:
+    """Serve provider lookups in this context from cache or offline estimates only."""
+    sources: List[Tuple[str, str]] = []
+    token = _degraded.set(sources)
+    try:
+        yield sources
+    finally:
+        _degraded.reset(token)
+
+
+async def _offline(kind: str, name: str, args: tuple, sources: List[Tuple[str, str]]) -> dict:
+    entry = await _cache.get_entry(_key(kind, name, args), allow_stale=True)
+    if entry is not None:
+        sources.append((kind, "cache" if entry.fresh else "stale"))
+        return dict(entry.value, cached=True, stale=not entry.fresh, degraded=True)
+    sources.append((kind, "estimate"))
+    if kind == "weather":
+        from backend.tools.weather import defaults
+        return dict(defaults(*args, provider=name), degraded=True)
+    return dict(await _invoke(kind, "mock", args), degraded=True)
+
+
+def _key(kind: str, name: str, args: tuple) -> str:
+    return f"{kind}:{name}:" + "|".join(str(a) for a in args)
+
+
+def _ttl(kind: str, res: Any) -> int:
+    """Cache lifetime for a response; 0 for fallbacks and errors."""
+    if not isinstance(res, dict):
+        return 0
+    if kind == "weather" and res.get("fallback"):
+        return 0
+    if kind == "flights" and (float(res.get("price_eur", 0.0)) <= 0.0 or res.get("error")):
+        return 0
+    if kind == "hotels" and "fallback" in res.get("provider", ""):
+        return 0
+    return _TTL[kind]
+
+
+async def _invoke(kind: str, name: str, args: tuple, fresh: bool = False) -> Any:
+    fn = registry.resolve(kind, name)
+    kwargs = {"fresh": True} if fresh and (kind, name) in _FRESH_KW else {}
+    if registry.blocking(kind, name):
+        return await asyncio.to_thread(fn, *args, **kwargs)
+    res = fn(*args, **kwargs)
+    return await res if inspect.isawaitable(res) else res
+
+
+def _good(kind: str, res: Any) -> bool:
+    return bool(_ttl(kind, res))
+
+
+async def _live(kind: str, name: str, args: tuple, key: str) -> Any:
+    t0 = time.perf_counter()
+    res = await _invoke(kind, name, args)
+    prefetch.observe_miss(kind, time.perf_counter() - t0)
+    ttl = _ttl(kind, res)
+    if ttl:
+        await _cache.set(key, res, ttl)
+    return res
+
+
+async def call(kind: str, *args, name: str = "") -> Any:
+    """Serve a provider call from cache, or call the provider and cache the answer."""
+    name = name or registry.selected(kind)
+    if name == "mock":
+        # Deterministic and in-process; nothing to cache or prefetch
+        return await _invoke(kind, name, args)
+    sources = _degraded.get()
+    if sources is not None:
+        return await _offline(kind, name, args, sources)
+
+    key = _key(kind, name, args)
+    prefetch.record(kind, name, args)
+    entry = await _cache.get_entry(key, allow_stale=True)
+    if entry is not None and entry.fresh:
+        if entry.source == "prefetch" and time.time() >= entry.replaced_until:
+            # Before that, the entry the prefetch replaced would have served it
+            prefetch.served(registry.label(kind, name), kind)
+        out = dict(entry.value)
+        out["cached"] = True
+        return out
+
+    if entry is None:
+        return await _live(kind, name, args, key)
+
+    # Expired copy in hand: hedge the live call against it. The live call is
+    # left to finish (and refresh the cache) if the stale copy wins.
+    async def stale() -> dict:
+        out = dict(entry.value)
+        out.update(cached=True, stale=True)
+        return out
+
+    return await hedge.hedged(
+        registry.label(kind, name),
+        lambda: _live(kind, name, args, key),
+        stale,
+        good=lambda r: _good(kind, r),
+        cancel_loser=False,
+    )
+
+
+async def peek(kind: str, name: str, args: tuple) -> Optional[Entry]:
+    return await _cache.get_entry(_key(kind, name, args))
+
+
+async def refresh(kind: str, name: str, args: tuple) -> bool:
+    """Fetch a key from the provider ahead of expiry; True if a fresh answer was cached."""
+    key = _key(kind, name, args)
+    prev = await _cache.get_entry(key)
+    with metrics.provider_call(registry.label(kind, name)) as pc:
+        pc.outcome = "prefetch"
+        res = await _invoke(kind, name, args, fresh=True)
+    ttl = _ttl(kind, res)
+    if ttl:
+        await _cache.set(key, res, ttl, source="prefetch",
+                         replaced_until=prev.expires_at if prev is not None else 0.0)
+    return bool(ttl)
+
+
+async def weather(lat: float, lon: float, date: str) -> dict:
+    """
+    Live forecast inside the provider's horizon; climate normals (no network)
+    beyond it, with "summary" in that provider's format.
+    """
+    name = registry.selected("weather")
+    if not climatology.in_horizon(name, date):
+        w = climatology.lookup(lat, lon, date, name)
+        if w is not None:
+            return w
+    return await call("weather", lat, lon, date)
+
+
+async def flight(origin: str, dest: str, date: str, name: str = "") -> dict:
+    """Configured flights provider, hedged against PROVIDER_FLIGHTS_SECONDARY if set."""
+    primary = name or registry.selected("flights")
+    secondary = settings.PROVIDER_FLIGHTS_SECONDARY
+    if name or not secondary or _degraded.get() is not None or secondary == primary or secondary not in registry.PROVIDERS["flights"]:
+        return await call("flights", origin, dest, date, name=primary)
+    entry = await peek("flights", primary, (origin, dest, date))
+    if entry is not None:
+        # Cache hit; nothing to hedge (and hits would drag the deadline down)
+        return await call("flights", origin, dest, date, name=primary)
+    return await hedge.hedged(
+        registry.label("flights", primary),
+        lambda: call("flights", origin, dest, date, name=primary),
+        lambda: call("flights", origin, dest, date, name=secondary),
+        good=lambda r: _good("flights", r),
+    )
+
+
+async def hotel(city: str, date: str, guests: int, max_price: int) -> dict:
+    return await call("hotels", city, date, guests, max_price)
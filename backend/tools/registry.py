@@ -0,0 +1,85 @@
+# backend/tools/registry.py
+"""
+Lazy provider registry.
+
+Providers are named "module:function" strings and only imported the first
+time they are resolved, so importing the planner no longer pulls in httpx
+clients, SDKs or Redis for providers this deployment never uses.
+warm() resolves the configured providers up front (for --preload masters).
+"""
+import importlib
+from typing import Callable, Dict, Tuple
+
+from backend.config import settings
+
+# kind -> provider name -> (import target, metrics label)
+PROVIDERS: Dict[str, Dict[str, Tuple[str, str]]] = {
+    "weather": {
+        "openmeteo": ("backend.tools.weather:forecast", "openmeteo"),
+        "openweather": ("backend.tools.weather_openweather:forecast", "openweather"),
+    },
+    "flights": {
+        "skyscanner": ("backend.tools.flights_skyscanner:flight_eur", "skyscanner"),
+        "amadeus": ("backend.tools.flights_amadeus:flight_eur", "amadeus"),
+        "mock": ("backend.tools.pricing:flight_eur", "mock-flights"),
+    },
+    "hotels": {
+        "google": ("backend.tools.hotels_google:nightly_hotel", "google-places"),
+        "mock": ("backend.tools.hotels:nightly_hotel", "mock-hotels"),
+    },
+    # Every candidate of a city, for the local inventory (backend/tools/inventory.py)
+    "hotels_inventory": {
+        "google": ("backend.tools.hotels_google:candidates", "google-places"),
+        "mock": ("backend.tools.hotels:candidates", "mock-hotels"),
+    },
+}
+
+# Providers that do blocking I/O; the provider layer runs them in a worker thread
+BLOCKING = {("flights", "amadeus"), ("hotels", "google"), ("hotels_inventory", "google")}
+
+# Unknown or unset switches fall back to these (same behaviour as the old import switches)
+_DEFAULTS = {"weather": "openmeteo", "flights": "mock", "hotels": "mock", "hotels_inventory": "mock"}
+
+_resolved: Dict[Tuple[str, str], Callable] = {}
+
+
+def selected(kind: str) -> str:
+    """Provider name configured for a kind."""
+    name = {
+        "weather": getattr(settings, "PROVIDER_WEATHER", "openmeteo"),
+        "flights": getattr(settings, "PROVIDER_FLIGHTS", "mock"),
+        "hotels": getattr(settings, "PROVIDER_MAPS", "google"),
+        "hotels_inventory": getattr(settings, "PROVIDER_MAPS", "google"),
+    }[kind]
+    return name if name in PROVIDERS[kind] else _DEFAULTS[kind]
+
+
+def resolve(kind: str, name: str = "") -> Callable:
+    """Return the provider function, importing its module on first use."""
+    name = name or selected(kind)
+    fn = _resolved.get((kind, name))
+    if fn is None:
+        target = PROVIDERS[kind][name][0]
+        module, _, attr = target.partition(":")
+        fn = getattr(importlib.import_module(module), attr)
+        _resolved[(kind, name)] = fn
+    return fn
+
+
+def blocking(kind: str, name: str = "") -> bool:
+    return (kind, name or selected(kind)) in BLOCKING
+
+
+def label(kind: str, name: str = "") -> str:
+    """Metrics label for a provider."""
+    return PROVIDERS[kind][name or selected(kind)][1]
+
+
+def warm() -> Dict[str, str]:
+    """Import every configured provider plus the mock fallbacks; return what was loaded."""
+    loaded = {}
+    for kind in PROVIDERS:
+        for name in {selected(kind), _DEFAULTS[kind]}:
+            resolve(kind, name)
+            loaded[f"{kind}:{name}"] = PROVIDERS[kind][name][0]
+    return loaded
@@ -0,0 +1,270 @@
+# backend/tools/retrieval.py
+"""
+Hybrid POI retrieval over the memory-mapped catalog (backend/datasets.py).
+
+    r = retrieval.retriever()
+    rows = r.candidates("Lyon", interests=["food", "history"], max_price=20)
+    hits = r.search("Lyon", "old town walk", interests=["history"], k=8)   # [(row, score)]
+
+Three indexes are built with the dataset and stored next to it:
+
+- bitmaps.npy: one bit per POI for every tag and for every "price <= band"
+  bound, laid out city by city on 64-bit word boundaries (city_words.npy).
+  Candidate generation for a city is a few word-wise ORs (any interest) and
+  one AND (price band) over that city's words, then an unpack; no POI row is
+  read.
+- bm25_*.npy: an inverted index over name + tags tokens in CSR form, with the
+  BM25 weight of every posting precomputed, so a query sums a few postings.
+- embeddings.npy (optional): dense scores through backend/tools/vectors.py,
+  restricted to the candidates.
+
+The ranked lists (BM25, dense, number of matched interests) are merged with
+reciprocal-rank fusion: score = sum(1 / (RRF_K + rank)).
+"""
+import os
+import re
+import threading
+import unicodedata
+from functools import lru_cache
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from backend import datasets
+from backend.config import settings
+from backend.tools import hours
+
+PRICE_BANDS_EUR = (0.0, 10.0, 20.0, 40.0, 80.0)
+RRF_K = 60
+BM25_K1, BM25_B = 1.2, 0.75
+
+# Planner interests that have no tag of their own in the seed
+INTEREST_TAGS: Dict[str, Tuple[str, ...]] = {
+    "history": ("history", "church", "castle", "monument"),
+    "nature": ("nature", "park", "scenic", "garden"),
+    "nightlife": ("nightlife", "bar", "club"),
+    "art": ("art", "museum", "gallery"),
+    "food": ("food", "market", "restaurant"),
+}
+
+_WORD = re.compile(r"\w+")
+
+
+def tokens(text: str) -> List[str]:
+    """Lower-case words with accents stripped ("Musée" -> "musee")."""
+    text = unicodedata.normalize("NFKD", text.lower())
+    return _WORD.findall("".join(ch for ch in text if not unicodedata.combining(ch)))
+
+
+def _tags(row: dict) -> List[str]:
+    return [t.lower() for t in row.get("tags") or []]
+
+
+# --------------------------
+# Build (called from datasets.build_pois)
+# --------------------------
+def build(path: str, rows: List[dict], city_rows: np.ndarray) -> dict:
+    """Write bitmaps and the BM25 index for `rows` (sorted by city); returns meta entries."""
+    n = len(rows)
+    vocab = sorted({t for r in rows for t in _tags(r)})
+    tag_id = {t: i for i, t in enumerate(vocab)}
+
+    words = (city_rows[:, 1] - city_rows[:, 0] + 63) // 64
+    city_words = np.zeros((len(city_rows), 2), np.int64)
+    city_words[:, 1] = np.cumsum(words)
+    city_words[:, 0] = city_words[:, 1] - words
+    # Bit position of every row: its city's first word, then its offset in the city
+    bit = np.zeros(n, np.int64)
+    for c, (lo, hi) in enumerate(city_rows):
+        bit[lo:hi] = city_words[c, 0] * 64 + np.arange(hi - lo)
+
+    bools = np.zeros((len(vocab) + len(PRICE_BANDS_EUR), int(city_words[-1, 1]) * 64 if n else 0), bool)
+    price = np.array([float(r.get("price_eur") or 0.0) for r in rows])
+    for i, r in enumerate(rows):
+        for t in _tags(r):
+            bools[tag_id[t], bit[i]] = True
+    for b, bound in enumerate(PRICE_BANDS_EUR):
+        bools[len(vocab) + b, bit[price <= bound]] = True
+    bitmaps = np.packbits(bools, axis=1, bitorder="little").view(np.uint64) if n else np.zeros((len(bools), 0), np.uint64)
+    np.save(os.path.join(path, "bitmaps.npy"), bitmaps)
+    np.save(os.path.join(path, "city_words.npy"), city_words)
+
+    # BM25 over name + tags; postings sorted by term, then row
+    docs = [tokens(r.get("name") or "") + _tags(r) for r in rows]
+    terms = sorted({t for d in docs for t in d})
+    term_id = {t: i for i, t in enumerate(terms)}
+    lengths = np.array([len(d) for d in docs], np.float32)
+    avgdl = float(lengths.mean()) if n else 1.0
+    post: Dict[int, Dict[int, int]] = {}
+    for i, d in enumerate(docs):
+        for t in d:
+            tf = post.setdefault(term_id[t], {})
+            tf[i] = tf.get(i, 0) + 1
+    indptr = np.zeros(len(terms) + 1, np.int64)
+    prow: List[int] = []
+    pweight: List[float] = []
+    for t in range(len(terms)):
+        df = len(post[t])
+        idf = np.log(1.0 + (n - df + 0.5) / (df + 0.5))
+        for i, tf in sorted(post[t].items()):
+            norm = BM25_K1 * (1.0 - BM25_B + BM25_B * lengths[i] / avgdl)
+            prow.append(i)
+            pweight.append(idf * tf * (BM25_K1 + 1.0) / (tf + norm))
+        indptr[t + 1] = len(prow)
+    np.save(os.path.join(path, "bm25_indptr.npy"), indptr)
+    np.save(os.path.join(path, "bm25_rows.npy"), np.array(prow, np.int32))
+    np.save(os.path.join(path, "bm25_weights.npy"), np.array(pweight, np.float32))
+    return {"tags": vocab, "price_bands": list(PRICE_BANDS_EUR), "terms": terms}
+
+
+# --------------------------
+# Query
+# --------------------------
+class HybridRetriever:
+    def __init__(self, cat: "datasets.POICatalog"):
+        self.cat = cat
+
+        def load(name: str) -> np.ndarray:
+            return np.load(os.path.join(cat.path, name), mmap_mode="r")
+
+        self.bitmaps = load("bitmaps.npy")
+        self.city_words = load("city_words.npy")
+        self._tag = {t: i for i, t in enumerate(cat.meta["tags"])}
+        self._bands = cat.meta["price_bands"]
+        self._term = {t: i for i, t in enumerate(cat.meta["terms"])}
+        self._indptr = load("bm25_indptr.npy")
+        self._prows = load("bm25_rows.npy")
+        self._pweights = load("bm25_weights.npy")
+        self._dense = None
+        if cat.embeddings is not None:
+            from backend.tools import vectors
+            self._dense = vectors.open_index(cat.path)
+
+    def _tag_rows(self, interests: Sequence[str]) -> List[int]:
+        want = {t for i in interests for t in INTEREST_TAGS.get(i.lower(), (i.lower(),))}
+        return sorted(self._tag[t] for t in want if t in self._tag)
+
+    def _rows(self, c: int, bits: np.ndarray) -> np.ndarray:
+        lo, hi = self.cat.city_rows[c]
+        idx = np.flatnonzero(np.unpackbits(bits.view(np.uint8), bitorder="little")[:hi - lo])
+        return idx + lo
+
+    def candidates(self, city: str, interests: Sequence[str] = (), max_price: Optional[float] = None) -> np.ndarray:
+        """Rows in `city` tagged with any of `interests` (all if empty) and priced <= max_price."""
+        c = self.cat.city_id(city)
+        if c is None:
+            return np.zeros(0, np.int64)
+        w0, w1 = self.city_words[c]
+        bits = np.full(w1 - w0, ~np.uint64(0), np.uint64)
+        if interests:
+            tags = self._tag_rows(interests)
+            if not tags:
+                return np.zeros(0, np.int64)
+            bits &= np.bitwise_or.reduce(self.bitmaps[tags, w0:w1], axis=0)
+        if max_price is not None:
+            # Tightest band covering the cap, then the exact price on what is left
+            band = min((b for b, bound in enumerate(self._bands) if bound >= max_price), default=None)
+            if band is not None:
+                bits &= self.bitmaps[len(self._tag) + band, w0:w1]
+            rows = self._rows(c, bits)
+            return rows[self.cat.price[rows] <= max_price]
+        return self._rows(c, bits)
+
+    def bm25(self, query: str, rows: np.ndarray) -> np.ndarray:
+        """BM25 score of each of `rows` (sorted) for `query`."""
+        scores = np.zeros(len(rows), np.float32)
+        if not len(rows):
+            return scores
+        for t in set(tokens(query)):
+            i = self._term.get(t)
+            if i is None:
+                continue
+            lo, hi = self._indptr[i], self._indptr[i + 1]
+            prows = self._prows[lo:hi]
+            pos = np.minimum(np.searchsorted(rows, prows), len(rows) - 1)
+            hit = rows[pos] == prows
+            scores[pos[hit]] += self._pweights[lo:hi][hit]
+        return scores
+
+    def interest_matches(self, city: str, interests: Sequence[str], rows: np.ndarray) -> np.ndarray:
+        """Number of matched interest tags for each of `rows` (all in `city`), from the bitmaps."""
+        out = np.zeros(len(rows), np.int32)
+        c = self.cat.city_id(city)
+        if c is None or not len(rows):
+            return out
+        w0, w1 = self.city_words[c]
+        lo, hi = self.cat.city_rows[c]
+        for t in self._tag_rows(interests):
+            out += np.unpackbits(self.bitmaps[t, w0:w1].view(np.uint8), bitorder="little")[rows - lo]
+        return out
+
+    def search(self, city: str, query: str = "", interests: Sequence[str] = (), max_price: Optional[float] = None,
+               k: int = 8, query_vec: Optional[np.ndarray] = None,
+               open_at: Optional[Tuple[str, int, int]] = None) -> List[Tuple[int, float]]:
+        """
+        Best `k` rows by reciprocal-rank fusion of BM25, dense and interest-match
+        ranks. `open_at` = (date, start minute, duration) keeps POIs open then.
+        """
+        rows = self.candidates(city, interests, max_price)
+        if open_at is not None and len(rows):
+            idx = hours.index()
+            if idx is not None:
+                rows = rows[idx.is_open(rows, *open_at)]
+        if not len(rows):
+            return []
+        lists: List[np.ndarray] = []
+        if query:
+            s = self.bm25(query, rows)
+            if s.any():
+                lists.append(s)
+        if self._dense is not None and (query_vec is not None or query):
+            qv = query_vec if query_vec is not None else _encode(query)
+            if qv is not None:
+                ids, scores = self._dense.search(qv, k=len(rows), rows=rows)
+                dense = np.full(len(rows), -np.inf, np.float32)
+                dense[np.searchsorted(rows, ids)] = scores
+                lists.append(dense)
+        if interests:
+            lists.append(self.interest_matches(city, interests, rows).astype(np.float32))
+        fused = np.zeros(len(rows))
+        for s in lists:
+            rank = np.searchsorted(np.sort(-s), -s, side="left")   # ties share a rank
+            fused += 1.0 / (RRF_K + 1 + rank)
+        top = np.argsort(-fused, kind="stable")[:k]
+        return [(int(rows[i]), float(fused[i])) for i in top]
+
+
+_embedder_lock = threading.Lock()   # lru_cache alone would let concurrent first calls each build one
+
+
+@lru_cache(maxsize=1)
+def _embedder():
+    """Shared micro-batching encoder: concurrent searches share one forward pass."""
+    from sentence_transformers import SentenceTransformer  # only when the catalog has embeddings
+    from common.embedder import BatchEmbedder
+    return BatchEmbedder(SentenceTransformer(settings.EMBED_MODEL), settings.EMBED_BATCH_MAX,
+                         settings.EMBED_BATCH_WINDOW_MS, settings.EMBED_THREADS)
+
+
+def _encode(query: str) -> Optional[np.ndarray]:
+    try:
+        with _embedder_lock:
+            emb = _embedder()
+        v = np.asarray(emb.submit(query).result(), np.float32)
+    except ImportError:
+        return None
+    n = float(np.linalg.norm(v))
+    return v / n if n else v
+
+
+@lru_cache(maxsize=1)
+def retriever() -> Optional[HybridRetriever]:
+    """The shared retriever over datasets.catalog(), or None when it has not been built."""
+    cat = datasets.catalog()
+    if cat is None:
+        return None
+    try:
+        return HybridRetriever(cat)
+    except (OSError, KeyError) as e:
+        print(f"[retrieval] indexes unavailable: {e}")
+        return None
@@ -9,15 +9,17 @@ def _haversine(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
     c = 2 * asin(sqrt(a))
     return R * c
 
+# Average door-to-door speeds used by the estimates below (and the trip optimizer)
+SPEEDS_KMH = {
+    "walk": 4.5,
+    "metro": 25.0,
+    "bus": 18.0,
+    "train": 120.0,
+}
+
 def travel_minutes_km(distance_km: float, mode: str) -> int:
     """Rough travel time in minutes for a given mode."""
-    speeds_kmh = {
-        "walk": 4.5,
-        "metro": 25.0,
-        "bus": 18.0,
-        "train": 120.0,
-    }
-    v = speeds_kmh.get(mode, 20.0)
+    v = SPEEDS_KMH.get(mode, 20.0)
     return max(1, int((distance_km / v) * 60))
 
 def estimate_minutes(a: tuple[float, float], b: tuple[float, float], mode: str = "metro") -> int:
@@ -0,0 +1,24 @@
+# backend/tools/seeding.py
+"""
+Per-request seeding for the mock providers.
+
+Mock tools draw from rng(...) instead of the global `random` module. The
+stream depends on the request seed plus the call arguments, so the same
+request (live, captured or replayed) always yields the same mock prices.
+"""
+import random
+from contextvars import ContextVar
+
+_request_seed: ContextVar[str] = ContextVar("request_seed", default="")
+
+
+def set_request_seed(seed: str) -> None:
+    _request_seed.set(seed)
+
+
+def request_seed() -> str:
+    return _request_seed.get()
+
+
+def rng(*parts) -> random.Random:
+    return random.Random("|".join([_request_seed.get(), *map(str, parts)]))
@@ -0,0 +1,212 @@
+# backend/tools/vectors.py
+"""
+Quantized vector search with exact re-ranking over memory-mapped embeddings.
+
+    idx = vectors.open_index(path, kind="int8")   # float32 | int8 | pq
+    rows, scores = idx.search(query_vec, k=10, rows=cat.by_city("Lyon"))
+
+Vectors are unit-normalized (cosine = dot). The full-precision matrix stays
+in embeddings.npy and is only memory-mapped; the first pass scores compact
+codes held in RAM, and the best k * oversample candidates are re-scored
+exactly from the mapped float32 rows.
+
+- int8: per-dimension scalar quantization (offset + scale * code over the
+  0.1–99.9 percentile range), 1 byte per dimension: 384 B for a 384-dim
+  vector instead of 1536 B.
+- pq: product quantization, `m` subspaces with 256 k-means centroids each,
+  1 byte per subspace (48 B at m=48), scored with per-query lookup tables.
+
+Codes are built once (python -m backend.tools.vectors build) and saved next
+to the embeddings. `kind` can be chosen per collection (index directory).
+"""
+import argparse
+import os
+from typing import Optional, Tuple
+
+import numpy as np
+
+from backend.config import settings
+
+KINDS = ("float32", "int8", "pq")
+_CHUNK = 16384  # rows scored per block; bounds the float32 temporaries of the first pass
+
+
+def _topk(scores: np.ndarray, k: int) -> np.ndarray:
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.zeros(0, np.int64)
+    part = np.argpartition(-scores, k - 1)[:k]
+    return part[np.argsort(-scores[part])]
+
+
+class Float32Index:
+    """Exact brute-force baseline over the mapped matrix."""
+
+    kind = "float32"
+
+    def __init__(self, vectors: np.ndarray):
+        self.vectors = vectors
+
+    @property
+    def code_bytes(self) -> int:
+        return 0
+
+    def _approx(self, q: np.ndarray, rows: Optional[np.ndarray]) -> np.ndarray:
+        return self._exact(q, rows)
+
+    def _exact(self, q: np.ndarray, rows: Optional[np.ndarray]) -> np.ndarray:
+        if rows is None:
+            return np.concatenate([self.vectors[i:i + _CHUNK] @ q for i in range(0, len(self.vectors), _CHUNK)]
+                                  or [np.zeros(0, np.float32)])
+        return np.asarray(self.vectors[np.sort(rows)] @ q)[np.argsort(np.argsort(rows))]
+
+    def search(self, q: np.ndarray, k: int = 10, rows: Optional[np.ndarray] = None,
+               oversample: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """(row ids, scores), best first. `rows` restricts the search to those rows."""
+        q = np.asarray(q, np.float32)
+        q = q / (np.linalg.norm(q) or 1.0)
+        approx = self._approx(q, rows)
+        ids = np.arange(len(self.vectors)) if rows is None else np.asarray(rows)
+        if self.kind == "float32":
+            top = _topk(approx, k)
+            return ids[top], approx[top]
+        cand = ids[_topk(approx, k * (oversample or settings.VECTOR_RERANK_OVERSAMPLE))]
+        order = np.sort(cand)                      # sequential reads from the mapped file
+        exact = np.asarray(self.vectors[order] @ q)
+        top = _topk(exact, k)
+        return order[top], exact[top]
+
+
+class Int8Index(Float32Index):
+    kind = "int8"
+
+    def __init__(self, vectors: np.ndarray, codes: np.ndarray, params: np.ndarray):
+        super().__init__(vectors)
+        self.codes = codes                 # (n, d) int8
+        self.offset, self.scale = params   # (d,), (d,)
+
+    @property
+    def code_bytes(self) -> int:
+        return self.codes.nbytes + self.offset.nbytes + self.scale.nbytes
+
+    @staticmethod
+    def train(vectors: np.ndarray, sample: int = 100_000) -> Tuple[np.ndarray, np.ndarray]:
+        rng = np.random.default_rng(0)
+        s = np.asarray(vectors[np.sort(rng.choice(len(vectors), min(sample, len(vectors)), replace=False))])
+        lo, hi = np.percentile(s, 0.1, axis=0), np.percentile(s, 99.9, axis=0)
+        scale = np.maximum(hi - lo, 1e-6) / 255.0
+        params = np.stack([lo, scale]).astype(np.float32)
+        codes = np.concatenate([
+            (np.clip(np.rint((vectors[i:i + _CHUNK] - lo) / scale), 0, 255) - 128).astype(np.int8)
+            for i in range(0, len(vectors), _CHUNK)
+        ])
+        return codes, params
+
+    def _approx(self, q: np.ndarray, rows: Optional[np.ndarray]) -> np.ndarray:
+        # q . (offset + scale * (c + 128)) = q.offset + 128 * (q*scale).1 + (q*scale) . c
+        w = q * self.scale
+        bias = float(q @ self.offset + 128.0 * w.sum())
+        codes = self.codes if rows is None else self.codes[rows]
+        return np.concatenate([codes[i:i + _CHUNK].astype(np.float32) @ w for i in range(0, len(codes), _CHUNK)]
+                              or [np.zeros(0, np.float32)]) + bias
+
+
+class PQIndex(Float32Index):
+    kind = "pq"
+
+    def __init__(self, vectors: np.ndarray, codes: np.ndarray, codebooks: np.ndarray):
+        super().__init__(vectors)
+        self.codes = codes            # (n, m) uint8
+        self.codebooks = codebooks    # (m, 256, d/m) float32
+
+    @property
+    def code_bytes(self) -> int:
+        return self.codes.nbytes + self.codebooks.nbytes
+
+    @staticmethod
+    def train(vectors: np.ndarray, m: int, sample: int = 20_000, iters: int = 12) -> Tuple[np.ndarray, np.ndarray]:
+        n, d = vectors.shape
+        if d % m:
+            raise ValueError(f"dimension {d} is not divisible by m={m}")
+        ds = d // m
+        rng = np.random.default_rng(0)
+        s = np.asarray(vectors[np.sort(rng.choice(n, min(sample, n), replace=False))], np.float32)
+        ks = min(256, len(s))
+        books = np.zeros((m, 256, ds), np.float32)
+        for j in range(m):
+            x = s[:, j * ds:(j + 1) * ds]
+            c = x[rng.choice(len(x), ks, replace=False)].copy()
+            for _ in range(iters):
+                assign = ((c ** 2).sum(1)[None] - 2 * x @ c.T).argmin(1)
+                sums = np.zeros_like(c)
+                np.add.at(sums, assign, x)
+                counts = np.bincount(assign, minlength=ks)[:, None]
+                c = np.where(counts > 0, sums / np.maximum(counts, 1), c)
+            books[j, :ks] = c
+            books[j, ks:] = c[0]
+        codes = np.zeros((n, m), np.uint8)
+        for i in range(0, n, _CHUNK):
+            block = np.asarray(vectors[i:i + _CHUNK], np.float32)
+            for j in range(m):
+                x = block[:, j * ds:(j + 1) * ds]
+                # |x - c|^2 = |x|^2 - 2 x.c + |c|^2; |x|^2 is constant per row
+                dist = (books[j] ** 2).sum(1)[None] - 2 * x @ books[j].T
+                codes[i:i + _CHUNK, j] = dist.argmin(1)
+        return codes, books
+
+    def _approx(self, q: np.ndarray, rows: Optional[np.ndarray]) -> np.ndarray:
+        m, _, ds = self.codebooks.shape
+        lut = np.einsum("mkd,md->mk", self.codebooks, q.reshape(m, ds))   # (m, 256)
+        codes = self.codes if rows is None else self.codes[rows]
+        out = np.zeros(len(codes), np.float32)
+        for j in range(m):
+            out += lut[j, codes[:, j]]
+        return out
+
+
+# --------------------------
+# Build / open
+# --------------------------
+def build(path: str, kind: str, m: Optional[int] = None) -> None:
+    vectors = np.load(os.path.join(path, "embeddings.npy"), mmap_mode="r")
+    if kind == "int8":
+        codes, params = Int8Index.train(vectors)
+        np.save(os.path.join(path, "int8_codes.npy"), codes)
+        np.save(os.path.join(path, "int8_params.npy"), params)
+    elif kind == "pq":
+        codes, books = PQIndex.train(vectors, m or settings.VECTOR_PQ_SUBSPACES)
+        np.save(os.path.join(path, "pq_codes.npy"), codes)
+        np.save(os.path.join(path, "pq_codebooks.npy"), books)
+    elif kind != "float32":
+        raise ValueError(f"unknown index kind {kind!r}; expected one of {KINDS}")
+
+
+def open_index(path: str, kind: Optional[str] = None) -> Float32Index:
+    """Open the index of a collection directory (embeddings.npy + codes); codes are loaded into RAM."""
+    kind = kind or settings.VECTOR_INDEX
+    vectors = np.load(os.path.join(path, "embeddings.npy"), mmap_mode="r")
+    if kind == "float32":
+        return Float32Index(vectors)
+    if kind == "int8":
+        return Int8Index(vectors, np.load(os.path.join(path, "int8_codes.npy")),
+                         np.load(os.path.join(path, "int8_params.npy")))
+    if kind == "pq":
+        return PQIndex(vectors, np.load(os.path.join(path, "pq_codes.npy")),
+                       np.load(os.path.join(path, "pq_codebooks.npy")))
+    raise ValueError(f"unknown index kind {kind!r}; expected one of {KINDS}")
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Build quantized codes for a collection's embeddings.npy")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    b = sub.add_parser("build")
+    b.add_argument("--path", default=os.path.join(settings.DATASETS_DIR, "pois"))
+    b.add_argument("--kind", choices=KINDS, default=settings.VECTOR_INDEX)
+    b.add_argument("--m", type=int, default=settings.VECTOR_PQ_SUBSPACES, help="PQ subspaces")
+    args = ap.parse_args()
+    build(args.path, args.kind, args.m)
+    print(f"[vectors] built {args.kind} codes in {args.path}")
+
+
+if __name__ == "__main__":
+    main()
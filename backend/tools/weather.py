@@ -1,10 +1,12 @@
 import httpx
 from backend.config import settings
+from backend.tools import climatology, hedge
 
 async def forecast(city_lat: float, city_lon: float, date: str) -> dict:
     """
     Fetch a simple daily forecast (Open-Meteo). Returns a compact dict.
-    Falls back to sane defaults if the API fails.
+    Falls back to climate normals (or fixed defaults) if the API fails;
+    "transient" says whether that failure may clear on a retry.
     """
     params = {
         "latitude": city_lat,
@@ -26,6 +28,18 @@ async def forecast(city_lat: float, city_lon: float, date: str) -> dict:
             "low_c": float(js["daily"]["temperature_2m_min"][idx]),
             "rain_risk": float(js["daily"]["precipitation_probability_max"][idx]) / 100.0,
         }
-    except Exception:
-        # Fallback defaults so the planner keeps working offline
-        return {"summary": 0, "high_c": 18.0, "low_c": 10.0, "rain_risk": 0.2}
+    except Exception as e:
+        # Fallback so the planner keeps working offline
+        return dict(defaults(city_lat, city_lon, date), transient=hedge.transient(e))
+
+
+def defaults(city_lat: float, city_lon: float, date: str, provider: str = "openmeteo") -> dict:
+    """
+    Offline estimate: climate normals for the date, else fixed mild-weather
+    values; "summary" in the format of the weather `provider`.
+    """
+    normal = climatology.lookup(city_lat, city_lon, date, provider)
+    if normal is not None:
+        return dict(normal, fallback=True)
+    return {"summary": climatology.summary("clear", provider), "high_c": 18.0, "low_c": 10.0,
+            "rain_risk": 0.2, "fallback": True}
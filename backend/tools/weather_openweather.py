@@ -2,6 +2,7 @@ import httpx
 from collections import Counter
 from datetime import datetime
 from backend.config import settings
+from backend.tools import hedge
 
 def _risk(v) -> float:
     try:
@@ -27,7 +28,7 @@ async def _onecall_3(lat: float, lon: float, date_iso: str, api_key: str) -> dic
         "appid": api_key,
     }
     async with httpx.AsyncClient(timeout=12.0) as client:
-        r = await client.get("https://api.openweathermap.org/data/3.0/onecall", params=params)
+        r = await client.get(f"{settings.OPENWEATHER_BASE}/data/3.0/onecall", params=params)
         r.raise_for_status()
         js = r.json()
 
@@ -64,7 +65,7 @@ async def _aggregate_forecast_25(lat: float, lon: float, date_iso: str, api_key:
         "appid": api_key,
     }
     async with httpx.AsyncClient(timeout=12.0) as client:
-        r = await client.get("https://api.openweathermap.org/data/2.5/forecast", params=params)
+        r = await client.get(f"{settings.OPENWEATHER_BASE}/data/2.5/forecast", params=params)
         r.raise_for_status()
         js = r.json()
 
@@ -99,21 +100,17 @@ async def _aggregate_forecast_25(lat: float, lon: float, date_iso: str, api_key:
 
 async def forecast(lat: float, lon: float, date_iso: str) -> dict:
     """
-    Try One Call 3.0 (paid/activated). On 401/403/404 or any error, fallback to
-    free 5-day/3-hour forecast aggregation.
+    Try One Call 3.0 (paid/activated), hedged against the free 5-day/3-hour
+    forecast aggregation: if One Call errors (401/403/404 when not enabled)
+    or is slower than its usual tail, the 2.5 request starts and the first
+    answer wins.
     """
     api_key = getattr(settings, "OPENWEATHER_API_KEY", "") or ""
     if not api_key:
         raise RuntimeError("OPENWEATHER_API_KEY missing")
 
-    try:
-        return await _onecall_3(lat, lon, date_iso, api_key)
-    except httpx.HTTPStatusError as he:
-        # Typical when One Call 3.0 isn't enabled: 401/403/404
-        try:
-            return await _aggregate_forecast_25(lat, lon, date_iso, api_key)
-        except Exception:
-            raise he
-    except Exception:
-        # Any other error -> try fallback
-        return await _aggregate_forecast_25(lat, lon, date_iso, api_key)
+    return await hedge.hedged(
+        "openweather-onecall",
+        lambda: _onecall_3(lat, lon, date_iso, api_key),
+        lambda: _aggregate_forecast_25(lat, lon, date_iso, api_key),
+    )
@@ -0,0 +1,105 @@
+# bench/codec_bench.py
+"""
+Bytes per cached plan and encode/decode time: current JSON vs backend.codec.
+
+    python -m bench.loadgen generate bench/requests.jsonl --n 500
+    python -m bench.codec_bench bench/requests.jsonl --n 400
+
+Plans come from the in-process planner, so run it with the stub environment
+(`python -m bench.loadgen env http://127.0.0.1:9100`) or mock providers.
+Half the plans train the zstd dictionary, the other half are measured.
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+from typing import Callable, List
+
+import msgpack
+
+from backend import codec
+from backend.deps import close_db
+from backend.models import PlanResponse
+
+
+def _time_us(fn: Callable, items: list, repeat: int = 3) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        for x in items:
+            fn(x)
+        best = min(best, time.perf_counter() - t0)
+    return best / max(1, len(items)) * 1e6
+
+
+def _row(name: str, encode: Callable, decode: Callable, plans: List[PlanResponse]) -> dict:
+    blobs = [encode(p) for p in plans]
+    return {
+        "format": name,
+        "bytes_mean": round(statistics.mean(len(b) for b in blobs), 1),
+        "bytes_p95": sorted(len(b) for b in blobs)[int(0.95 * (len(blobs) - 1))],
+        "encode_us": round(_time_us(encode, plans), 1),
+        "decode_us": round(_time_us(decode, blobs), 1),
+    }
+
+
+def run(requests_path: str, n: int) -> List[dict]:
+    async def go() -> List[PlanResponse]:
+        try:
+            return await codec.sample_plans(requests_path, n)
+        finally:
+            await close_db()
+
+    plans = asyncio.run(go())
+    if len(plans) < 4:
+        raise SystemExit("need at least 4 plans")
+    train, test = plans[: len(plans) // 2], plans[len(plans) // 2:]
+
+    rows = [
+        # What the tree did before: json.dumps of the model dict, pydantic on the way back
+        _row("json (model_dump)",
+             lambda p: json.dumps(p.model_dump()).encode(),
+             lambda b: PlanResponse(**json.loads(b)), test),
+        _row("msgpack (model_dump)",
+             lambda p: msgpack.packb(p.model_dump()),
+             lambda b: PlanResponse(**msgpack.unpackb(b)), test),
+        _row("codec record",
+             lambda p: codec.dumps(codec.PlanRecord.from_response(p), compress=False),
+             codec.loads, test),
+    ]
+    if codec.zstandard is not None:
+        saved = codec._active_dict_id
+        codec._active_dict_id = None
+        rows.append(_row("codec record + zstd",
+                         lambda p: codec.dumps(codec.PlanRecord.from_response(p), compress=True),
+                         codec.loads, test))
+        d = codec.zstandard.ZstdCompressionDict(
+            codec.train_dict([codec.pack(codec.PlanRecord.from_response(p)) for p in train]))
+        codec._dicts[d.dict_id()] = d
+        codec._active_dict_id = d.dict_id()
+        rows.append(_row("codec record + zstd dict",
+                         lambda p: codec.dumps(codec.PlanRecord.from_response(p), compress=True),
+                         codec.loads, test))
+        codec._active_dict_id = saved
+    return rows
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("requests")
+    ap.add_argument("--n", type=int, default=400)
+    ap.add_argument("--json", action="store_true")
+    args = ap.parse_args()
+
+    rows = run(args.requests, args.n)
+    if args.json:
+        print(json.dumps(rows, indent=2))
+        return
+    print(f"{'format':<28}{'bytes':>10}{'p95':>8}{'enc us':>10}{'dec us':>10}")
+    for r in rows:
+        print(f"{r['format']:<28}{r['bytes_mean']:>10}{r['bytes_p95']:>8}{r['encode_us']:>10}{r['decode_us']:>10}")
+
+
+if __name__ == "__main__":
+    main()
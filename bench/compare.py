@@ -0,0 +1,72 @@
+# bench/compare.py
+"""
+Compare two load-test reports and flag regressions.
+
+    python -m bench.compare                        # two newest reports (same label)
+    python -m bench.compare old.json new.json --threshold 0.10
+
+Exits 1 if p95/p99 latency grew, or throughput dropped, by more than the
+threshold (default 10%).
+"""
+import argparse
+import glob
+import json
+import os
+import sys
+from typing import List, Tuple
+
+from bench.loadgen import RESULTS_DIR
+
+
+def _latest_pair(label: str) -> Tuple[str, str]:
+    files = sorted(glob.glob(os.path.join(RESULTS_DIR, f"*-{label}.json")))
+    if len(files) < 2:
+        raise SystemExit(f"need two reports labelled '{label}' in {RESULTS_DIR}")
+    return files[-2], files[-1]
+
+
+def compare(old: dict, new: dict, threshold: float) -> List[str]:
+    rows = [
+        ("p50 ms", old["latency_ms"]["p50"], new["latency_ms"]["p50"], False, True),
+        ("p95 ms", old["latency_ms"]["p95"], new["latency_ms"]["p95"], True, True),
+        ("p99 ms", old["latency_ms"]["p99"], new["latency_ms"]["p99"], True, True),
+        ("throughput rps", old["throughput_rps"], new["throughput_rps"], True, False),
+    ]
+    regressions = []
+    print(f"{'metric':<16}{old['commit']:>12}{new['commit']:>12}{'change':>10}")
+    for name, a, b, gate, lower_is_better in rows:
+        change = ((b - a) / a) if a else 0.0
+        print(f"{name:<16}{a:>12.2f}{b:>12.2f}{change:>+10.1%}")
+        worse = change > threshold if lower_is_better else change < -threshold
+        if gate and worse:
+            regressions.append(f"{name}: {a:.2f} -> {b:.2f} ({change:+.1%})")
+    calls_a = sum(old.get("provider_calls", {}).values())
+    calls_b = sum(new.get("provider_calls", {}).values())
+    per_a = calls_a / max(1, old["requests"])
+    per_b = calls_b / max(1, new["requests"])
+    print(f"{'calls/request':<16}{per_a:>12.2f}{per_b:>12.2f}")
+    return regressions
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("old", nargs="?")
+    ap.add_argument("new", nargs="?")
+    ap.add_argument("--label", default="plan")
+    ap.add_argument("--threshold", type=float, default=0.10)
+    args = ap.parse_args()
+
+    old_path, new_path = (args.old, args.new) if args.old and args.new else _latest_pair(args.label)
+    with open(old_path, encoding="utf-8") as f:
+        old = json.load(f)
+    with open(new_path, encoding="utf-8") as f:
+        new = json.load(f)
+    regressions = compare(old, new, args.threshold)
+    if regressions:
+        print("REGRESSIONS:\n  " + "\n  ".join(regressions))
+        sys.exit(1)
+    print("no regressions")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+# bench/embed_bench.py
+"""
+Query embeddings/s and latency under concurrency: one encode per query vs
+api.tools.embedder.BatchEmbedder.
+
+    python -m bench.embed_bench --concurrency 128 --queries 2000
+
+Needs sentence-transformers (EMBED_MODEL). Unbatched queries run in the
+default thread pool, as concurrent request handlers calling model.encode()
+would; batched queries go through one BatchEmbedder.
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+from typing import Awaitable, Callable, List
+
+from bench.loadgen import CITIES, INTERESTS, _percentile
+
+_WORDS = ["museum", "market", "old town", "riverside walk", "wine bar", "cathedral", "park",
+          "street food", "gallery", "viewpoint", "bistro", "castle"]
+
+
+def _queries(n: int, seed: int = 7) -> List[str]:
+    r = random.Random(seed)
+    return [f"{r.choice(_WORDS)} {r.choice(INTERESTS)} in {r.choice(CITIES)}" for _ in range(n)]
+
+
+async def _drive(embed: Callable[[str], Awaitable], queries: List[str], concurrency: int) -> dict:
+    latencies: List[float] = []
+    it = iter(queries)
+
+    async def user() -> None:
+        for q in it:
+            t0 = time.perf_counter()
+            await embed(q)
+            latencies.append(time.perf_counter() - t0)
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(user() for _ in range(concurrency)))
+    wall = time.perf_counter() - t0
+    lat = sorted(latencies)
+    return {
+        "embeddings_per_sec": round(len(lat) / wall, 1),
+        "p50_ms": round(_percentile(lat, 50) * 1000, 2),
+        "p99_ms": round(_percentile(lat, 99) * 1000, 2),
+    }
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--concurrency", type=int, default=128)
+    ap.add_argument("--queries", type=int, default=2000)
+    ap.add_argument("--batch", type=int, default=None, help="EMBED_BATCH_MAX override")
+    ap.add_argument("--window-ms", type=float, default=None, help="EMBED_BATCH_WINDOW_MS override")
+    args = ap.parse_args()
+
+    from sentence_transformers import SentenceTransformer
+
+    from api.config import settings
+    from api.tools.embedder import BatchEmbedder
+
+    model = SentenceTransformer(settings.EMBED_MODEL)
+    queries = _queries(args.queries)
+    model.encode(queries[:64])  # warm up
+
+    async def unbatched(q: str):
+        return await asyncio.to_thread(model.encode, q)
+
+    emb = BatchEmbedder(model, args.batch, args.window_ms)
+    rows = {
+        "unbatched": asyncio.run(_drive(unbatched, queries, args.concurrency)),
+        "batched": asyncio.run(_drive(emb.aembed, queries, args.concurrency)),
+    }
+    rows["batched"]["avg_batch"] = emb.stats()["avg_batch"]
+    emb.close()
+    print(json.dumps({"model": settings.EMBED_MODEL, "concurrency": args.concurrency, **rows}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,225 @@
+# bench/loadgen.py
+"""
+Generate and replay /plan traffic, then write a latency/throughput report.
+
+    # 1. synthetic traffic in requests.jsonl style (one PlanRequest per line)
+    python -m bench.loadgen generate bench/requests.jsonl --n 2000
+
+    # 2. provider stand-ins in another shell
+    python -m bench.stubs --port 9100
+
+    # 3. replay at 20 RPS for 60 s against an in-process backend.main:app
+    python -m bench.loadgen run bench/requests.jsonl --rps 20 --duration 60 --stubs http://127.0.0.1:9100
+
+Use --url http://host:8000 to load a separately started server instead (start
+it with the environment printed by `python -m bench.loadgen env URL`).
+Reports go to bench/results/ and can be diffed with bench/compare.py.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+from datetime import date, timedelta
+from typing import List, Optional
+
+import httpx
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+
+CITIES = ["Paris", "Lyon", "Nice", "Marseille", "Bordeaux"]
+ORIGINS = ["CDG", "ORY", "LHR", "FRA", "AMS", "MAD", "BCN", "FCO"]
+INTERESTS = ["food", "art", "history", "nightlife", "nature"]
+
+
+# --------------------------
+# Traffic generation
+# --------------------------
+def _zipf_choice(r: random.Random, items: List[str], s: float = 1.1) -> str:
+    """Skewed pick: real traffic concentrates on a few cities and airports."""
+    weights = [1.0 / (i + 1) ** s for i in range(len(items))]
+    return r.choices(items, weights=weights, k=1)[0]
+
+
+def generate(path: str, n: int, seed: int = 7) -> None:
+    r = random.Random(seed)
+    today = date.today()
+    with open(path, "w", encoding="utf-8") as f:
+        for _ in range(n):
+            k = r.choices([1, 2, 3, 4], weights=[5, 3, 1.5, 0.5], k=1)[0]
+            cities: List[str] = []
+            while len(cities) < k:
+                c = _zipf_choice(r, CITIES)
+                if c not in cities:
+                    cities.append(c)
+            start = today + timedelta(days=r.choice([3, 7, 10, 14, 30, 60, 120]))
+            nights = r.choice([2, 3, 4, 5, 7, 10, 14, 21])
+            payload = {
+                "origin": _zipf_choice(r, ORIGINS),
+                "cities": cities,
+                "start_date": start.isoformat(),
+                "end_date": (start + timedelta(days=nights)).isoformat(),
+                "budget_eur": r.choice([600, 900, 1200, 2000, 3500]),
+                "party_size": r.choice([1, 1, 2, 2, 2, 3, 4]),
+                "pace": r.choice(["slow", "medium", "fast"]),
+                "interests": r.sample(INTERESTS, r.randint(1, 3)),
+            }
+            f.write(json.dumps(payload) + "\n")
+    print(f"[loadgen] wrote {n} requests to {path}")
+
+
+def _load(path: str) -> List[dict]:
+    with open(path, "r", encoding="utf-8") as f:
+        rows = [json.loads(line) for line in f if line.strip()]
+    # Accept capture-log lines ({"request": {...}, ...}) as well as bare payloads
+    return [row.get("request", row) for row in rows]
+
+
+# --------------------------
+# Replay
+# --------------------------
+def _percentile(sorted_vals: List[float], pct: float) -> float:
+    if not sorted_vals:
+        return 0.0
+    k = min(len(sorted_vals) - 1, max(0, int(round(pct / 100.0 * (len(sorted_vals) - 1)))))
+    return sorted_vals[k]
+
+
+async def _replay(client: httpx.AsyncClient, payloads: List[dict], rps: float, duration: float) -> dict:
+    latencies: List[float] = []
+    statuses: dict = {}
+    tasks = []
+
+    async def one(payload: dict) -> None:
+        t0 = time.perf_counter()
+        try:
+            resp = await client.post("/plan", json=payload)
+            key = str(resp.status_code)
+        except Exception as e:
+            key = type(e).__name__
+        latencies.append(time.perf_counter() - t0)
+        statuses[key] = statuses.get(key, 0) + 1
+
+    # Open loop: send on a fixed schedule whether or not earlier requests
+    # finished, so a slow server shows up as latency, not as a lower send rate.
+    total = int(rps * duration)
+    t_start = time.perf_counter()
+    for i in range(total):
+        due = t_start + i / rps
+        delay = due - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        tasks.append(asyncio.create_task(one(payloads[i % len(payloads)])))
+    await asyncio.gather(*tasks)
+    wall = time.perf_counter() - t_start
+
+    lat = sorted(latencies)
+    ok = statuses.get("200", 0)
+    return {
+        "requests": total,
+        "ok": ok,
+        "statuses": statuses,
+        "wall_sec": round(wall, 3),
+        "throughput_rps": round(ok / wall, 2) if wall else 0.0,
+        "latency_ms": {
+            "p50": round(_percentile(lat, 50) * 1000, 2),
+            "p95": round(_percentile(lat, 95) * 1000, 2),
+            "p99": round(_percentile(lat, 99) * 1000, 2),
+            "max": round((lat[-1] if lat else 0.0) * 1000, 2),
+        },
+    }
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True).strip()
+    except Exception:
+        return "unknown"
+
+
+async def _provider_calls(stubs: Optional[str], reset: bool = False) -> dict:
+    if not stubs:
+        return {}
+    async with httpx.AsyncClient(base_url=stubs, timeout=5.0) as c:
+        if reset:
+            await c.post("/__reset")
+            return {}
+        return (await c.get("/__stats")).json()
+
+
+async def run(path: str, rps: float, duration: float, url: Optional[str], stubs: Optional[str], label: str) -> str:
+    payloads = _load(path)
+    if not payloads:
+        raise SystemExit(f"no requests in {path}")
+    await _provider_calls(stubs, reset=True)
+
+    if url:
+        async with httpx.AsyncClient(base_url=url, timeout=60.0) as client:
+            result = await _replay(client, payloads, rps, duration)
+    else:
+        if stubs:
+            from bench.stubs import stub_env
+            os.environ.update(stub_env(stubs))
+        from backend.main import app  # imported late so the env above applies
+
+        transport = httpx.ASGITransport(app=app)
+        async with app.router.lifespan_context(app):
+            async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60.0) as client:
+                result = await _replay(client, payloads, rps, duration)
+
+    report = {
+        "label": label,
+        "commit": _git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "target": url or "asgi:backend.main:app",
+        "rps_target": rps,
+        "duration_sec": duration,
+        "requests_file": path,
+        **result,
+        "provider_calls": await _provider_calls(stubs),
+    }
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    out = os.path.join(RESULTS_DIR, f"{time.strftime('%Y%m%d-%H%M%S')}-{report['commit']}-{label}.json")
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(json.dumps({k: report[k] for k in ("throughput_rps", "latency_ms", "statuses", "provider_calls")}, indent=2))
+    print(f"[loadgen] report: {out}")
+    return out
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = ap.add_subparsers(dest="cmd", required=True)
+
+    g = sub.add_parser("generate", help="Write synthetic PlanRequest lines")
+    g.add_argument("path")
+    g.add_argument("--n", type=int, default=1000)
+    g.add_argument("--seed", type=int, default=7)
+
+    r = sub.add_parser("run", help="Replay a requests file and write a report")
+    r.add_argument("path")
+    r.add_argument("--rps", type=float, default=10.0)
+    r.add_argument("--duration", type=float, default=30.0)
+    r.add_argument("--url", help="Target a running server instead of the in-process app")
+    r.add_argument("--stubs", help="Base URL of bench.stubs (provider calls are counted there)")
+    r.add_argument("--label", default="plan")
+
+    e = sub.add_parser("env", help="Print the env that points the backend at a stub server")
+    e.add_argument("stubs")
+
+    args = ap.parse_args()
+    if args.cmd == "generate":
+        generate(args.path, args.n, args.seed)
+    elif args.cmd == "run":
+        asyncio.run(run(args.path, args.rps, args.duration, args.url, args.stubs, args.label))
+    else:
+        from bench.stubs import stub_env
+        for k, v in stub_env(args.stubs).items():
+            sys.stdout.write(f"export {k}={v}\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+# bench/scaling.py
+"""
+Throughput and memory per worker for `python -m backend.serve`, 1..N workers.
+
+    python -m bench.stubs --port 9100                                    # shell 1
+    python -m bench.scaling bench/requests.jsonl --workers 1,2,4 --stubs http://127.0.0.1:9100
+
+For each worker count a fresh server is started on --port with the stub
+environment, warmed up, and then driven closed-loop (--concurrency requests
+in flight, for --duration seconds), so throughput is what the server can do
+rather than a fixed send rate. After the run, memory is read per worker from
+/proc/<pid>/smaps_rollup: RSS counts shared pages in full, PSS divides them
+among the processes sharing them, so PSS per worker is the real cost of one
+more worker. Linux only. The report lands in bench/results/.
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+from typing import Dict, List, Optional
+
+import httpx
+
+from bench.loadgen import RESULTS_DIR, _git_commit, _load, _percentile
+
+
+def _children(pid: int) -> List[int]:
+    try:
+        with open(f"/proc/{pid}/task/{pid}/children", "r") as f:
+            return [int(p) for p in f.read().split()]
+    except OSError:
+        return []
+
+
+def _memory_kb(pid: int) -> Dict[str, int]:
+    out: Dict[str, int] = {}
+    try:
+        with open(f"/proc/{pid}/smaps_rollup", "r") as f:
+            for line in f:
+                key, _, rest = line.partition(":")
+                if key in ("Rss", "Pss", "Shared_Clean", "Shared_Dirty", "Private_Clean", "Private_Dirty"):
+                    out[key.lower()] = int(rest.split()[0])
+    except OSError:
+        pass
+    return out
+
+
+async def _closed_loop(url: str, payloads: List[dict], concurrency: int, duration: float) -> dict:
+    latencies: List[float] = []
+    statuses: Dict[str, int] = {}
+    stop = time.perf_counter() + duration
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=url, timeout=60.0, limits=limits) as client:
+        async def user(k: int) -> None:
+            i = k
+            while time.perf_counter() < stop:
+                t0 = time.perf_counter()
+                try:
+                    resp = await client.post("/plan", json=payloads[i % len(payloads)])
+                    key = str(resp.status_code)
+                except Exception as e:
+                    key = type(e).__name__
+                latencies.append(time.perf_counter() - t0)
+                statuses[key] = statuses.get(key, 0) + 1
+                i += concurrency
+
+        t0 = time.perf_counter()
+        await asyncio.gather(*(user(k) for k in range(concurrency)))
+        wall = time.perf_counter() - t0
+
+    lat = sorted(latencies)
+    return {
+        "requests": len(lat),
+        "statuses": statuses,
+        "wall_sec": round(wall, 3),
+        "throughput_rps": round(statuses.get("200", 0) / wall, 2) if wall else 0.0,
+        "latency_ms": {p: round(_percentile(lat, q) * 1000, 2) for p, q in (("p50", 50), ("p95", 95), ("p99", 99))},
+    }
+
+
+def _wait_healthy(url: str, proc: subprocess.Popen, timeout: float = 60.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise SystemExit(f"server exited with {proc.returncode}")
+        try:
+            if httpx.get(url + "/health", timeout=1.0).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.25)
+    raise SystemExit("server did not become healthy")
+
+
+def measure(workers: int, payloads: List[dict], port: int, concurrency: int, duration: float,
+            warmup: float, env: Dict[str, str]) -> dict:
+    url = f"http://127.0.0.1:{port}"
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "backend.serve", "--port", str(port), "--workers", str(workers), "--log-level", "warning"],
+        env={**os.environ, **env},
+    )
+    try:
+        _wait_healthy(url, proc)
+        idle = {pid: _memory_kb(pid) for pid in _children(proc.pid)}
+        if warmup:
+            asyncio.run(_closed_loop(url, payloads, concurrency, warmup))
+        result = asyncio.run(_closed_loop(url, payloads, concurrency, duration))
+        loaded = {pid: _memory_kb(pid) for pid in _children(proc.pid)}
+        master = _memory_kb(proc.pid)
+    finally:
+        proc.terminate()
+        try:
+            proc.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+
+    def avg(snap: Dict[int, Dict[str, int]], key: str) -> Optional[int]:
+        vals = [m[key] for m in snap.values() if key in m]
+        return int(sum(vals) / len(vals)) if vals else None
+
+    result.update(
+        workers=workers,
+        master_kb=master or None,
+        worker_rss_kb={"idle": avg(idle, "rss"), "loaded": avg(loaded, "rss")},
+        worker_pss_kb={"idle": avg(idle, "pss"), "loaded": avg(loaded, "pss")},
+        per_worker=list(loaded.values()),
+    )
+    return result
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("path", help="PlanRequest JSONL (python -m bench.loadgen generate)")
+    ap.add_argument("--workers", default=f"1,{os.cpu_count() or 1}", help="comma-separated worker counts")
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--concurrency", type=int, default=32)
+    ap.add_argument("--duration", type=float, default=30.0)
+    ap.add_argument("--warmup", type=float, default=5.0)
+    ap.add_argument("--stubs", help="Base URL of bench.stubs; providers are pointed at it")
+    args = ap.parse_args()
+
+    env: Dict[str, str] = {"PREFETCH_ENABLED": "0"}
+    if args.stubs:
+        from bench.stubs import stub_env
+        env.update(stub_env(args.stubs))
+
+    payloads = _load(args.path)
+    runs = []
+    for w in sorted({int(x) for x in args.workers.split(",") if x.strip()}):
+        r = measure(w, payloads, args.port, args.concurrency, args.duration, args.warmup, env)
+        runs.append(r)
+        print(f"workers={w:<3} rps={r['throughput_rps']:<8} p50={r['latency_ms']['p50']}ms "
+              f"p99={r['latency_ms']['p99']}ms rss/worker={r['worker_rss_kb']['loaded']} kB "
+              f"pss/worker={r['worker_pss_kb']['loaded']} kB")
+
+    base = runs[0]["throughput_rps"] if runs and runs[0]["throughput_rps"] else None
+    for r in runs:
+        r["speedup"] = round(r["throughput_rps"] / base, 2) if base else None
+
+    report = {
+        "kind": "scaling",
+        "commit": _git_commit(),
+        "cpus": os.cpu_count(),
+        "concurrency": args.concurrency,
+        "duration_sec": args.duration,
+        "runs": runs,
+    }
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    out = os.path.join(RESULTS_DIR, f"{time.strftime('%Y%m%d-%H%M%S')}-{report['commit']}-scaling.json")
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"report: {out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,303 @@
+# bench/stubs.py
+"""
+Local stand-ins for the upstream providers, for benchmarks and load tests.
+
+One FastAPI app imitates the endpoints our tools call on Open-Meteo,
+OpenWeather, Skyscanner (RapidAPI), Google Places/Directions and Amadeus.
+Per provider you can inject latency, slow outliers, 5xx errors and 429s.
+Responses are deterministic for a given query so runs are comparable.
+
+    python -m bench.stubs --port 9100 --set skyscanner.latency_ms=400 --set skyscanner.rate_429=0.05
+
+Control endpoints:
+    GET  /__stats    call counts per provider and status
+    POST /__reset    zero the counters
+    GET  /__config   current fault profiles
+    POST /__config   {"skyscanner": {"latency_ms": 50}} (partial updates)
+"""
+import argparse
+import asyncio
+import hashlib
+import random
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from typing import Dict
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+
+class FaultProfile(BaseModel):
+    latency_ms: float = 40.0   # base latency
+    jitter_ms: float = 20.0    # + uniform(0, jitter)
+    slow_rate: float = 0.0     # probability of a slow outlier
+    slow_ms: float = 2000.0    # extra latency for outliers
+    error_rate: float = 0.0    # probability of a 500
+    rate_429: float = 0.0      # probability of a 429
+    itineraries: int = 50      # Skyscanner/Amadeus result list length (payload size)
+
+
+PROVIDERS = ("openmeteo", "openweather", "skyscanner", "google", "amadeus")
+
+PROFILES: Dict[str, FaultProfile] = {p: FaultProfile() for p in PROVIDERS}
+STATS: Counter = Counter()
+
+app = FastAPI(title="Provider stand-ins")
+
+
+def _provider_of(path: str) -> str:
+    if path.startswith("/v1/forecast"):
+        return "openmeteo"
+    if path.startswith("/data/"):
+        return "openweather"
+    if path.startswith("/api/v1/flights"):
+        return "skyscanner"
+    if path.startswith("/maps/"):
+        return "google"
+    if path.startswith(("/v1/security", "/v2/shopping")):
+        return "amadeus"
+    return ""
+
+
+def _rng(request: Request) -> random.Random:
+    """Deterministic per query string, so identical requests get identical payloads."""
+    seed = hashlib.sha1(f"{request.url.path}?{request.url.query}".encode()).hexdigest()
+    return random.Random(seed)
+
+
+@app.middleware("http")
+async def inject_faults(request: Request, call_next):
+    provider = _provider_of(request.url.path)
+    if not provider:
+        return await call_next(request)
+    prof = PROFILES[provider]
+    delay = prof.latency_ms + random.uniform(0, prof.jitter_ms)
+    if random.random() < prof.slow_rate:
+        delay += prof.slow_ms
+    await asyncio.sleep(delay / 1000.0)
+    roll = random.random()
+    if roll < prof.rate_429:
+        STATS[f"{provider}:429"] += 1
+        return JSONResponse({"message": "Too many requests"}, status_code=429, headers={"Retry-After": "1"})
+    if roll < prof.rate_429 + prof.error_rate:
+        STATS[f"{provider}:500"] += 1
+        return JSONResponse({"message": "Injected upstream error"}, status_code=500)
+    STATS[f"{provider}:200"] += 1
+    return await call_next(request)
+
+
+# --------------------------
+# Control
+# --------------------------
+@app.get("/__stats")
+def stats():
+    return dict(STATS)
+
+
+@app.post("/__reset")
+def reset():
+    STATS.clear()
+    return {"ok": True}
+
+
+@app.get("/__config")
+def get_config():
+    return {p: prof.model_dump() for p, prof in PROFILES.items()}
+
+
+@app.post("/__config")
+def set_config(update: Dict[str, dict]):
+    for provider, fields in update.items():
+        if provider in PROFILES:
+            PROFILES[provider] = PROFILES[provider].model_copy(update=fields)
+    return get_config()
+
+
+# --------------------------
+# Open-Meteo
+# --------------------------
+@app.get("/v1/forecast")
+def open_meteo(request: Request, start_date: str = "", end_date: str = ""):
+    r = _rng(request)
+    day = start_date or datetime.now(timezone.utc).date().isoformat()
+    high = round(r.uniform(8, 30), 1)
+    return {
+        "daily": {
+            "time": [day],
+            "weathercode": [r.choice([0, 1, 2, 3, 61, 80])],
+            "temperature_2m_max": [high],
+            "temperature_2m_min": [round(high - r.uniform(5, 11), 1)],
+            "precipitation_probability_max": [r.randint(0, 90)],
+        }
+    }
+
+
+# --------------------------
+# OpenWeather
+# --------------------------
+def _ow_label(r: random.Random) -> str:
+    return r.choice(["Clear", "Clouds", "Rain", "Drizzle"])
+
+
+@app.get("/data/3.0/onecall")
+def openweather_onecall(request: Request):
+    r = _rng(request)
+    now = datetime.now(timezone.utc).replace(hour=12, minute=0, second=0, microsecond=0)
+    daily = []
+    for i in range(8):
+        hi = r.uniform(8, 30)
+        daily.append({
+            "dt": int((now + timedelta(days=i)).timestamp()),
+            "temp": {"max": round(hi, 1), "min": round(hi - r.uniform(5, 11), 1)},
+            "weather": [{"main": _ow_label(r)}],
+            "pop": round(r.random(), 2),
+        })
+    return {"daily": daily}
+
+
+@app.get("/data/2.5/forecast")
+def openweather_25(request: Request):
+    r = _rng(request)
+    now = datetime.now(timezone.utc).replace(minute=0, second=0, microsecond=0)
+    blocks = []
+    for i in range(40):
+        t = r.uniform(5, 28)
+        blocks.append({
+            "dt": int((now + timedelta(hours=3 * i)).timestamp()),
+            "main": {"temp": round(t, 1), "temp_max": round(t + 1, 1), "temp_min": round(t - 1, 1)},
+            "weather": [{"main": _ow_label(r)}],
+            "pop": round(r.random(), 2),
+        })
+    return {"list": blocks}
+
+
+# --------------------------
+# Skyscanner (RapidAPI)
+# --------------------------
+_CARRIERS = ["Air France", "easyJet", "Transavia", "Vueling", "Lufthansa", "KLM"]
+
+
+@app.get("/api/v1/flights/search-one-way")
+def skyscanner(request: Request, fromId: str = "", toId: str = ""):
+    r = _rng(request)
+    n = PROFILES["skyscanner"].itineraries
+    prices = sorted(round(r.uniform(45, 420), 2) for _ in range(n))
+    itineraries = []
+    for i, price in enumerate(prices):
+        carrier = r.choice(_CARRIERS)
+        itineraries.append({
+            "id": f"{fromId}-{toId}-{i}",
+            "price": {"raw": price, "amount": price, "formatted": f"€{price:.0f}"},
+            "legs": [{
+                "origin": {"id": fromId},
+                "destination": {"id": toId},
+                "durationInMinutes": r.randint(55, 240),
+                "stopCount": r.choice([0, 0, 1]),
+                "carriers": {"marketing": [{"name": carrier}]},
+            }],
+            "deeplink": f"https://www.skyscanner.net/transport/flights/{fromId}/{toId}/?i={i}",
+        })
+    return {"status": True, "data": {"itineraries": itineraries}}
+
+
+# --------------------------
+# Google Places / Directions
+# --------------------------
+@app.get("/maps/api/place/textsearch/json")
+def places_textsearch(request: Request, query: str = ""):
+    r = _rng(request)
+    results = []
+    for i in range(20):
+        results.append({
+            "place_id": f"stub-{i}",
+            "name": f"Hotel {i + 1} ({query[:30]})",
+            "rating": round(r.uniform(3.2, 4.9), 1),
+            "user_ratings_total": r.randint(10, 5000),
+            "price_level": r.randint(1, 4),
+            "geometry": {"location": {"lat": 46.0 + r.uniform(-2, 2), "lng": 3.0 + r.uniform(-3, 3)}},
+        })
+    return {"status": "OK", "results": results}
+
+
+@app.get("/maps/api/directions/json")
+def directions(request: Request):
+    r = _rng(request)
+    return {"status": "OK", "routes": [{"legs": [{"duration": {"value": r.randint(300, 5400)}}]}]}
+
+
+# --------------------------
+# Amadeus
+# --------------------------
+@app.post("/v1/security/oauth2/token")
+def amadeus_token():
+    return {"type": "amadeusOAuth2Token", "access_token": "bench-token", "token_type": "Bearer", "expires_in": 1799}
+
+
+@app.get("/v2/shopping/flight-offers")
+def amadeus_offers(request: Request):
+    r = _rng(request)
+    n = PROFILES["amadeus"].itineraries
+    data = []
+    for i in range(n):
+        total = round(r.uniform(45, 420), 2)
+        data.append({
+            "type": "flight-offer",
+            "id": str(i + 1),
+            "itineraries": [{"duration": f"PT{r.randint(1, 4)}H{r.randint(0, 59)}M", "segments": []}],
+            "price": {"currency": "EUR", "total": f"{total:.2f}", "grandTotal": f"{total:.2f}"},
+            "validatingAirlineCodes": [r.choice(["AF", "U2", "TO", "VY"])],
+        })
+    return {"meta": {"count": n}, "data": data}
+
+
+def stub_env(base_url: str) -> Dict[str, str]:
+    """Environment that points backend tools at a running stub server."""
+    return {
+        "OPEN_METEO_BASE": f"{base_url}/v1/forecast",
+        "OPENWEATHER_BASE": base_url,
+        "GOOGLE_MAPS_BASE": base_url,
+        "FLIGHTS_SKY_BASE_URL": base_url,
+        "AMADEUS_BASE_URL": base_url,
+        "OPENWEATHER_API_KEY": "bench",
+        "GOOGLE_MAPS_API_KEY": "bench",
+        "RAPIDAPI_KEY": "bench",
+        "AMADEUS_CLIENT_ID": "bench",
+        "AMADEUS_CLIENT_SECRET": "bench",
+    }
+
+
+def _apply_overrides(items) -> None:
+    for item in items or []:
+        key, _, value = item.partition("=")
+        provider, _, field = key.partition(".")
+        if provider not in PROFILES or field not in FaultProfile.model_fields:
+            raise SystemExit(f"unknown override: {item}")
+        PROFILES[provider] = PROFILES[provider].model_copy(update={field: type(getattr(PROFILES[provider], field))(value)})
+
+
+def main() -> None:
+    import uvicorn
+
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=9100)
+    ap.add_argument("--latency-ms", type=float, help="Base latency for every provider")
+    ap.add_argument("--error-rate", type=float, help="5xx probability for every provider")
+    ap.add_argument("--rate-429", type=float, help="429 probability for every provider")
+    ap.add_argument("--set", action="append", metavar="PROVIDER.FIELD=VALUE", help="Per-provider override")
+    args = ap.parse_args()
+
+    common = {k: v for k, v in {
+        "latency_ms": args.latency_ms, "error_rate": args.error_rate, "rate_429": args.rate_429,
+    }.items() if v is not None}
+    for p in PROVIDERS:
+        PROFILES[p] = PROFILES[p].model_copy(update=common)
+    _apply_overrides(args.set)
+
+    print(f"[stubs] serving on http://{args.host}:{args.port}")
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+# bench/vector_bench.py
+"""
+Recall@k, memory and query latency of the quantized POI indexes
+(backend.tools.vectors) against exact float32 search.
+
+    python -m bench.vector_bench                       # catalog embeddings, if built
+    python -m bench.vector_bench --synthetic 50000 --dim 384
+
+Without --synthetic it reads embeddings.npy from the POI dataset
+(python -m backend.datasets build --embeddings). Synthetic vectors are
+clustered unit vectors, closer to sentence embeddings than uniform noise.
+Queries are perturbed copies of stored vectors; ground truth is the exact
+float32 top-k. "ram_bytes_per_vector" counts what each index keeps resident
+(codes + tables); the float32 rows for re-ranking are only memory-mapped.
+"""
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import time
+from typing import List
+
+import numpy as np
+
+from backend.config import settings
+from backend.tools import vectors
+from bench.loadgen import _percentile
+
+
+def _synthetic(n: int, dim: int, clusters: int = 200, seed: int = 3) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    centres = rng.standard_normal((clusters, dim)).astype(np.float32)
+    x = centres[rng.integers(0, clusters, n)] + 0.6 * rng.standard_normal((n, dim)).astype(np.float32)
+    return x / np.linalg.norm(x, axis=1, keepdims=True)
+
+
+def _queries(base: np.ndarray, n: int, seed: int = 5) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    q = np.asarray(base[rng.choice(len(base), n, replace=False)], np.float32)
+    q = q + 0.3 * rng.standard_normal(q.shape).astype(np.float32) / np.sqrt(q.shape[1])
+    return q / np.linalg.norm(q, axis=1, keepdims=True)
+
+
+def _run(idx, queries: np.ndarray, truth: List[set], k: int, oversample: int) -> dict:
+    lat, hits = [], 0
+    for q, exact in zip(queries, truth):
+        t0 = time.perf_counter()
+        rows, _ = idx.search(q, k, oversample=oversample)
+        lat.append(time.perf_counter() - t0)
+        hits += len(exact & set(rows.tolist()))
+    lat.sort()
+    n = len(idx.vectors)
+    return {
+        f"recall@{k}": round(hits / (k * len(queries)), 4),
+        "ram_bytes_per_vector": round((idx.code_bytes or idx.vectors.nbytes) / n, 1),
+        "p50_ms": round(_percentile(lat, 50) * 1000, 2),
+        "p99_ms": round(_percentile(lat, 99) * 1000, 2),
+    }
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--path", default=os.path.join(settings.DATASETS_DIR, "pois"))
+    ap.add_argument("--synthetic", type=int, default=0, help="use N synthetic vectors instead of --path")
+    ap.add_argument("--dim", type=int, default=384)
+    ap.add_argument("--queries", type=int, default=200)
+    ap.add_argument("-k", type=int, default=10)
+    ap.add_argument("--oversample", type=int, default=settings.VECTOR_RERANK_OVERSAMPLE)
+    ap.add_argument("--m", type=int, default=settings.VECTOR_PQ_SUBSPACES, help="PQ subspaces")
+    args = ap.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="vector-bench-")
+    try:
+        if args.synthetic:
+            np.save(os.path.join(tmp, "embeddings.npy"), _synthetic(args.synthetic, args.dim))
+        else:
+            shutil.copy(os.path.join(args.path, "embeddings.npy"), tmp)
+        base = vectors.open_index(tmp, "float32")
+        queries = _queries(base.vectors, min(args.queries, len(base.vectors)))
+        truth = [set(base.search(q, args.k)[0].tolist()) for q in queries]
+
+        report = {"vectors": len(base.vectors), "dim": base.vectors.shape[1], "oversample": args.oversample}
+        for kind in vectors.KINDS:
+            t0 = time.perf_counter()
+            vectors.build(tmp, kind, args.m)
+            build_sec = time.perf_counter() - t0
+            report[kind] = _run(vectors.open_index(tmp, kind), queries, truth, args.k, args.oversample)
+            report[kind]["build_sec"] = round(build_sec, 2)
+        print(json.dumps(report, indent=2))
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
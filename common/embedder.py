@@ -0,0 +1,114 @@
+"""
+Micro-batching embedding executor, shared by the api and backend packages.
+
+    emb = BatchEmbedder(model)            # a SentenceTransformer
+    vec = emb.embed("museums in Lyon")    # blocking
+    vec = await emb.aembed("museums in Lyon")
+
+Callers put texts on a queue and get a future back. A single dedicated
+thread takes the first waiting text, keeps collecting until EMBED_BATCH_MAX
+texts or EMBED_BATCH_WINDOW_MS have passed, and runs one model.encode() for
+the whole batch (duplicate texts are encoded once). Each package passes its
+own EMBED_BATCH_MAX / EMBED_BATCH_WINDOW_MS / EMBED_THREADS settings. Torch on CPU is far more
+efficient on one batch of 32 than on 32 concurrent single-sentence forward
+passes, which also fight over the same cores; the intra-op thread count is
+pinned with EMBED_THREADS so the batch gets a predictable share of the CPU.
+
+At low load a lone query waits at most the window (a few ms) before it runs.
+"""
+import asyncio
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import List, Tuple
+
+_STOP = object()
+
+
+class BatchEmbedder:
+    def __init__(self, model, max_batch: int = 32, window_ms: float = 5.0, threads: int = 0):
+        """`threads` = 0 leaves torch's intra-op thread count alone."""
+        self.model = model
+        self.max_batch = max_batch
+        self.window = window_ms / 1000.0
+        self.threads = threads
+        self._q: "queue.SimpleQueue[Tuple[str, Future, float]]" = queue.SimpleQueue()
+        self._stats = {"batches": 0, "texts": 0, "encoded": 0, "wait_sec": 0.0, "encode_sec": 0.0}
+        self._thread = threading.Thread(target=self._run, name="embedder", daemon=True)
+        self._thread.start()
+
+    # --------------------------
+    # Callers
+    # --------------------------
+    def submit(self, text: str) -> Future:
+        fut: Future = Future()
+        self._q.put((text, fut, time.perf_counter()))
+        return fut
+
+    def embed(self, text: str) -> List[float]:
+        return self.submit(text).result().tolist()
+
+    async def aembed(self, text: str) -> List[float]:
+        return (await asyncio.wrap_future(self.submit(text))).tolist()
+
+    def close(self) -> None:
+        self._q.put((_STOP, None, 0.0))
+        self._thread.join(timeout=5.0)
+
+    def stats(self) -> dict:
+        s = dict(self._stats)
+        s["avg_batch"] = round(s["texts"] / s["batches"], 2) if s["batches"] else 0.0
+        return s
+
+    # --------------------------
+    # Batching thread
+    # --------------------------
+    def _collect(self, first: Tuple[str, Future, float]) -> list:
+        batch = [first]
+        deadline = time.perf_counter() + self.window
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                item = self._q.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item[0] is _STOP:
+                self._q.put(item)  # finish this batch first
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self) -> None:
+        if self.threads:
+            try:
+                import torch
+                torch.set_num_threads(self.threads)
+            except ImportError:
+                pass
+        while True:
+            first = self._q.get()
+            if first[0] is _STOP:
+                return
+            batch = [b for b in self._collect(first) if b[1].set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            texts = list(dict.fromkeys(b[0] for b in batch))
+            t0 = time.perf_counter()
+            try:
+                vecs = self.model.encode(texts, batch_size=len(texts), convert_to_numpy=True)
+            except Exception as e:
+                for _, fut, _ in batch:
+                    fut.set_exception(e)
+                continue
+            done = time.perf_counter()
+            row = {t: i for i, t in enumerate(texts)}
+            for text, fut, queued in batch:
+                fut.set_result(vecs[row[text]])
+                self._stats["wait_sec"] += t0 - queued
+            self._stats["batches"] += 1
+            self._stats["texts"] += len(batch)
+            self._stats["encoded"] += len(texts)
+            self._stats["encode_sec"] += done - t0
@@ -0,0 +1,58 @@
+import asyncio
+import time
+
+import pytest
+
+from backend import admission
+
+
+async def _plan(a: admission.Admission, deadline_sec: float, work_sec: float) -> str:
+    async with a.admit(time.monotonic() + deadline_sec) as mode:
+        await asyncio.sleep(work_sec if mode == admission.NORMAL else 0.0)
+        return mode
+
+
+def test_recovers_after_slow_burst():
+    async def run():
+        a = admission.Admission(max_concurrent=4, max_queue=8, degraded_max=16)
+        # Slow providers: plans take longer than the deadline
+        for _ in range(5):
+            await _plan(a, 0.05, 0.1)
+        assert a.service_sec > 0.05
+        # Providers are back: a free slot must still admit, and the average decay
+        modes = [await _plan(a, 0.05, 0.005) for _ in range(20)]
+        assert set(modes) == {admission.NORMAL}
+        assert a.service_sec < 0.05
+
+    asyncio.run(run())
+
+
+def test_queue_then_degraded_then_shed():
+    async def run():
+        a = admission.Admission(max_concurrent=1, max_queue=1, degraded_max=1)
+        a.service_sec = 0.05
+        tasks = [asyncio.create_task(_plan(a, 0.5, 0.05)) for _ in range(2)]
+        await asyncio.sleep(0)
+        # Slot taken, one queued: the next has no queue room and goes degraded...
+        async with a.admit(time.monotonic() + 0.5) as mode:
+            assert mode == admission.DEGRADED
+            # ...and with the degraded cap reached too, it is shed
+            with pytest.raises(admission.Overloaded):
+                async with a.admit(time.monotonic() + 0.5):
+                    pass
+        assert await asyncio.gather(*tasks) == [admission.NORMAL, admission.NORMAL]
+        assert a.stats()["active"] == 0 and a.stats()["queued"] == 0
+
+    asyncio.run(run())
+
+
+def test_queued_request_that_cannot_make_its_deadline_is_degraded():
+    async def run():
+        a = admission.Admission(max_concurrent=1, max_queue=4, degraded_max=4)
+        a.service_sec = 0.2
+        first = asyncio.create_task(_plan(a, 1.0, 0.2))
+        await asyncio.sleep(0)
+        assert await _plan(a, 0.1, 0.0) == admission.DEGRADED
+        assert await first == admission.NORMAL
+
+    asyncio.run(run())
@@ -0,0 +1,68 @@
+import asyncio
+
+import pytest
+
+from backend import deps
+from backend.cache import TTLCache
+
+
+class FakeRedis:
+    def __init__(self):
+        self.data = {}
+
+    async def get(self, key):
+        return self.data.get(key)
+
+    async def setex(self, key, ttl, value):
+        self.data[key] = value
+
+
+@pytest.fixture
+def shared(monkeypatch):
+    r = FakeRedis()
+    monkeypatch.setattr(deps, "aredis", r)
+    return r
+
+
+def test_expired_local_entry_yields_to_a_newer_shared_one(shared):
+    async def run():
+        a, b = TTLCache("t"), TTLCache("t")
+        await a.set("k", "old", ttl=0.05)
+        assert (await b.get_entry("k")).value == "old"   # b now holds it locally
+        await asyncio.sleep(0.1)
+        await a.set("k", "new", ttl=60, source="prefetch")
+        entry = await b.get_entry("k", allow_stale=True)
+        assert entry.value == "new" and entry.fresh and entry.source == "prefetch"
+        assert (await b.get_entry("k")).value == "new"   # and keeps it
+
+    asyncio.run(run())
+
+
+def test_expired_local_entry_is_kept_over_an_older_shared_one(shared):
+    async def run():
+        a, b = TTLCache("t"), TTLCache("t")
+        await b.set("k", "newer", ttl=0.05)
+        await a.set("k", "older", ttl=0.02)   # Redis now holds the entry that expires first
+        await asyncio.sleep(0.06)
+        entry = await b.get_entry("k", allow_stale=True)
+        assert entry.value == "newer" and not entry.fresh
+        assert await b.get_entry("k") is None
+
+    asyncio.run(run())
+
+
+def test_fresh_local_entry_does_not_read_redis(shared, monkeypatch):
+    async def run():
+        c = TTLCache("t")
+        await c.set("k", "v", ttl=60)
+        reads = []
+
+        async def get(key):
+            reads.append(key)
+            return None
+
+        monkeypatch.setattr(shared, "get", get)
+        assert (await c.get_entry("k")).value == "v"
+        assert reads == []
+
+    asyncio.run(run())
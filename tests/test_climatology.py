@@ -0,0 +1,36 @@
+import asyncio
+
+import pytest
+
+from backend.config import settings
+from backend.tools import climatology, providers, weather
+
+
+class FakeTable:
+    names = ["Lyon"]
+
+    def __init__(self, rain: float):
+        self.rain = rain
+
+    def nearest(self, lat, lon):
+        return 0, 1.0
+
+    def day(self, i, d):
+        return 11.5, 4.5, self.rain
+
+
+@pytest.mark.parametrize("provider,rain,expected", [
+    ("openmeteo", 0.6, 61), ("openmeteo", 0.35, 3), ("openmeteo", 0.1, 2),
+    ("openweather", 0.6, "Rain"), ("openweather", 0.35, "Clouds"), ("openweather", 0.1, "Clouds"),
+])
+def test_normals_beyond_the_horizon_use_the_provider_summary_format(monkeypatch, provider, rain, expected):
+    monkeypatch.setattr(climatology, "table", lambda: FakeTable(rain))
+    monkeypatch.setattr(settings, "PROVIDER_WEATHER", provider)
+    w = asyncio.run(providers.weather(45.76, 4.83, "2099-11-14"))
+    assert w["climatology"] and w["summary"] == expected
+
+
+def test_offline_defaults_use_the_provider_summary_format(monkeypatch):
+    monkeypatch.setattr(climatology, "table", lambda: None)
+    assert weather.defaults(45.76, 4.83, "2099-11-14")["summary"] == 0
+    assert weather.defaults(45.76, 4.83, "2099-11-14", "openweather")["summary"] == "Clear"
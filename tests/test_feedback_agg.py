@@ -0,0 +1,73 @@
+import asyncio
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import NullPool
+
+from backend.config import settings
+from backend.db import feedback_agg
+from backend.db.migrations import migrate
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'fb.db'}", poolclass=NullPool)
+    asyncio.run(migrate(engine))
+    monkeypatch.setattr(feedback_agg, "engine", engine)
+    monkeypatch.setattr(feedback_agg, "_scores_cache", None)
+    monkeypatch.setattr(settings, "FEEDBACK_AGG_SETTLE_SEC", 0)
+    yield engine
+    asyncio.run(engine.dispose())
+
+
+async def _stats(engine) -> dict:
+    async with engine.connect() as conn:
+        rows = (await conn.execute(text("SELECT city, activity, n, rating_sum FROM feedback_stats"))).all()
+        last_id = (await conn.execute(
+            text("SELECT last_id FROM job_watermarks WHERE job = :job"), {"job": feedback_agg.JOB}
+        )).scalar()
+    return {"rows": {(r[0], r[1]): (r[2], r[3]) for r in rows}, "last_id": last_id}
+
+
+def test_recorded_ratings_are_folded_per_city_and_activity(db):
+    async def run():
+        assert await feedback_agg.record_feedback(["Lyon", "Nice"], 4.0) == 2
+        assert await feedback_agg.record_feedback(["Lyon"], 5.0, activity="Museum/landmark") == 1
+        assert await feedback_agg.run() == 3
+        return await _stats(db)
+
+    stats = asyncio.run(run())
+    assert stats["last_id"] == 3
+    assert stats["rows"] == {
+        ("Lyon", ""): (2, 9.0),
+        ("Nice", ""): (1, 4.0),
+        ("Lyon", "Museum/landmark"): (1, 5.0),
+    }
+
+
+def test_watermark_advances_and_rows_are_folded_once(db):
+    async def run():
+        await feedback_agg.record_feedback(["Lyon"], 2.0)
+        await feedback_agg.record_feedback(["Lyon"], 4.0)
+        assert await feedback_agg.run_once(chunk=1) == 1
+        first = await _stats(db)
+        assert await feedback_agg.run_once(chunk=1) == 1
+        assert await feedback_agg.run_once(chunk=1) == 0   # caught up; nothing counted twice
+        return first, await _stats(db)
+
+    first, second = asyncio.run(run())
+    assert first["last_id"] == 1 and first["rows"] == {("Lyon", ""): (1, 2.0)}
+    assert second["last_id"] == 2 and second["rows"] == {("Lyon", ""): (2, 6.0)}
+
+
+def test_scores_rank_better_rated_cities_higher(db):
+    async def run():
+        await feedback_agg.record_feedback(["Lyon"] * 5, 5.0)
+        await feedback_agg.record_feedback(["Nice"] * 5, 2.0)
+        await feedback_agg.run()
+        return await feedback_agg.load_scores()
+
+    scores = asyncio.run(run())
+    assert scores.score("Lyon") > scores.global_mean > scores.score("Nice") > 0
+    assert scores.score("Paris") == scores.global_mean
@@ -0,0 +1,30 @@
+import numpy as np
+
+from backend.tools.hours import HoursIndex
+
+
+def _open(hours, day, start, minutes):
+    return bool(HoursIndex.compile([hours]).is_open(None, day, start, minutes)[0])
+
+
+def test_visit_within_a_day():
+    assert _open("Mo-Fr 09:00-18:00", "2026-07-14", 14 * 60, 90)        # Tuesday
+    assert not _open("Mo-Fr 09:00-18:00", "2026-07-14", 17 * 60, 90)
+    assert not _open("Mo-Fr 09:00-18:00", "2026-07-18", 14 * 60, 30)    # Saturday
+
+
+def test_visit_past_midnight():
+    assert _open("24/7", "2026-07-14", 23 * 60 + 30, 60)
+    assert _open("22:00-02:00", "2026-07-14", 23 * 60 + 30, 60)
+    assert not _open("22:00-02:00", "2026-07-14", 23 * 60 + 30, 180)
+    assert _open("Mo-Fr 22:00-02:00", "2026-07-16", 23 * 60 + 30, 60)   # Thursday
+    # Friday night runs into Saturday, which does not open at midnight
+    assert not _open("Mo-Fr 20:00-23:59", "2026-07-17", 23 * 60 + 30, 60)
+    # The next day is a closure date
+    assert not _open("24/7; Jul 15 off", "2026-07-14", 23 * 60 + 30, 60)
+
+
+def test_array_starts_and_unknown_hours():
+    idx = HoursIndex.compile(["22:00-02:00", None, "09:00-18:00"])
+    ok = idx.is_open(None, "2026-07-14", np.array([23 * 60 + 30, 0, 23 * 60 + 30]), 60)
+    assert ok.tolist() == [True, True, False]
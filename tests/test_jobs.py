@@ -0,0 +1,255 @@
+import asyncio
+import time
+from typing import Tuple
+
+import pytest
+
+from backend import jobs
+from backend.config import settings
+
+
+@pytest.fixture(autouse=True)
+def local_broker(monkeypatch):
+    monkeypatch.setattr(jobs, "_broker", jobs.LocalBroker())
+    monkeypatch.setattr(settings, "JOB_MAX_ATTEMPTS", 3)
+    monkeypatch.setattr(settings, "JOB_STAGE_RETRY_DELAY_SEC", 0.0)
+
+
+def _payload(city: str) -> dict:
+    return {"origin": "LHR", "cities": [city], "start_date": "2026-11-01", "end_date": "2026-11-03"}
+
+
+def _flaky_run_plan(monkeypatch, failures: int, exc: Exception = RuntimeError("provider down")) -> list:
+    calls = []
+
+    async def run_plan(job):
+        calls.append(job["attempts"])
+        if len(calls) <= failures:
+            raise exc
+        return {"result": {"summary": "ok"}}
+
+    monkeypatch.setattr(jobs, "run_plan", run_plan)
+    return calls
+
+
+# --------------------------
+# LocalBroker
+# --------------------------
+def test_claims_by_priority_then_age():
+    async def run():
+        for city, prio in (("Lyon", "low"), ("Nice", "normal"), ("Paris", "high"), ("Bordeaux", "normal")):
+            await jobs.submit(_payload(city), prio)
+            time.sleep(0.002)   # scores are in milliseconds
+        claimed = [(await jobs.broker().claim(0.01))["request"]["cities"][0] for _ in range(4)]
+        assert claimed == ["Paris", "Nice", "Bordeaux", "Lyon"]
+        assert await jobs.broker().claim(0.01) is None
+
+    asyncio.run(run())
+
+
+def test_duplicate_of_pending_job_gets_its_id():
+    async def run():
+        first, created = await jobs.submit(_payload("Lyon"))
+        again, created_again = await jobs.submit(_payload("Lyon"), "high")
+        assert created and not created_again
+        assert again["job_id"] == first["job_id"]
+        other, created_other = await jobs.submit(_payload("Nice"))
+        assert created_other and other["job_id"] != first["job_id"]
+
+        # Once the job has finished, the same request is a new job
+        claimed = await jobs.broker().claim(0.01)
+        await jobs._finish(claimed, jobs.DONE, result={})
+        later, created_later = await jobs.submit(_payload("Lyon"))
+        assert created_later and later["job_id"] != first["job_id"]
+
+    asyncio.run(run())
+
+
+# --------------------------
+# execute
+# --------------------------
+def test_execute_retries_until_success(monkeypatch):
+    calls = _flaky_run_plan(monkeypatch, failures=2)
+
+    async def run():
+        job, _ = await jobs.submit(_payload("Lyon"))
+        await jobs.execute(await jobs.broker().claim(0.01))
+        return await jobs.load(job["job_id"])
+
+    done = asyncio.run(run())
+    assert calls == [1, 2, 3]
+    assert done["status"] == jobs.DONE and done["attempts"] == 3
+    assert done["result"] == {"result": {"summary": "ok"}}
+
+
+def test_execute_gives_up_after_max_attempts(monkeypatch):
+    calls = _flaky_run_plan(monkeypatch, failures=10)
+
+    async def run():
+        job, _ = await jobs.submit(_payload("Lyon"))
+        await jobs.execute(await jobs.broker().claim(0.01))
+        return await jobs.load(job["job_id"])
+
+    failed = asyncio.run(run())
+    assert len(calls) == settings.JOB_MAX_ATTEMPTS
+    assert failed["status"] == jobs.FAILED
+    assert failed["error"] == "RuntimeError: provider down"
+
+
+def test_bad_request_is_not_retried(monkeypatch):
+    calls = _flaky_run_plan(monkeypatch, failures=10, exc=jobs.BadRequest("end_date must be after start_date"))
+
+    async def run():
+        job, _ = await jobs.submit(_payload("Lyon"))
+        await jobs.execute(await jobs.broker().claim(0.01))
+        return await jobs.load(job["job_id"])
+
+    failed = asyncio.run(run())
+    assert calls == [1]
+    assert failed["status"] == jobs.FAILED and failed["error"] == "end_date must be after start_date"
+
+
+def test_recovered_job_past_its_attempts_is_failed_without_running(monkeypatch):
+    calls = _flaky_run_plan(monkeypatch, failures=0)
+
+    async def run():
+        job, _ = await jobs.submit(_payload("Lyon"))
+        claimed = await jobs.broker().claim(0.01)
+        claimed["attempts"] = settings.JOB_MAX_ATTEMPTS
+        await jobs.execute(claimed)
+        return await jobs.load(job["job_id"])
+
+    failed = asyncio.run(run())
+    assert calls == []
+    assert failed["status"] == jobs.FAILED and failed["error"] == "worker lost"
+
+
+def test_watch_follows_the_job_to_the_end(monkeypatch):
+    _flaky_run_plan(monkeypatch, failures=1)
+
+    async def run():
+        job, _ = await jobs.submit(_payload("Lyon"))
+        seen = []
+
+        async def follow():
+            async for event in jobs.watch(job["job_id"], keepalive_sec=1.0):
+                if event is not None:
+                    seen.append(event["status"])
+
+        watcher = asyncio.create_task(follow())
+        await asyncio.sleep(0)
+        await jobs.execute(await jobs.broker().claim(0.01))
+        await asyncio.wait_for(watcher, 2.0)
+        return seen
+
+    assert asyncio.run(run()) == [jobs.QUEUED, jobs.RUNNING, jobs.RUNNING, jobs.DONE]
+
+
+# --------------------------
+# Stage retries
+# --------------------------
+def _state() -> dict:
+    return {
+        "day_cities": ["Lyon", "Lyon"],
+        "flight": {"key": ["LHR", "LYS", "2026-11-01"], "quote": {"price_eur": 0.0},
+                   "citations": ["skyscanner-fallback:ConnectTimeout:timeout"], "retryable": True},
+        "days": [
+            {"date": "2026-11-01", "city": "Lyon", "weather": {"fallback": True, "transient": True},
+             "hotel": {"provider": "google"}},
+            {"date": "2026-11-02", "city": "Lyon", "weather": {},
+             "hotel": {"provider": "google-places(error-fallback)", "transient": True}},
+        ],
+        "alternatives": [],
+    }
+
+
+def test_failed_stages_lists_fallen_back_lookups():
+    assert jobs.failed_stages(_state()) == ["flight", "weather:2026-11-01", "hotel:2026-11-02"]
+    clean = _state()
+    clean["flight"]["citations"] = ["https://www.skyscanner.net/"]
+    clean["days"][0]["weather"] = {}
+    clean["days"][1]["hotel"] = {"provider": "google"}
+    assert jobs.failed_stages(clean) == []
+
+
+def test_failed_stages_skips_fallbacks_that_would_recur():
+    state = _state()
+    state["flight"].update(citations=["skyscanner-fallback:RuntimeError:RAPIDAPI_KEY missing"], retryable=False)
+    state["days"][0]["weather"]["transient"] = False
+    state["days"][1]["hotel"] = {"provider": "google-places(fallback)"}
+    assert jobs.failed_stages(state) == []
+
+
+def _plan_offline(monkeypatch, flight_eur) -> list:
+    """Run jobs.run_plan against the real planner with skyscanner and google selected and no keys."""
+    from backend import plan_store
+    from backend.agents import planner
+    from backend.tools import providers, registry
+
+    async def weather(lat, lon, date):
+        return {"summary": 0, "high_c": 18.0, "low_c": 10.0, "rain_risk": 0.2}
+
+    async def save(state, result):
+        return "plan-1"
+
+    builds = []
+    build_plan = planner.build_plan
+
+    async def counting_build_plan(*args, **kwargs):
+        builds.append(kwargs.get("previous"))
+        return await build_plan(*args, **kwargs)
+
+    monkeypatch.setattr(settings, "PROVIDER_FLIGHTS", "skyscanner")
+    monkeypatch.setattr(settings, "PROVIDER_FLIGHTS_SECONDARY", "")
+    monkeypatch.setattr(settings, "PROVIDER_MAPS", "google")
+    monkeypatch.setattr(settings, "GOOGLE_MAPS_API_KEY", "")
+    monkeypatch.delenv("GOOGLE_MAPS_API_KEY", raising=False)
+    monkeypatch.setattr(settings, "HOTEL_INVENTORY_ENABLED", False)
+    monkeypatch.setitem(registry._resolved, ("flights", "skyscanner"), flight_eur)
+    monkeypatch.setattr(providers, "weather", weather)
+    monkeypatch.setattr(plan_store, "save", save)
+    monkeypatch.setattr(planner, "build_plan", counting_build_plan)
+    return builds
+
+
+async def _run_claimed(payload: dict) -> Tuple[dict, dict]:
+    await jobs.submit(payload)
+    job = await jobs.broker().claim(0.01)
+    return job, await jobs.run_plan(job)
+
+
+def test_missing_key_fallback_is_not_replanned(monkeypatch):
+    async def flight_eur(origin, dest, date, fresh=False):
+        raise RuntimeError("RAPIDAPI_KEY missing for Skyscanner (RapidAPI)")
+
+    builds = _plan_offline(monkeypatch, flight_eur)
+    job, body = asyncio.run(_run_claimed(_payload("Lyon")))
+    assert len(builds) == 1 and job["retried_stages"] == []
+    assert any(c.startswith("skyscanner-fallback:RuntimeError:") for c in body["result"]["citations"])
+
+
+def test_transient_flight_error_is_replanned(monkeypatch):
+    import httpx
+    calls = []
+
+    async def flight_eur(origin, dest, date, fresh=False):
+        calls.append(date)
+        if len(calls) == 1:
+            raise httpx.ConnectTimeout("timed out")
+        return {"provider": "skyscanner", "price_eur": 120.0, "currency": "EUR", "url": "https://www.skyscanner.net/"}
+
+    builds = _plan_offline(monkeypatch, flight_eur)
+    job, body = asyncio.run(_run_claimed(_payload("Lyon")))
+    assert len(builds) == 2 and job["retried_stages"] == ["flight"]
+    assert body["result"]["citations"][0] == "https://www.skyscanner.net/"
+
+
+def test_keep_good_drops_only_failed_lookups():
+    state = _state()
+    keep = jobs._keep_good(state, ["weather:2026-11-01"])
+    assert [d["date"] for d in keep["days"]] == ["2026-11-02"]
+    assert keep["flight"] == state["flight"]
+    assert len(state["days"]) == 2   # the original is left alone
+
+    keep = jobs._keep_good(state, ["flight"])
+    assert keep["flight"] is None and len(keep["days"]) == 2
@@ -0,0 +1,33 @@
+import asyncio
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import NullPool
+
+from backend.db.migrations import MIGRATIONS, migrate
+
+
+def test_concurrent_sqlite_migrations_apply_once(tmp_path):
+    url = f"sqlite+aiosqlite:///{tmp_path / 'm.db'}"
+
+    async def one():
+        engine = create_async_engine(url, poolclass=NullPool)   # like a separate process
+        try:
+            return await migrate(engine)
+        finally:
+            await engine.dispose()
+
+    async def run():
+        results = await asyncio.gather(one(), one(), one())
+        engine = create_async_engine(url, poolclass=NullPool)
+        try:
+            async with engine.connect() as conn:
+                versions = (await conn.execute(text("SELECT version FROM schema_migrations"))).scalars().all()
+        finally:
+            await engine.dispose()
+        return results, versions
+
+    results, versions = asyncio.run(run())
+    every = [m.version for m in MIGRATIONS]
+    assert sorted(results) == [[], [], every]
+    assert sorted(versions) == every
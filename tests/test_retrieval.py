@@ -0,0 +1,105 @@
+import json
+
+import numpy as np
+import pytest
+
+from backend import datasets
+from backend.tools import hours, retrieval
+
+TAGS = ["museum", "park", "market", "bar", "church"]
+
+
+def _seed() -> list:
+    # 70 rows in Lyon, so its bitmap spans two 64-bit words
+    rows = [{"name": f"Lyon spot {i:02d}", "city": "Lyon", "lat": 45.76, "lon": 4.83,
+             "tags": [TAGS[i % 5]] + (["art"] if i % 7 == 0 else []),
+             "price_eur": float(i % 9) * 5.0, "hours": "09:00-18:00" if i % 2 else "18:00-23:00"}
+            for i in range(70)]
+    rows += [
+        {"name": "Musée des Beaux-Arts", "city": "Lyon", "tags": ["museum", "art"], "price_eur": 12.0,
+         "hours": "10:00-18:00"},
+        {"name": "Musée Gadagne", "city": "Lyon", "tags": ["museum", "history"], "price_eur": 9.0,
+         "hours": "10:00-18:00"},
+        {"name": "Beaux-Arts café", "city": "Lyon", "tags": ["food"], "price_eur": 15.0, "hours": "08:00-12:00"},
+        {"name": "Musée Masséna", "city": "Nice", "tags": ["museum", "art"], "price_eur": 10.0},
+        {"name": "Cours Saleya", "city": "Nice", "tags": ["market"], "price_eur": 0.0},
+    ]
+    return rows
+
+
+@pytest.fixture(scope="module")
+def built(tmp_path_factory):
+    tmp = tmp_path_factory.mktemp("pois")
+    src = tmp / "seed.jsonl"
+    src.write_text("\n".join(json.dumps(r) for r in _seed()))
+    out = str(tmp / "pois")
+    datasets.build_pois(str(src), out)
+    cat = datasets.POICatalog(out)
+    return cat, retrieval.HybridRetriever(cat)
+
+
+def _brute(cat, city, interests=(), max_price=None) -> list:
+    want = {t for i in interests for t in retrieval.INTEREST_TAGS.get(i, (i,))}
+    out = []
+    for i in cat.by_city(city):
+        r = cat.row(int(i))
+        if interests and not want & set(r["tags"]):
+            continue
+        if max_price is not None and r["price_eur"] > max_price:
+            continue
+        out.append(int(i))
+    return out
+
+
+@pytest.mark.parametrize("city,interests,max_price", [
+    ("Lyon", (), None),
+    ("Lyon", ("art",), None),
+    ("Lyon", ("nature", "nightlife"), None),
+    ("Lyon", ("art",), 20.0),
+    ("Lyon", (), 12.5),            # between two price bands
+    ("Lyon", ("food",), 1000.0),   # above every band
+    ("Nice", ("history", "art"), 10.0),
+    ("Nice", ("unknown-tag",), None),
+    ("Bordeaux", (), None),        # a city with no POIs
+])
+def test_candidates_match_a_row_scan(built, city, interests, max_price):
+    cat, r = built
+    assert r.candidates(city, interests, max_price).tolist() == _brute(cat, city, interests, max_price)
+
+
+def test_candidates_of_an_unknown_city_are_empty(built):
+    _, r = built
+    assert r.candidates("Atlantis").tolist() == []
+
+
+def test_bm25_ranks_the_closest_name_first(built):
+    cat, r = built
+    rows = r.candidates("Lyon")
+    scores = r.bm25("musee beaux arts", rows)
+    ranked = [cat.text(int(rows[i]), "name") for i in np.argsort(-scores, kind="stable")[:3]]
+    assert ranked == ["Musée des Beaux-Arts", "Beaux-Arts café", "Musée Gadagne"]
+    assert (scores > 0).sum() == 3
+    assert not r.bm25("zzz", rows).any()
+
+
+def test_search_fuses_text_and_interests(built):
+    cat, r = built
+    hits = r.search("Lyon", "musée beaux-arts", interests=["art"], k=3)
+    assert cat.text(hits[0][0], "name") == "Musée des Beaux-Arts"
+    assert [s for _, s in hits] == sorted((s for _, s in hits), reverse=True)
+    cheap = {cat.text(i, "name") for i, _ in r.search("Lyon", "beaux arts", interests=["art"], max_price=10.0, k=50)}
+    assert cheap and "Musée des Beaux-Arts" not in cheap   # €12
+
+
+def test_search_open_at_keeps_pois_open_then(built, monkeypatch):
+    cat, r = built
+    monkeypatch.setattr(hours, "index", lambda: hours.HoursIndex.load(cat.path))
+    idx = hours.HoursIndex.load(cat.path)
+    evening = ("2026-07-14", 19 * 60, 60)
+    hits = r.search("Lyon", interests=["museum"], k=100, open_at=evening)
+    rows = np.array([i for i, _ in hits])
+    assert len(rows) and idx.is_open(rows, *evening).all()
+    every = r.candidates("Lyon", ["museum"])
+    assert len(rows) == int(idx.is_open(every, *evening).sum()) < len(every)
+    names = {cat.text(i, "name") for i, _ in r.search("Lyon", "musee", k=100, open_at=("2026-07-14", 11 * 60, 60))}
+    assert {"Musée des Beaux-Arts", "Musée Gadagne"} <= names
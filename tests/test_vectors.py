@@ -0,0 +1,65 @@
+import numpy as np
+import pytest
+
+from backend.config import settings
+from backend.tools import vectors
+
+N, D, M, K = 4000, 64, 16, 10
+
+
+@pytest.fixture(autouse=True)
+def oversample(monkeypatch):
+    monkeypatch.setattr(settings, "VECTOR_RERANK_OVERSAMPLE", 4)
+
+
+@pytest.fixture(scope="module")
+def collection(tmp_path_factory):
+    rng = np.random.default_rng(1)
+    x = rng.standard_normal((N, D)).astype(np.float32)
+    x /= np.linalg.norm(x, axis=1, keepdims=True)
+    path = str(tmp_path_factory.mktemp("vectors"))
+    np.save(f"{path}/embeddings.npy", x)
+    vectors.build(path, "int8")
+    vectors.build(path, "pq", M)
+    queries = rng.standard_normal((50, D)).astype(np.float32)
+    rows = np.sort(rng.choice(N, 800, replace=False))
+    return path, queries, rows
+
+
+def _recall(idx, exact, queries, rows=None) -> float:
+    hits = 0
+    for q in queries:
+        got, _ = idx.search(q, K, rows=rows)
+        want, _ = exact.search(q, K, rows=rows)
+        hits += len(set(got.tolist()) & set(want.tolist()))
+    return hits / (K * len(queries))
+
+
+# int8 finds the exact top 10; pq (16 x 4-dim subspaces) about 0.94-0.98 of it
+@pytest.mark.parametrize("kind,floor", [("int8", 1.0), ("pq", 0.9)])
+def test_recall_against_float32(collection, kind, floor):
+    path, queries, rows = collection
+    idx, exact = vectors.open_index(path, kind), vectors.open_index(path, "float32")
+    assert idx.kind == kind and idx.code_bytes < exact.vectors.nbytes
+    assert _recall(idx, exact, queries) >= floor
+    assert _recall(idx, exact, queries, rows) >= floor
+
+
+@pytest.mark.parametrize("kind", ["int8", "pq"])
+def test_rerank_returns_exact_scores_within_rows(collection, kind):
+    path, queries, rows = collection
+    idx = vectors.open_index(path, kind)
+    q = queries[0] / np.linalg.norm(queries[0])
+    ids, scores = idx.search(queries[0], K, rows=rows)
+    assert len(ids) == K and np.isin(ids, rows).all()
+    np.testing.assert_allclose(scores, np.asarray(idx.vectors[ids]) @ q, rtol=1e-5, atol=1e-6)
+    assert (np.diff(scores) <= 0).all()
+    # Fewer rows than k: every row comes back
+    ids, _ = idx.search(queries[0], K, rows=rows[:3])
+    assert sorted(ids.tolist()) == rows[:3].tolist()
+
+
+def test_unknown_kind_is_refused(collection):
+    path, _, _ = collection
+    with pytest.raises(ValueError):
+        vectors.open_index(path, "binary")